@@ -4,7 +4,7 @@
 linuxrouter.py: Example network with Linux IP router
 
 This example converts a Node into a router using IP forwarding
-already built into Linux.
+already built into Linux (see LinuxRouter in mininet.nodelib).
 
 The example topology creates a router and three IP subnets:
 
@@ -30,25 +30,11 @@
 
 from mininet.topo import Topo
 from mininet.net import Mininet
-from mininet.node import Node
+from mininet.nodelib import LinuxRouter
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
 
 
-class LinuxRouter( Node ):
-    "A Node with IP forwarding enabled."
-
-    # pylint: disable=arguments-differ
-    def config( self, **params ):
-        super( LinuxRouter, self).config( **params )
-        # Enable forwarding on the router
-        self.cmd( 'sysctl net.ipv4.ip_forward=1' )
-
-    def terminate( self ):
-        self.cmd( 'sysctl net.ipv4.ip_forward=0' )
-        super( LinuxRouter, self ).terminate()
-
-
 class NetworkTopo( Topo ):
     "A LinuxRouter connecting three IP subnets"
 
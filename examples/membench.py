@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""
+membench.py: measure how much Python memory Mininet uses per
+node and per link.
+
+This example creates a number of hosts, connects them in pairs,
+and uses tracemalloc (Python 3) to report the memory allocated in
+the controlling process for each host and each link. Kernel
+objects (namespaces, veth pairs) are not included.
+
+usage: membench.py [hosts [lazy|socket]]
+"""
+
+import sys
+from functools import partial
+
+from mininet.net import Mininet
+from mininet.node import Host
+from mininet.nodelib import LazyHost
+from mininet.log import setLogLevel, info, error
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+HOSTS = { 'pty': Host,
+          'socket': partial( Host, transport='socket' ),
+          'lazy': LazyHost }
+
+
+def membench( hosts=100, host=Host ):
+    """Create hosts and links and report their memory use
+       hosts: number of hosts to create (linked in pairs)
+       host: host class
+       returns: bytes per host, bytes per link"""
+    net = Mininet( controller=None, host=host )
+    tracemalloc.start()
+    start, _peak = tracemalloc.get_traced_memory()
+    for i in range( hosts ):
+        net.addHost( 'h%d' % ( i + 1 ) )
+    afterHosts, _peak = tracemalloc.get_traced_memory()
+    for h1, h2 in zip( net.hosts[ 0::2 ], net.hosts[ 1::2 ] ):
+        net.addLink( h1, h2 )
+    afterLinks, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    perHost = float( afterHosts - start ) / max( 1, len( net.hosts ) )
+    perLink = float( afterLinks - afterHosts ) / max( 1, len( net.links ) )
+    info( '*** %d hosts: %.0f bytes per host\n' % (
+        len( net.hosts ), perHost ) )
+    info( '*** %d links: %.0f bytes per link\n' % (
+        len( net.links ), perLink ) )
+    net.stop()
+    return perHost, perLink
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    if not tracemalloc:
+        error( 'membench.py requires Python 3 (tracemalloc)\n' )
+        sys.exit( 1 )
+    count = int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 100
+    kind = sys.argv[ 2 ] if len( sys.argv ) > 2 else 'pty'
+    membench( hosts=count, host=HOSTS[ kind ] )
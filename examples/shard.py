@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+"""
+shard.py: run node shells in several worker processes on one machine
+
+A single Mininet process normally owns every node's shell, so command
+round trips (for example, configuring thousands of hosts) are limited
+to one core. With Mininet( shards=N ), N worker processes start the
+shells of hosts and switches (round-robin) and run their cmd()s, so
+that commands sent to many nodes at once can use all cores. Nodes in
+the same shard still run commands concurrently.
+
+See mininet/shard.py for how this works, and its limitations.
+It requires Python 3; 'mn --shards N' does the same thing.
+"""
+
+from mininet.net import Mininet
+from mininet.topolib import TreeTopo
+from mininet.util import numCores
+from mininet.log import setLogLevel
+
+
+def testSharded( shards=None ):
+    """Create a sharded network and ping between all hosts
+       shards: number of shards (default: number of cores)"""
+    net = Mininet( topo=TreeTopo( depth=2, fanout=4 ),
+                   shards=shards or numCores() or 1, waitConnected=True )
+    net.start()
+    net.pingAll()
+    net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    testSharded()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+staticrouting.py: a routed leaf-spine fabric without a routing daemon
+
+Leaf and spine switches are LinuxRouter nodes, and each host is
+linked to a leaf router; every link is a /30 subnet. We compute each
+router's routes (with equal-cost multipath over the spines) from the
+topology before starting the network, and install each router's
+table with a single ip -batch process.
+
+usage: staticrouting.py [leaves [spines [hosts]]]
+"""
+
+import sys
+
+from mininet.topo import Topo
+from mininet.net import Mininet
+from mininet.nodelib import LinuxRouter
+from mininet.routing import addressLinks, compileRoutes, installRoutes
+from mininet.log import setLogLevel, info
+from mininet.cli import CLI
+
+
+class RoutedFabricTopo( Topo ):
+    "Leaf-spine fabric of Linux routers"
+
+    # pylint: disable=arguments-differ
+    def build( self, leaves=2, spines=2, hosts=2 ):
+        """leaves: number of leaf routers
+           spines: number of spine routers
+           hosts: hosts per leaf router"""
+        spineNodes = [ self.addNode( 'spine%d' % ( i + 1 ), cls=LinuxRouter )
+                       for i in range( spines ) ]
+        for i in range( leaves ):
+            leaf = self.addNode( 'leaf%d' % ( i + 1 ), cls=LinuxRouter )
+            for j in range( hosts ):
+                host = self.addHost( 'h%d' % ( i * hosts + j + 1 ) )
+                self.addLink( host, leaf )
+            for spine in spineNodes:
+                self.addLink( leaf, spine )
+
+
+def run( leaves=2, spines=2, hosts=2 ):
+    "Build a routed fabric, install its routes and run the CLI"
+    topo = RoutedFabricTopo( leaves, spines, hosts )
+    addressLinks( topo )
+    routes = compileRoutes( topo, ecmp=True )
+    net = Mininet( topo=topo, controller=None )
+    net.start()
+    installRoutes( net, routes )
+    info( '*** Routing table on leaf1:\n' )
+    info( net[ 'leaf1' ].cmd( 'ip route' ) )
+    CLI( net )
+    net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run( *[ int( arg ) for arg in sys.argv[ 1: ] ] )
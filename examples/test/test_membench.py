@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+
+"""
+Test for membench.py
+"""
+
+import unittest
+from mininet.util import pexpect
+
+class testMembench( unittest.TestCase ):
+
+    def testMembench( self ):
+        "Verify that we report memory use per host and per link"
+        p = pexpect.spawn( 'python -m mininet.examples.membench 10' )
+        p.expect( r'10 hosts: (\d+) bytes per host' )
+        self.assertGreater( int( p.match.group( 1 ) ), 0 )
+        p.expect( r'5 links: (\d+) bytes per link' )
+        self.assertGreater( int( p.match.group( 1 ) ), 0 )
+        p.expect( pexpect.EOF )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+"""
+Test for shard.py
+"""
+
+import unittest
+from mininet.util import pexpect
+
+class testShard( unittest.TestCase ):
+
+    def testShardPingAll( self ):
+        "Verify that a sharded network has full connectivity"
+        p = pexpect.spawn( 'python -m mininet.examples.shard' )
+        p.expect( r'(\d+)% dropped' )
+        percent = int( p.match.group( 1 ) ) if p.match else -1
+        p.expect( pexpect.EOF )
+        self.assertEqual( percent, 0 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+"""
+Test for staticrouting.py
+"""
+
+import unittest
+from mininet.util import pexpect
+
+class testStaticRouting( unittest.TestCase ):
+
+    prompt = 'mininet>'
+
+    def testPingall( self ):
+        "Test connectivity between hosts on different leaves"
+        p = pexpect.spawn( 'python -m mininet.examples.staticrouting' )
+        p.expect( self.prompt )
+        p.sendline( 'pingall' )
+        p.expect( r'(\d+)% dropped' )
+        percent = int( p.match.group( 1 ) ) if p.match else -1
+        p.expect( self.prompt )
+        p.sendline( 'exit' )
+        p.wait()
+        self.assertEqual( percent, 0 )
+
+    def testECMP( self ):
+        "Routes to other leaves use both spines"
+        p = pexpect.spawn( 'python -m mininet.examples.staticrouting' )
+        p.expect( self.prompt )
+        p.sendline( 'leaf1 ip route' )
+        p.expect( 'nexthop via' )
+        p.expect( 'nexthop via' )
+        p.expect( self.prompt )
+        p.sendline( 'exit' )
+        p.wait()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,438 @@
+"""
+A control API for driving a running Mininet network from other
+processes, using JSON-RPC 2.0 over a unix socket.
+
+Each request and response is a JSON object on a single line. A client
+may send any number of requests over one connection, and any number
+of clients may connect at once. Commands for different nodes run
+concurrently; commands for the same node (which has a single shell)
+run one at a time. cmd() returns an error rather than waiting if the
+node's shell is busy with a command from elsewhere, e.g. the CLI.
+
+Methods (params are passed by name):
+
+nodes(): names of hosts, switches and controllers
+cmd( node, cmd ): run cmd in node's shell and return its output
+popen( node, cmd, stream=False ): run cmd (a list, or a string for
+    sh -c) in node's namespace, without using its shell; returns
+    { out, err, code }. If stream is true, each line of output is
+    sent as an 'output' notification, with the request's id, before
+    the response.
+link( node1, node2, status ): bring links up or down
+linkConfig( node1, node2, bw=..., delay=..., ... ): reconfigure the
+    links between two nodes (e.g. TCLink parameters)
+stats( nodes=None ): interface counters, read from /proc rather
+    than from the nodes' shells
+ping( hosts=None, timeout=None ): ping all pairs; returns % dropped
+batch( requests, stream=False ): run a list of requests concurrently
+    (requests for the same node run in order) and return a list of
+    their responses. If stream is true, each response is also sent
+    as a 'result' notification, with its index, as soon as it is done.
+shutdown(): ask the server's owner to stop (e.g. mn --api ... --test
+    serve exits and stops the network)
+
+Example:
+
+    net = Mininet( topo=SingleSwitchTopo( 2 ), api='/tmp/mn.sock' )
+    net.start()
+
+and then, from another process:
+
+    client = APIClient( '/tmp/mn.sock' )
+    print( client.call( 'cmd', node='h1', cmd='ip -br addr' ) )
+
+or: mn --api /tmp/mn.sock --test serve
+"""
+
+import json
+import os
+import socket
+import stat
+from subprocess import STDOUT
+from threading import Thread, Lock, Event
+
+try:
+    from socketserver import ThreadingMixIn, UnixStreamServer
+    from socketserver import StreamRequestHandler
+except ImportError:  # Python 2
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+    from SocketServer import StreamRequestHandler
+
+from mininet.log import info, debug
+from mininet.node import ShellBusy
+from mininet.util import ( runParallel, netDevStats, decode, encode,
+                           BaseString )
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class APIError( Exception ):
+    "Error to return to a client"
+
+    def __init__( self, message, code=SERVER_ERROR ):
+        Exception.__init__( self, message )
+        self.code = code
+
+
+class APIHandler( StreamRequestHandler ):
+    "Handle one client connection: a request per line"
+
+    def handle( self ):
+        "Read and answer requests until the client closes the connection"
+        api = self.server.api
+        wlock = Lock()
+
+        def send( obj ):
+            "Send a response or notification to our client"
+            data = encode( json.dumps( obj, separators=( ',', ':' ) ) +
+                           '\n' )
+            with wlock:
+                self.wfile.write( data )
+                self.wfile.flush()
+
+        for line in self.rfile:
+            line = decode( line ).strip()
+            if not line:
+                continue
+            try:
+                request = json.loads( line )
+            except ValueError as e:
+                send( api.errorResponse( None, PARSE_ERROR, str( e ) ) )
+                continue
+            response = api.dispatch( request, send )
+            if response is not None:
+                send( response )
+
+
+class APIUnixServer( ThreadingMixIn, UnixStreamServer ):
+    "Unix socket server with a thread per connection"
+    daemon_threads = True
+
+
+class APIServer( object ):
+    "JSON-RPC control API for a Mininet network"
+
+    def __init__( self, net, path, workers=None ):
+        """net: Mininet network
+           path: unix socket path
+           workers: max number of nodes a batch runs on at once
+                    (default: no limit)"""
+        self.net = net
+        self.path = path
+        self.workers = workers
+        self.server = None
+        self.thread = None
+        self.stopped = Event()
+        self.locks = {}
+        self.locksLock = Lock()
+
+    def start( self ):
+        "Start serving in a background thread"
+        self.unlinkSocket()
+        # Commands run as root, so only our user may connect
+        umask = os.umask( 0o077 )
+        try:
+            self.server = APIUnixServer( self.path, APIHandler )
+        finally:
+            os.umask( umask )
+        self.server.api = self
+        self.thread = Thread( target=self.server.serve_forever )
+        self.thread.daemon = True
+        self.thread.start()
+        info( '*** API listening on %s\n' % self.path )
+        return self
+
+    def stop( self ):
+        "Stop serving"
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.unlinkSocket()
+
+    def unlinkSocket( self ):
+        "Remove a stale socket at our path, but nothing else"
+        try:
+            mode = os.lstat( self.path ).st_mode
+        except OSError:
+            return
+        if not stat.S_ISSOCK( mode ):
+            raise Exception( 'API path %s exists and is not a socket' %
+                             self.path )
+        os.unlink( self.path )
+
+    def wait( self ):
+        "Wait until a client calls shutdown() (or we are stopped)"
+        # Wait in a loop so that KeyboardInterrupt works
+        while not self.stopped.is_set():
+            self.stopped.wait( 1 )
+
+    # Request handling
+
+    @staticmethod
+    def errorResponse( rid, code, message ):
+        "Return a JSON-RPC error response"
+        return { 'jsonrpc': '2.0', 'id': rid,
+                 'error': { 'code': code, 'message': message } }
+
+    def dispatch( self, request, send ):
+        """Run a request and return its response
+           request: JSON-RPC request object
+           send: function to send notifications to the client
+           returns: response, or None for notifications"""
+        if not isinstance( request, dict ):
+            return self.errorResponse( None, INVALID_REQUEST,
+                                       'request must be an object' )
+        rid = request.get( 'id' )
+        method = request.get( 'method' )
+        params = request.get( 'params', {} )
+        fn = getattr( self, 'rpc_' + str( method ), None )
+        if not isinstance( method, BaseString ) or fn is None:
+            response = self.errorResponse(
+                rid, METHOD_NOT_FOUND, 'unknown method %s' % method )
+        elif not isinstance( params, dict ):
+            response = self.errorResponse(
+                rid, INVALID_PARAMS, 'params must be an object' )
+        else:
+
+            def notify( name, data ):
+                "Send a notification for this request"
+                send( { 'jsonrpc': '2.0', 'method': name,
+                        'params': dict( data, id=rid ) } )
+
+            debug( '*** API: %s %s\n' % ( method, params ) )
+            try:
+                params = dict( ( str( k ), v ) for k, v in params.items() )
+                self.checkParams( fn, params )
+                result = fn( notify, **params )
+                response = { 'jsonrpc': '2.0', 'id': rid, 'result': result }
+            except APIError as e:
+                response = self.errorResponse( rid, e.code, str( e ) )
+            except Exception as e:  # pylint: disable=broad-except
+                response = self.errorResponse(
+                    rid, SERVER_ERROR, '%s: %s' % ( type( e ).__name__, e ) )
+        return response if 'id' in request else None
+
+    @staticmethod
+    def checkParams( fn, params ):
+        """Check params against an rpc method's arguments
+           fn: bound rpc_* method
+           params: dict of params
+           raises: APIError if params are missing or unexpected"""
+        # pylint: disable=import-outside-toplevel
+        try:
+            from inspect import getfullargspec as getargspec
+        except ImportError:  # Python 2
+            from inspect import getargspec
+        spec = getargspec( fn )
+        # Skip self and notify; spec[ 2 ] is the **kwargs name, if any
+        names, anyName = spec.args[ 2: ], spec[ 2 ] is not None
+        required = names[ :len( names ) - len( spec.defaults or () ) ]
+        missing = [ name for name in required if name not in params ]
+        unknown = sorted( name for name in params if name not in names and
+                          ( not anyName or name in spec.args[ :2 ] ) )
+        if missing or unknown:
+            raise APIError( 'missing params: %s; unknown params: %s' % (
+                ', '.join( missing ) or 'none',
+                ', '.join( unknown ) or 'none' ), INVALID_PARAMS )
+
+    def node( self, name ):
+        "Return node by name"
+        if name not in self.net:
+            raise APIError( 'unknown node %s' % name, INVALID_PARAMS )
+        return self.net[ name ]
+
+    def nodeLocks( self, *names ):
+        "Return locks for nodes' shells, in a consistent order"
+        with self.locksLock:
+            return [ self.locks.setdefault( name, Lock() )
+                     for name in sorted( set( names ) ) ]
+
+    def withNodes( self, names, fn, *args ):
+        "Call fn( *args ) while holding the named nodes' locks"
+        locks = self.nodeLocks( *names )
+        for lock in locks:
+            lock.acquire()
+        try:
+            return fn( *args )
+        finally:
+            for lock in reversed( locks ):
+                lock.release()
+
+    # Methods
+
+    def rpc_nodes( self, _notify ):
+        "Return node names"
+        net = self.net
+        return { 'hosts': [ h.name for h in net.hosts ],
+                 'switches': [ s.name for s in net.switches ],
+                 'controllers': [ c.name for c in net.controllers ] }
+
+    def rpc_cmd( self, _notify, node, cmd ):
+        "Run cmd in node's shell"
+        n = self.node( node )
+
+        def run():
+            "Run command, if node's shell isn't busy"
+            try:
+                return n.cmd( cmd )
+            except ShellBusy:
+                # Another thread (e.g. the CLI's) is using its shell
+                raise APIError( '%s is busy' % node )
+
+        return self.withNodes( [ node ], run )
+
+    def rpc_popen( self, notify, node, cmd, stream=False ):
+        "Run cmd in node's namespace"
+        n = self.node( node )
+        if isinstance( cmd, BaseString ):
+            cmd = [ 'sh', '-c', cmd ]
+        if not stream:
+            out, err, code = n.pexec( cmd )
+            return { 'out': out, 'err': err, 'code': code }
+        # Merge stderr so that we only need to read one pipe
+        popen = n.popen( cmd, stderr=STDOUT )
+        lines = []
+        for line in iter( popen.stdout.readline, b'' ):
+            line = decode( line )
+            lines.append( line )
+            notify( 'output', { 'node': node, 'line': line } )
+        popen.stdout.close()
+        return { 'out': ''.join( lines ), 'err': '', 'code': popen.wait() }
+
+    def rpc_link( self, _notify, node1, node2, status ):
+        "Bring links between node1 and node2 up or down"
+        if status not in ( 'up', 'down' ):
+            raise APIError( 'status must be up or down', INVALID_PARAMS )
+        if not self.node( node1 ).connectionsTo( self.node( node2 ) ):
+            raise APIError( '%s and %s are not connected' %
+                            ( node1, node2 ), INVALID_PARAMS )
+        self.withNodes( [ node1, node2 ], self.net.configLinkStatus,
+                        node1, node2, status )
+        return True
+
+    def rpc_linkConfig( self, _notify, node1, node2, **params ):
+        "Reconfigure links between node1 and node2"
+        links = self.net.linksBetween( self.node( node1 ),
+                                       self.node( node2 ) )
+        if not links:
+            raise APIError( '%s and %s are not connected' %
+                            ( node1, node2 ), INVALID_PARAMS )
+
+        def config():
+            "Reconfigure both ends of each link"
+            for link in links:
+                for intf in link.intf1, link.intf2:
+                    intf.config( **params )
+
+        self.withNodes( [ node1, node2 ], config )
+        return len( links )
+
+    def rpc_stats( self, _notify, nodes=None ):
+        "Return interface counters"
+        nodes = ( [ self.node( name ) for name in nodes ] if nodes
+                  else self.net.hosts + self.net.switches )
+        return dict( ( node.name, netDevStats( node.pid,
+                                               node.intfNames() ) )
+                     for node in nodes )
+
+    def rpc_ping( self, _notify, hosts=None, timeout=None ):
+        "Ping between hosts and return % dropped"
+        hosts = ( [ self.node( name ) for name in hosts ] if hosts
+                  else self.net.hosts )
+        return self.withNodes( [ h.name for h in hosts ], self.net.ping,
+                               hosts, timeout )
+
+    def rpc_batch( self, notify, requests, stream=False ):
+        "Run requests concurrently, in order for each node"
+        if not isinstance( requests, list ):
+            raise APIError( 'requests must be a list', INVALID_PARAMS )
+        # Group requests by node, so each node's requests run in order
+        groups, nodeGroup = [], {}
+        for i, request in enumerate( requests ):
+            params = request.get( 'params' ) if isinstance(
+                request, dict ) else None
+            name = ( params.get( 'node', params.get( 'node1' ) )
+                     if isinstance( params, dict ) else None )
+            if name is None or name not in nodeGroup:
+                group = []
+                groups.append( group )
+                if name is not None:
+                    nodeGroup[ name ] = group
+            else:
+                group = nodeGroup[ name ]
+            group.append( i )
+        responses = [ None ] * len( requests )
+
+        def runGroup( group ):
+            "Run a group of requests in order"
+            for i in group:
+                request = requests[ i ]
+                if isinstance( request, dict ) and (
+                        request.get( 'method' ) == 'batch' ):
+                    response = self.errorResponse(
+                        request.get( 'id' ), INVALID_REQUEST,
+                        'batches cannot be nested' )
+                else:
+                    # Sub-requests always get a response
+                    if isinstance( request, dict ) and 'id' not in request:
+                        request = dict( request, id=i )
+                    response = self.dispatch( request, lambda _obj: None )
+                responses[ i ] = response
+                if stream:
+                    notify( 'result', { 'index': i, 'response': response } )
+
+        runParallel( runGroup, groups, self.workers or len( groups ) )
+        return responses
+
+    def rpc_shutdown( self, _notify ):
+        "Ask our owner to stop"
+        self.stopped.set()
+        return True
+
+
+class APIClient( object ):
+    "Simple client for APIServer"
+
+    def __init__( self, path ):
+        "path: server's unix socket path"
+        self.sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        self.sock.connect( path )
+        self.rfile = self.sock.makefile( 'rb' )
+        self.nextId = 1
+
+    def call( self, method, notify=None, **params ):
+        """Call a method and return its result
+           method: method name
+           notify: function to call with each notification (optional)
+           params: method parameters
+           raises: APIError if the call fails"""
+        rid = self.nextId
+        self.nextId += 1
+        self.sock.sendall( encode( json.dumps(
+            { 'jsonrpc': '2.0', 'id': rid, 'method': method,
+              'params': params } ) + '\n' ) )
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                raise APIError( 'connection closed' )
+            msg = json.loads( decode( line ) )
+            if 'id' not in msg:
+                if notify:
+                    notify( msg[ 'method' ], msg[ 'params' ] )
+                continue
+            if 'error' in msg:
+                raise APIError( msg[ 'error' ][ 'message' ],
+                                msg[ 'error' ][ 'code' ] )
+            return msg[ 'result' ]
+
+    def close( self ):
+        "Close our connection"
+        self.rfile.close()
+        self.sock.close()
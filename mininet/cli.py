@@ -28,18 +28,26 @@
 from subprocess import call
 from cmd import Cmd
 from os import isatty
-from select import poll, POLLIN
+from select import poll, POLLIN, POLLHUP, POLLERR
+from fnmatch import fnmatchcase
+from getopt import getopt, GetoptError
 import select
 import errno
+import re
 import sys
+import termios
 import time
 import os
 import atexit
 
 from mininet.log import info, output, error
+from mininet.node import ShellBusy
+from mininet.nodelib import LazyHost
 from mininet.term import makeTerms, runX11
+from mininet.stats import NodeStats
 from mininet.util import ( quietRun, dumpNodeConnections,
-                           dumpPorts )
+                           dumpPorts, natural, getincrementaldecoder, fmtBps,
+                           decode )
 
 class CLI( Cmd ):
     "Simple command-line interface to talk to nodes."
@@ -58,6 +66,15 @@ def __init__( self, mininet, stdin=sys.stdin, script=None,
         # Attempt to handle input
         self.inPoller = poll()
         self.inPoller.register( stdin )
+        # Poller for stdin and node output, reused by waitForNode()
+        self.bothPoller = poll()
+        self.bothPoller.register( stdin, POLLIN )
+        self.inDecoder = getincrementaldecoder()
+        # Script support: parallel block (if any), background nodes
+        # and per-command timing
+        self.block, self.blockOpts = None, ( None, None )
+        self.background = []
+        self.timing = False
         self.inputFile = script
         Cmd.__init__( self, stdin=stdin, **kwargs )
         info( '*** Starting CLI:\n' )
@@ -147,7 +164,21 @@ def getLocals( self ):
         'noecho:\n'
         '  mininet> noecho h2 vi foo.py\n'
         'However, starting up an xterm/gterm is generally better:\n'
-        '  mininet> xterm h2\n\n'
+        '  mininet> xterm h2\n'
+        '\n'
+        'To run a command on many nodes at once, use all or group:\n'
+        '  mininet> all h* ip -br addr\n'
+        '  mininet> group -n 16 -t 5 h1-h100 ping -c1 h1\n'
+        '\n'
+        'Scripts may start background commands with bg, wait for\n'
+        'them with await, and run blocks of node commands\n'
+        'concurrently with parallel ... end:\n'
+        '  bg h1 iperf -s\n'
+        '  parallel -n 32\n'
+        '  h2 iperf -c h1 -t 5\n'
+        '  h3 iperf -c h1 -t 5\n'
+        '  end\n'
+        '  await -t 1\n\n'
     )
 
     def do_help( self, line ):  # pylint: disable=arguments-renamed
@@ -181,6 +212,8 @@ def do_sh( self, line ):
     def do_py( self, line ):
         """Evaluate a Python expression.
            Node names may be used, e.g.: py h1.cmd('ls')"""
+        # Python code may run commands on any node
+        self.invalidateIPs( line, self.mn.values() )
         try:
             # pylint: disable=eval-used
             result = eval( line, globals(), self.getLocals() )
@@ -199,6 +232,7 @@ def do_py( self, line ):
     def do_px( self, line ):
         """Execute a Python statement.
             Node names may be used, e.g.: px print h1.cmd('ls')"""
+        self.invalidateIPs( line, self.mn.values() )
         try:
             exec( line, globals(), self.getLocals() )
         except Exception as e:
@@ -339,10 +373,33 @@ def do_noecho( self, line ):
         """Run an interactive command with echoing turned off.
            Usage: noecho [cmd args]"""
         if self.isatty():
-            quietRun( 'stty -echo' )
+            self.setTermMode( echo=False )
         self.default( line )
         if self.isatty():
-            quietRun( 'stty echo' )
+            self.setTermMode( echo=True )
+
+    def setTermMode( self, echo=None, charMode=None ):
+        """Change our tty's mode if necessary, using termios
+           rather than running stty
+           echo: turn echo on or off (None: leave as is)
+           charMode: buffer by character (stty -icanon min 1),
+                     or by line (None: leave as is)"""
+        fd = self.stdin.fileno()
+        attrs = termios.tcgetattr( fd )
+        lflag = attrs[ 3 ]
+        if echo is not None:
+            lflag = lflag | termios.ECHO if echo else lflag & ~termios.ECHO
+        if charMode is not None:
+            lflag = ( lflag & ~termios.ICANON if charMode
+                      else lflag | termios.ICANON )
+        if charMode and attrs[ 6 ][ termios.VMIN ] not in ( 1, b'\x01' ):
+            attrs[ 6 ][ termios.VMIN ] = 1
+            attrs[ 6 ][ termios.VTIME ] = 0
+        elif lflag == attrs[ 3 ]:
+            # Nothing to do
+            return
+        attrs[ 3 ] = lflag
+        termios.tcsetattr( fd, termios.TCSANOW, attrs )
 
     def do_source( self, line ):
         """Read commands from an input file.
@@ -363,6 +420,9 @@ def do_source( self, line ):
             error( 'error reading file %s\n' % args[ 0 ] )
         self.inputFile.close()
         self.inputFile = None
+        if self.block is not None:
+            error( '*** %s: missing end for parallel block\n' % args[ 0 ] )
+            self.do_end( '' )
 
     def do_dpctl( self, line ):
         """Run dpctl (or ovs-ofctl) command on all switches.
@@ -382,10 +442,136 @@ def do_time( self, line ):
         elapsed = time.time() - start
         self.stdout.write("*** Elapsed time: %0.6f secs\n" % elapsed)
 
+    def do_top( self, line ):
+        """Show a refreshing table of per-node CPU, memory and
+           network usage; press q or Ctrl-C to stop.
+           Usage: top [-d secs] [-n count] [-s key] [-i] [-f] [nodes]
+           -d: refresh interval in seconds (default: 2)
+           -n: stop after count refreshes
+           -s: sort by cpu (default), mem, rx or tx
+           -i: show interfaces rather than nodes
+           -f: show flow counts for switches
+           nodes: comma-separated node names and ranges (default: all)"""
+        usage = 'usage: top [-d secs] [-n count] [-s key] [-i] [-f] [nodes]\n'
+        try:
+            opts, args = getopt( line.split(), 'd:n:s:if' )
+            opts = dict( opts )
+            delay = float( opts.get( '-d', 2 ) )
+            count = int( opts.get( '-n', 0 ) )
+            key = opts.get( '-s', 'cpu' )
+            if key not in ( 'cpu', 'mem', 'rx', 'tx' ) or len( args ) > 1:
+                raise ValueError( 'bad sort key or arguments' )
+        except ( GetoptError, ValueError ):
+            error( usage )
+            return
+        nodes = ( self.rangeNodes( args[ 0 ] ) if args
+                  else self.mn.hosts + self.mn.switches )
+        if not nodes:
+            error( '*** No nodes to show\n' )
+            return
+        stats = NodeStats( nodes, flows='-f' in opts,
+                           workers=self.mn.workers )
+        tty = self.isatty()
+        if tty:
+            self.setTermMode( echo=False, charMode=True )
+        try:
+            before = stats.sample()
+            refreshes = 0
+            while not self.waitKey( delay, 'q' ):
+                start = time.time()
+                after = stats.sample()
+                elapsed = time.time() - start
+                self.showTop( stats.rates( before, after ), key,
+                              '-i' in opts, tty, elapsed )
+                before = after
+                refreshes += 1
+                if count and refreshes >= count:
+                    break
+        except KeyboardInterrupt:
+            output( '\n' )
+        finally:
+            if tty:
+                self.setTermMode( echo=True )
+
+    def waitKey( self, secs, keys ):
+        """Wait for secs seconds, or until one of keys is typed
+           returns: True if one of keys was typed"""
+        end = time.time() + secs
+        while True:
+            remaining = end - time.time()
+            if remaining <= 0:
+                return False
+            if not self.inPoller.poll( int( remaining * 1000 ) + 1 ):
+                continue
+            data = decode( os.read( self.stdin.fileno(), 1024 ) )
+            if not data:
+                # EOF: just wait
+                time.sleep( max( 0, end - time.time() ) )
+                return False
+            if any( k in data for k in keys ):
+                return True
+
+    def showTop( self, rates, key, intfs, tty, elapsed ):
+        """Print a table of usage rates for top
+           rates: rates from NodeStats.rates()
+           key: sort key (cpu, mem, rx or tx)
+           intfs: show interfaces rather than nodes
+           tty: clear the screen and fit the table to it
+           elapsed: time taken to sample (s)"""
+
+        def fmt( rate ):
+            "Format a rate compactly"
+            return fmtBps( rate, fmt='%.1f%s' )
+
+        rows = []
+        for node, r in rates.items():
+            if intfs:
+                for name, i in r[ 'intfs' ].items():
+                    rows.append( ( name, None, None, i[ 'rxbps' ],
+                                   i[ 'txbps' ], i[ 'rxpps' ],
+                                   i[ 'txpps' ], None ) )
+                continue
+            total = dict( ( k, sum( i[ k ] for i in r[ 'intfs' ].values() ) )
+                          for k in ( 'rxbps', 'txbps', 'rxpps', 'txpps' ) )
+            rows.append( ( node.name, r[ 'cpu' ], r[ 'mem' ],
+                           total[ 'rxbps' ], total[ 'txbps' ],
+                           total[ 'rxpps' ], total[ 'txpps' ],
+                           r[ 'flows' ] ) )
+        column = { 'cpu': 1, 'mem': 2, 'rx': 3, 'tx': 4 }[ key ]
+        if intfs and column < 3:
+            column = 3
+        rows.sort( key=lambda row: ( -( row[ column ] or 0 ),
+                                     natural( row[ 0 ] ) ) )
+        width = max( [ len( row[ 0 ] ) for row in rows ] + [ 4 ] )
+        lines = [ '*** top: %d %s, sampled in %.0f ms' % (
+            len( rows ), 'interfaces' if intfs else 'nodes',
+            elapsed * 1000 ),
+            '%-*s %6s %8s %9s %9s %8s %8s %6s' % (
+                width, 'name', 'cpu%', 'mem', 'rx bps', 'tx bps',
+                'rx pps', 'tx pps', 'flows' ) ]
+        if tty:
+            try:
+                height = os.get_terminal_size( self.stdout.fileno() ).lines
+            except ( AttributeError, OSError, ValueError ):
+                height = 24
+            rows = rows[ : max( 1, height - len( lines ) - 1 ) ]
+            # Clear screen and home cursor
+            output( '\033[H\033[2J' )
+        for name, cpu, mem, rxbps, txbps, rxpps, txpps, flows in rows:
+            lines.append( '%-*s %6s %8s %9s %9s %8s %8s %6s' % (
+                width, name,
+                '' if cpu is None else '%.1f' % cpu,
+                '' if mem is None else fmtBps( mem, fmt='%.1f%sB' ),
+                fmt( rxbps ), fmt( txbps ), fmt( rxpps ), fmt( txpps ),
+                '' if flows is None else flows ) )
+        output( '\n'.join( lines ) + '\n' )
+
     def do_links( self, _line ):
         "Report on links"
+        # One ip -o link per namespace, rather than one per interface
+        states = self.mn.intfStates()
         for link in self.mn.links:
-            output( link, link.status(), '\n' )
+            output( link, link.status( states ), '\n' )
 
     def do_switch( self, line ):
         "Starts or stops a switch"
@@ -413,6 +599,393 @@ def do_wait( self, _line ):
         "Wait until all switches have connected to a controller"
         self.mn.waitConnected()
 
+    def do_all( self, line ):
+        """Run a command on all nodes matching a pattern, concurrently,
+           printing each line of output prefixed with its node's name.
+           Usage: all [-n max] [-t secs] pattern cmd
+           pattern: shell-style pattern (e.g. h*) or a comma-separated
+                    list of patterns (e.g. h*,s1)
+           -n: max number of nodes running cmd at once
+           -t: interrupt cmd on nodes that are still running after secs"""
+        self.runGroup( line, 'all [-n max] [-t secs] pattern cmd',
+                       self.globNodes )
+
+    def do_group( self, line ):
+        """Run a command on a group of nodes, concurrently, printing
+           each line of output prefixed with its node's name.
+           Usage: group [-n max] [-t secs] nodes cmd
+           nodes: comma-separated node names and ranges
+                  (e.g. h1-h10,s1)
+           -n: max number of nodes running cmd at once
+           -t: interrupt cmd on nodes that are still running after secs"""
+        self.runGroup( line, 'group [-n max] [-t secs] nodes cmd',
+                       self.rangeNodes )
+
+    @staticmethod
+    def groupOpts( line ):
+        """Parse -n max and -t secs options
+           line: arguments
+           returns: maxNodes, timeout, rest of line
+           raises: ValueError for bad options"""
+        maxNodes, timeout = None, None
+        args = line.split( None, 2 )
+        while args and args[ 0 ] in ( '-n', '-t' ):
+            if len( args ) < 2:
+                raise ValueError( 'missing value for %s' % args[ 0 ] )
+            if args[ 0 ] == '-n':
+                maxNodes = int( args[ 1 ] )
+            else:
+                timeout = float( args[ 1 ] )
+            line = args[ 2 ] if len( args ) > 2 else ''
+            args = line.split( None, 2 )
+        return maxNodes, timeout, line
+
+    def runGroup( self, line, usage, match ):
+        """Parse arguments for all/group and run command on nodes
+           line: arguments
+           usage: usage message
+           match: function to find nodes matching a node spec"""
+        try:
+            maxNodes, timeout, line = self.groupOpts( line )
+        except ValueError:
+            error( 'usage: %s\n' % usage )
+            return
+        args = line.split( None, 1 )
+        if len( args ) != 2:
+            error( 'usage: %s\n' % usage )
+            return
+        spec, cmd = args
+        nodes = match( spec )
+        if not nodes:
+            error( '*** No nodes match %s\n' % spec )
+            return
+        cmd = self.substituteIPs( cmd )
+        self.fanout( nodes, cmd, maxNodes, timeout )
+        self.invalidateIPs( cmd, nodes )
+
+    # Scripting: parallel blocks, background commands and timing
+
+    def onecmd( self, line ):
+        """Run a command, or collect it if we are in a parallel block,
+           and print its elapsed time if timing is on"""
+        if self.block is not None:
+            args = self.precmd( line ).split( None, 1 )
+            if args and args[ 0 ] == 'parallel':
+                error( '*** parallel blocks cannot be nested\n' )
+                return False
+            if not args or args[ 0 ] != 'end':
+                if args:
+                    self.block.append( ' '.join( args ) )
+                return False
+        start = time.time()
+        try:
+            stop = Cmd.onecmd( self, line )
+        except ShellBusy as e:
+            # sendCmd() refuses to use a busy shell, e.g. one that is
+            # running a bg command; report it rather than exiting
+            error( '*** %s\n' % e )
+            if self.background:
+                error( '*** use await to finish background commands\n' )
+            return False
+        if self.timing and line.strip():
+            output( '*** %0.6f secs: %s\n' % ( time.time() - start,
+                                               line.strip() ) )
+        return stop
+
+    def do_parallel( self, line ):
+        """Start a block of commands, ending with 'end', that are run
+           concurrently: each node runs its own commands in order, but
+           different nodes run at the same time. Other CLI commands in
+           the block run after the node commands before them finish.
+           Usage: parallel [-n max] [-t secs]
+           -n: max number of nodes running commands at once
+           -t: interrupt nodes that are still running after secs"""
+        try:
+            maxNodes, timeout, rest = self.groupOpts( line )
+            if rest.strip():
+                raise ValueError( 'unexpected arguments' )
+        except ValueError:
+            error( 'usage: parallel [-n max] [-t secs]\n' )
+            return
+        self.block, self.blockOpts = [], ( maxNodes, timeout )
+        self.prompt = 'parallel> '
+
+    def do_end( self, _line ):
+        "End and run a parallel block."
+        if self.block is None:
+            error( '*** end without parallel\n' )
+            return
+        lines, self.block = self.block, None
+        self.prompt = self.__class__.prompt
+        self.runBlock( lines, *self.blockOpts )
+
+    def runBlock( self, lines, maxNodes=None, timeout=None ):
+        """Run a parallel block
+           lines: CLI command lines
+           maxNodes: max number of nodes running at once
+           timeout: interrupt nodes still running after timeout seconds"""
+        queues, nodeQueue = [], {}
+
+        def flush():
+            "Run queued node commands"
+            self.runQueues( queues, maxNodes=maxNodes, timeout=timeout )
+            for node, cmds in queues:
+                self.invalidateIPs( ' '.join( cmds ), [ node ] )
+            del queues[ : ]
+            nodeQueue.clear()
+
+        for line in lines:
+            first, args, line = self.parseline( line )
+            if first in self.mn and args:
+                node = self.mn[ first ]
+                if node not in nodeQueue:
+                    nodeQueue[ node ] = []
+                    queues.append( ( node, nodeQueue[ node ] ) )
+                nodeQueue[ node ].append( self.substituteIPs( args ) )
+            else:
+                flush()
+                self.onecmd( line )
+        flush()
+
+    def do_bg( self, line ):
+        """Start a command on one or more nodes without waiting for it
+           to finish; use await to wait for it and print its output.
+           Usage: bg nodes cmd
+           nodes: comma-separated node names and ranges (e.g. h1-h10,s1)"""
+        args = line.split( None, 1 )
+        if len( args ) != 2:
+            error( 'usage: bg nodes cmd\n' )
+            return
+        spec, cmd = args
+        nodes = self.rangeNodes( spec )
+        if not nodes:
+            error( '*** No nodes match %s\n' % spec )
+            return
+        cmd = self.substituteIPs( cmd )
+        for node in nodes:
+            if not self.shellReady( node ):
+                error( '*** %s is busy or not running; skipping\n' % node )
+                continue
+            node.sendCmd( cmd )
+            self.background.append( node )
+
+    def do_await( self, line ):
+        """Wait for background commands to finish, printing their output.
+           Usage: await [-t secs] [nodes]
+           nodes: comma-separated node names and ranges (default: all)
+           -t: interrupt commands that are still running after secs"""
+        try:
+            _maxNodes, timeout, spec = self.groupOpts( line )
+        except ValueError:
+            error( 'usage: await [-t secs] [nodes]\n' )
+            return
+        nodes = self.background
+        if spec.strip():
+            nodes = [ node for node in self.rangeNodes( spec )
+                      if node in self.background ]
+        self.runQueues( [], timeout=timeout, started=nodes )
+        self.background = [ node for node in self.background
+                            if node.waiting ]
+
+    def do_timing( self, line ):
+        """Print the elapsed time of each command.
+           Usage: timing on|off"""
+        if line.strip() not in ( 'on', 'off' ):
+            error( 'usage: timing on|off\n' )
+            return
+        self.timing = line.strip() == 'on'
+
+    def globNodes( self, spec ):
+        """Return nodes whose names match shell-style patterns
+           spec: comma-separated patterns (e.g. h*,s1)"""
+        patterns = spec.split( ',' )
+        return [ self.mn[ name ]
+                 for name in sorted( self.mn.nameToNode, key=natural )
+                 if any( fnmatchcase( name, pattern )
+                         for pattern in patterns ) ]
+
+    def rangeNodes( self, spec ):
+        """Return nodes in a list of names and ranges
+           spec: comma-separated names and ranges (e.g. h1-h10,s1
+                 or h1-10), ignoring names that aren't in the network"""
+        names = []
+        for item in spec.split( ',' ):
+            m = re.match( r'^(\D*)(\d+)-(\D*)(\d+)$', item )
+            if m and m.group( 3 ) in ( '', m.group( 1 ) ):
+                prefix, first, last = m.group( 1, 2, 4 )
+                names += [ '%s%d' % ( prefix, i ) for i in
+                           range( int( first ), int( last ) + 1 ) ]
+            else:
+                names.append( item )
+        seen = set()
+        nodes = []
+        for name in names:
+            if name in self.mn and name not in seen:
+                seen.add( name )
+                nodes.append( self.mn[ name ] )
+        return nodes
+
+    def fanout( self, nodes, cmd, maxNodes=None, timeout=None ):
+        """Run a command on nodes concurrently, printing each line of
+           output, prefixed with its node's name, as it arrives
+           nodes: nodes to run cmd on
+           cmd: command string
+           maxNodes: max number of nodes running cmd at once (None: all)
+           timeout: interrupt cmd on nodes still running after timeout
+                    seconds, and don't start it on any others (None: wait)
+           returns: list of nodes that did not finish normally"""
+        return self.runQueues( [ ( node, [ cmd ] ) for node in nodes ],
+                               maxNodes=maxNodes, timeout=timeout )
+
+    @staticmethod
+    def shellReady( node ):
+        """Is node's shell free to run a command? Starts a LazyHost's
+           shell, since we need one to follow its output"""
+        if isinstance( node, LazyHost ):
+            node.startLazyShell()
+        return node.shell is not None and not node.waiting
+
+    # Seconds to wait for nodes to stop after ^C, and after killing
+    # their commands, before giving up on them
+    graceTime = 2
+
+    def runQueues( self, queues, maxNodes=None, timeout=None, started=() ):
+        """Run lists of commands on nodes, pipelined: each node runs its
+           own commands in order, but nodes run concurrently, and each
+           node starts its next command as soon as the last one is done.
+           Each line of output is printed, prefixed with its node's name,
+           as it arrives.
+           queues: list of ( node, [ commands ] )
+           maxNodes: max number of nodes running at once (None: all)
+           timeout: interrupt nodes still running after timeout seconds,
+                    and don't start any others (None: wait)
+           started: nodes already running a command (e.g. from bg)
+           returns: list of nodes that did not finish normally"""
+        # pylint: disable=too-many-branches,too-many-statements
+        # pylint: disable=too-many-locals
+        pending, commands = [], {}
+        started = [ node for node in started if node.waiting ]
+        for node, cmds in queues:
+            if node in started or not self.shellReady( node ):
+                error( '*** %s is busy or not running; skipping\n' % node )
+            elif cmds:
+                pending.append( node )
+                commands[ node ] = list( cmds )
+        nodes = started + pending
+        if not nodes:
+            return []
+        # One poller for all running nodes
+        poller = poll()
+        running, partial, failed = {}, {}, []
+        width = max( [ len( node.name ) for node in nodes ] )
+        deadline = time.time() + timeout if timeout else None
+        # How far we have gone in stopping nodes: 0: not at all,
+        # 1: sent them ^C, 2: killed their commands
+        stage = [ 0 ]
+
+        def emit( node, data, final=False ):
+            "Print complete lines of output from node"
+            lines = ( partial.pop( node, '' ) + data ).replace(
+                '\r', '' ).split( '\n' )
+            last = lines.pop()
+            if final and last:
+                lines.append( last )
+            elif last:
+                partial[ node ] = last
+            for text in lines:
+                output( '%-*s %s\n' % ( width + 1, node.name + ':', text ) )
+
+        def watch( node ):
+            "Start polling node"
+            fd = node.stdout.fileno()
+            running[ fd ] = node
+            poller.register( fd, POLLIN )
+
+        def finish( fd ):
+            "Clean up after node finishes, or start its next command"
+            node = running[ fd ]
+            emit( node, '', final=True )
+            if commands.get( node ):
+                node.sendCmd( commands[ node ].pop( 0 ) )
+                return
+            del running[ fd ]
+            poller.unregister( fd )
+
+        def interrupt( reason ):
+            "Interrupt running nodes and drop pending ones"
+            stopped = list( running.values() ) + pending
+            if stopped:
+                error( '*** %s: stopping %s\n' % (
+                    reason, ' '.join( node.name for node in stopped ) ) )
+            for node in running.values():
+                node.sendInt()
+            failed.extend( stopped )
+            del pending[ : ]
+            commands.clear()
+            stage[ 0 ] = 1
+            return time.time() + self.graceTime
+
+        def escalate():
+            """Kill commands that ignored ^C, then stop waiting for
+               nodes whose commands still haven't finished
+               returns: next deadline, or 0"""
+            if stage[ 0 ] == 1:
+                stage[ 0 ] = 2
+                for node in running.values():
+                    error( '*** %s: killing %s\n' % ( node, node.lastCmd ) )
+                    # Foreground commands are children of the shell
+                    quietRun( 'pkill -KILL -P %d' % node.shell.pid )
+                return time.time() + self.graceTime
+            for fd, node in list( running.items() ):
+                error( '*** %s is not responding; '
+                       'use await to wait for it\n' % node )
+                poller.unregister( fd )
+                del running[ fd ]
+                if node not in self.background:
+                    self.background.append( node )
+            return 0
+
+        for node in started:
+            watch( node )
+        while running or pending:
+            while pending and ( not maxNodes or len( running ) < maxNodes ):
+                node = pending.pop( 0 )
+                watch( node )
+                node.sendCmd( commands[ node ].pop( 0 ) )
+            try:
+                wait = None
+                if deadline:
+                    wait = int( max( 0, deadline - time.time() ) * 1000 )
+                ready = poller.poll( wait )
+                if deadline and time.time() >= deadline:
+                    deadline = ( escalate() if stage[ 0 ]
+                                 else interrupt( 'Timed out' ) )
+                for fd, event in ready:
+                    node = running.get( fd )
+                    if node is None:
+                        continue
+                    data = node.monitor( 0 ) if event & POLLIN else ''
+                    if data:
+                        emit( node, data )
+                    if not node.waiting:
+                        finish( fd )
+                    elif not data and event & ( POLLHUP | POLLERR ):
+                        # Shell has exited
+                        node.waiting = False
+                        failed.append( node )
+                        commands.pop( node, None )
+                        finish( fd )
+            except KeyboardInterrupt:
+                deadline = interrupt( 'Interrupted' )
+            except select.error as e:
+                # pylint: disable=unpacking-non-sequence
+                # pylint: disable=unbalanced-tuple-unpacking
+                errno_, errmsg = e.args
+                if errno_ != errno.EINTR:
+                    error( "select.error: %s, %s" % ( errno_, errmsg ) )
+                    deadline = interrupt( 'Error' )
+        return failed
+
     def default( self, line ):
         """Called on an input line when the command prefix is not recognized.
            Overridden to run shell commands when a node is the first
@@ -427,63 +1000,86 @@ def default( self, line ):
                        % first )
                 return
             node = self.mn[ first ]
-            rest = args.split( ' ' )
-            # Substitute IP addresses for node names in command
-            # If updateIP() returns None, then use node name
-            rest = [ self.mn[ arg ].defaultIntf().updateIP() or arg
-                     if arg in self.mn else arg
-                     for arg in rest ]
-            rest = ' '.join( rest )
+            if node.waiting:
+                error( '*** %s is running a background command; '
+                       'use await first\n' % first )
+                return
+            rest = self.substituteIPs( args )
             # Run cmd on node:
             node.sendCmd( rest )
             self.waitForNode( node )
+            self.invalidateIPs( rest, [ node ] )
         else:
             error( '*** Unknown command: %s\n' % line )
 
+    def substituteIPs( self, args ):
+        """Substitute IP addresses for node names in a command
+           args: command string
+           returns: command with node names replaced"""
+        rest = args.split( ' ' )
+        # Use cached addresses, which are kept up to date by setIP()
+        # and invalidated by commands that may change them.
+        # If cachedIP() returns None, then use node name
+        rest = [ self.mn[ arg ].defaultIntf().cachedIP() or arg
+                 if arg in self.mn else arg
+                 for arg in rest ]
+        return ' '.join( rest )
+
+    # Commands that may change a node's addresses behind our back
+    addrCmds = re.compile( r'\b(ip|ifconfig|dhclient|udhcpc|dhcpcd)\b' )
+
+    def invalidateIPs( self, cmd, nodes ):
+        """Invalidate cached addresses if cmd may have changed them
+           cmd: command that was run
+           nodes: nodes it was run on"""
+        if self.addrCmds.search( cmd ):
+            for node in nodes:
+                node.invalidateIPs()
+
     def waitForNode( self, node ):
         "Wait for a node to finish, and print its output."
-        # Pollers
-        nodePoller = poll()
-        nodePoller.register( node.stdout )
-        bothPoller = poll()
-        bothPoller.register( self.stdin, POLLIN )
-        bothPoller.register( node.stdout, POLLIN )
         if self.isatty():
             # Buffer by character, so that interactive
             # commands sort of work
-            quietRun( 'stty -icanon min 1' )
-        while True:
-            try:
-                bothPoller.poll()
-                # XXX BL: this doesn't quite do what we want.
-                # pylint: disable=condition-evals-to-constant
-                if False and self.inputFile:
-                    key = self.inputFile.read( 1 )
-                    if key != '':
-                        node.write( key )
-                    else:
-                        self.inputFile = None
-                # pylint: enable=condition-evals-to-constant
-                if isReadable( self.inPoller ):
-                    key = self.stdin.read( 1 )
-                    node.write( key )
-                if isReadable( nodePoller ):
-                    data = node.monitor()
+            self.setTermMode( charMode=True )
+        fd = node.stdout.fileno()
+        inFd = self.stdin.fileno()
+        self.bothPoller.register( fd, POLLIN )
+        try:
+            while node.waiting:
+                try:
+                    events = dict( self.bothPoller.poll() )
+                    if events.get( inFd, 0 ) & ( POLLIN | POLLHUP ):
+                        # Forward whatever input is available
+                        data = os.read( inFd, 1024 )
+                        if data:
+                            node.write( self.inDecoder.decode( data ) )
+                        else:
+                            # EOF: stop polling stdin until next time
+                            self.bothPoller.unregister( inFd )
+                            inFd = None
+                    event = events.get( fd, 0 )
+                    data = node.monitor() if event & POLLIN else ''
                     output( data )
-                if not node.waiting:
-                    break
-            except KeyboardInterrupt:
-                # There is an at least one race condition here, since
-                # it's possible to interrupt ourselves after we've
-                # read data but before it has been printed.
-                node.sendInt()
-            except select.error as e:
-                # pylint: disable=unpacking-non-sequence
-                # pylint: disable=unbalanced-tuple-unpacking
-                errno_, errmsg = e.args
-                if errno_ != errno.EINTR:
-                    error( "select.error: %s, %s" % (errno_, errmsg) )
+                    if not data and event & ( POLLHUP | POLLERR ):
+                        error( '*** %s: shell has exited\n' % node )
+                        node.waiting = False
+                except KeyboardInterrupt:
+                    # There is an at least one race condition here, since
+                    # it's possible to interrupt ourselves after we've
+                    # read data but before it has been printed.
                     node.sendInt()
+                except select.error as e:
+                    # pylint: disable=unpacking-non-sequence
+                    # pylint: disable=unbalanced-tuple-unpacking
+                    errno_, errmsg = e.args
+                    if errno_ != errno.EINTR:
+                        error( "select.error: %s, %s" % (errno_, errmsg) )
+                        node.sendInt()
+        finally:
+            self.bothPoller.unregister( fd )
+            if inFd is None:
+                self.bothPoller.register( self.stdin, POLLIN )
 
     def precmd( self, line ):
         "allow for comments in the cli"
@@ -27,7 +27,7 @@
 import re
 
 from mininet.log import info, error, debug
-from mininet.util import makeIntfPair
+from mininet.util import makeIntfPair, ipLinkStates
 
 # Make pylint happy:
 # pylint: disable=too-many-arguments
@@ -37,6 +37,11 @@ class Intf( object ):
 
     "Basic interface object that can configure itself."
 
+    # Use __slots__ to keep large numbers of interfaces small;
+    # subclasses should define __slots__ for any attributes they add
+    __slots__ = ( 'node', 'name', 'link', 'mac', 'ip', 'prefixLen',
+                  'ipValid', '_params' )
+
     def __init__( self, name, node=None, port=None, link=None,
                   mac=None, **params ):
         """name: interface name (e.g. h1-eth0)
@@ -48,12 +53,15 @@ def __init__( self, name, node=None, port=None, link=None,
         self.link = link
         self.mac = mac
         self.ip, self.prefixLen = None, None
+        # Is self.ip known to match the interface's address?
+        self.ipValid = False
 
         # if interface is lo, we know the ip is 127.0.0.1.
         # This saves an ifconfig command per node
         if self.name == 'lo':
             self.ip = '127.0.0.1'
             self.prefixLen = 8
+            self.ipValid = True
         # Add to node (and move ourselves if necessary )
         if node:
             moveIntfFn = params.pop( 'moveIntfFn', None )
@@ -65,6 +73,16 @@ def __init__( self, name, node=None, port=None, link=None,
         self.params = params
         self.config( **params )
 
+    @property
+    def params( self ):
+        "Parameters we were configured with"
+        return self._params if self._params is not None else {}
+
+    @params.setter
+    def params( self, params ):
+        "Only keep params if there are any"
+        self._params = params or None
+
     def cmd( self, *args, **kwargs ):
         "Run a command in our owning node"
         return self.node.cmd( *args, **kwargs )
@@ -79,13 +97,16 @@ def setIP( self, ipstr, prefixLen=None ):
         # mechanism and/or the way we specify IP addresses
         if '/' in ipstr:
             self.ip, self.prefixLen = ipstr.split( '/' )
-            return self.ifconfig( ipstr, 'up' )
+            result = self.ifconfig( ipstr, 'up' )
         else:
             if prefixLen is None:
                 raise Exception( 'No prefix length set for IP address %s'
                                  % ( ipstr, ) )
             self.ip, self.prefixLen = ipstr, prefixLen
-            return self.ifconfig( '%s/%s' % ( ipstr, prefixLen ) )
+            result = self.ifconfig( '%s/%s' % ( ipstr, prefixLen ) )
+        # ifconfig is silent if it worked; if not, cachedIP() asks again
+        self.ipValid = result is not None and not result.strip()
+        return result
 
     def setMAC( self, macstr ):
         """Set the MAC address for an interface.
@@ -106,8 +127,24 @@ def updateIP( self ):
             'ifconfig %s' % self.name )
         ips = self._ipMatchRegex.findall( ifconfig )
         self.ip = ips[ 0 ] if ips else None
+        self.ipValid = True
         return self.ip
 
+    def cachedIP( self ):
+        """Return IP address, calling updateIP() only if our address
+           may have been changed behind our back (see invalidateIP())
+           note: only setIP() and the CLI's node commands keep this up
+           to date; after changing addresses some other way (e.g. with
+           node.cmd( 'ip addr ...' ) in a script, or through the API),
+           call invalidateIP() or use updateIP()"""
+        if not self.ipValid:
+            return self.updateIP()
+        return self.ip
+
+    def invalidateIP( self ):
+        "Note that our address may have changed outside of setIP()"
+        self.ipValid = False
+
     def updateMAC( self ):
         "Return updated MAC address based on ifconfig"
         ifconfig = self.ifconfig()
@@ -126,6 +163,7 @@ def updateAddr( self ):
         macs = self._macMatchRegex.findall( ifconfig )
         self.ip = ips[ 0 ] if ips else None
         self.mac = macs[ 0 ] if macs else None
+        self.ipValid = True
         return self.ip, self.mac
 
     def IP( self ):
@@ -136,8 +174,13 @@ def MAC( self ):
         "Return MAC address"
         return self.mac
 
-    def isUp( self, setUp=False ):
-        "Return whether interface is up"
+    def isUp( self, setUp=False, states=None ):
+        """Return whether interface is up
+           setUp: bring interface up first
+           states: interface states for our node's namespace, from
+                   ipLinkStates(), to use instead of running ifconfig"""
+        if states is not None and not setUp:
+            return 'UP' in states.get( self.name, () )
         if setUp:
             cmdOutput = self.ifconfig( 'up' )
             # no output indicates success
@@ -213,10 +256,13 @@ def delete( self ):
         self.node.delIntf( self )
         self.link = None
 
-    def status( self ):
-        "Return intf status as a string"
-        links, _err, _result = self.node.pexec( 'ip link show' )
-        if self.name in links:
+    def status( self, states=None ):
+        """Return intf status as a string
+           states: interface states for our node's namespace, from
+                   ipLinkStates() (default: look them up now)"""
+        if states is None:
+            states = ipLinkStates( self.node )
+        if self.name in states:
             return "OK"
         else:
             return "MISSING"
@@ -233,6 +279,8 @@ class TCIntf( Intf ):
        Allows specification of bandwidth limits (various methods)
        as well as delay, loss and max queue length"""
 
+    __slots__ = ()
+
     # The parameters we use seem to work reasonably up to 1 Gb/sec
     # For higher data rates, we will probably need to change them.
     bwParamMax = 1000
@@ -410,6 +458,9 @@ class Link( object ):
     """A basic link is just a veth pair.
        Other types of links could be tunnels, link emulators, etc.."""
 
+    # As with Intf, subclasses should define __slots__
+    __slots__ = ( 'intf1', 'intf2', 'fast' )
+
     # pylint: disable=too-many-branches
     def __init__( self, node1, node2, port1=None, port2=None,
                   intfName1=None, intfName2=None, addr1=None, addr2=None,
@@ -513,9 +564,14 @@ def stop( self ):
         "Override to stop and clean up link as needed"
         self.delete()
 
-    def status( self ):
-        "Return link status as a string"
-        return "(%s %s)" % ( self.intf1.status(), self.intf2.status() )
+    def status( self, states=None ):
+        """Return link status as a string
+           states: { node: interface states } from Mininet.intfStates()
+                   (default: look them up for each interface)"""
+        states = states or {}
+        return "(%s %s)" % (
+            self.intf1.status( states.get( self.intf1.node ) ),
+            self.intf2.status( states.get( self.intf2.node ) ) )
 
     def __str__( self ):
         return '%s<->%s' % ( self.intf1, self.intf2 )
@@ -524,6 +580,8 @@ def __str__( self ):
 class OVSIntf( Intf ):
     "Patch interface on an OVSSwitch"
 
+    __slots__ = ()
+
     def ifconfig( self, *args ):
         cmd = ' '.join( args )
         if cmd == 'up':
@@ -538,6 +596,8 @@ class OVSLink( Link ):
        Warning: in testing we have found that no more
        than ~64 OVS patch links should be used in row."""
 
+    __slots__ = ( 'isPatchLink', )
+
     def __init__( self, node1, node2, **kwargs ):
         "See Link.__init__() for options"
         if 'OVSSwitch' not in globals():
@@ -561,6 +621,9 @@ def makeIntfPair( self, *args, **kwargs ):
 
 class TCLink( Link ):
     "Link with TC interfaces"
+
+    __slots__ = ()
+
     def __init__( self, *args, **kwargs):
         kwargs.setdefault( 'cls1', TCIntf )
         kwargs.setdefault( 'cls2', TCIntf )
@@ -577,6 +640,8 @@ class TCULink( TCLink ):
        to cope with this somehow, but it is likely to be an issue with
        many software Ethernet bridges."""
 
+    __slots__ = ()
+
     def __init__( self, *args, **kwargs ):
         kwargs.update( txo=False, rxo=False )
         TCLink.__init__( self, *args, **kwargs )
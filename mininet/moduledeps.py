@@ -3,13 +3,17 @@
 from os import environ
 from sys import exit  # pylint: disable=redefined-builtin
 
-from mininet.util import quietRun, BaseString
+from mininet.util import quietRun, which, BaseString
 from mininet.log import info, error, debug
 
 
 def lsmod():
-    "Return output of lsmod."
-    return quietRun( 'lsmod' )
+    "Return list of loaded modules (from /proc/modules, else lsmod)."
+    try:
+        with open( '/proc/modules' ) as f:
+            return f.read()
+    except ( IOError, OSError ):
+        return quietRun( 'lsmod' )
 
 def rmmod( mod ):
     """Return output of lsmod.
@@ -65,7 +69,7 @@ def pathCheck( *args, **kwargs ):
     "Make sure each program in *args can be found in $PATH."
     moduleName = kwargs.get( 'moduleName', 'it' )
     for arg in args:
-        if not quietRun( 'which ' + arg ):
+        if not which( arg ):
             error( 'Cannot find required executable %s.\n' % arg +
                    'Please make sure that %s is installed ' % moduleName +
                    'and available in your $PATH:\n(%s)\n' % environ[ 'PATH' ] )
@@ -95,17 +95,21 @@
 from sys import exit  # pylint: disable=redefined-builtin
 from time import sleep
 from itertools import chain, groupby
+from functools import partial
 from math import ceil
 
 from mininet.cli import CLI
 from mininet.log import info, error, output, warn, debug
 from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController,
-                           Controller )
+                           Controller, CPUPlacer )
 from mininet.nodelib import NAT
-from mininet.link import Link, Intf
+from mininet.api import APIServer
+from mininet.link import Link, Intf, TCIntf
+from mininet.topo import Topo, topoDiff, linkKey
 from mininet.util import ( quietRun, fixLimits, numCores, ensureRoot,
                            macColonHex, ipStr, ipParse, netParse, ipAdd,
-                           waitListening, BaseString, fmtBps )
+                           waitListening, BaseString, fmtBps, runParallel,
+                           ipBatch, ipLinkStates )
 from mininet.term import cleanUpScreens, makeTerms
 
 # Mininet version: should be consistent with README and LICENSE
@@ -120,7 +124,8 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
                   build=True, xterms=False, cleanup=False, ipBase='10.0.0.0/8',
                   inNamespace=False,
                   autoSetMacs=False, autoStaticArp=False, autoPinCpus=False,
-                  listenPort=None, waitConnected=False ):
+                  listenPort=None, waitConnected=False, workers=None,
+                  pool=None, api=None, shards=None ):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -136,10 +141,18 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
            autoSetMacs: set MAC addrs automatically like IP addresses?
            autoStaticArp: set all-pairs static MAC addrs?
            autoPinCpus: pin hosts to (real) cores (requires CPULimitedHost)?
+               (True or a CPUPlacer for topology-aware placement)
            listenPort: base listening port to open; will be incremented for
                each additional switch in the net if inNamespace=False
            waitConnected: wait for switches to Connect?
-               (False; True/None=wait indefinitely; time(s)=timed wait)"""
+               (False; True/None=wait indefinitely; time(s)=timed wait)
+           workers: max number of nodes to configure concurrently
+               (None=number of cores; 1=configure one at a time)
+           pool: NodePool to take host shells from and return them to
+           api: unix socket path for the control API (see mininet.api),
+               which runs while the network is started
+           shards: number of worker processes to run host and switch
+               shells in (see mininet.shard; default: run them here)"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -158,9 +171,26 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.autoStaticArp = autoStaticArp
         self.autoPinCpus = autoPinCpus
         self.numCores = numCores()
-        self.nextCore = 0  # next core for pinning hosts to CPUs
+        self.cpuPlacer = None
+        if autoPinCpus:
+            self.cpuPlacer = ( autoPinCpus if isinstance(
+                autoPinCpus, CPUPlacer ) else CPUPlacer() )
+        self.cpuPlacement = {}  # host name -> ( core, NUMA node )
         self.listenPort = listenPort
         self.waitConn = waitConnected
+        self.workers = workers
+        self.pool = pool
+        self.apiPath = api
+        self.api = None
+        self.started = False
+        self.shards = []
+        self.nextShard = 0
+        if shards:
+            # Python 3 only, so import it only if we need it
+            # pylint: disable=import-outside-toplevel
+            from mininet.shard import Shard
+            info( '*** Starting %d shards\n' % shards )
+            self.shards = [ Shard( i ) for i in range( shards ) ]
 
         self.hosts = []
         self.switches = []
@@ -169,6 +199,12 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
 
         self.nameToNode = {}  # name to Node (Host/Switch) objects
 
+        # Link index: nodeLinks[ node1 ][ node2 ] is the list of links
+        # between node1 and node2 (shared by both directions), and
+        # linkNodes[ link ] is ( node1, node2 )
+        self.nodeLinks = {}
+        self.linkNodes = {}
+
         self.terms = []  # list of spawned xterm processes
 
         Mininet.init()  # Initialize Mininet if necessary
@@ -222,18 +258,37 @@ def addHost( self, name, cls=None, **params ):
                                   '/%s' % self.prefixLen }
         if self.autoSetMacs:
             defaults[ 'mac' ] = macColonHex( self.nextIP )
-        if self.autoPinCpus:
-            defaults[ 'cores' ] = self.nextCore
-            self.nextCore = ( self.nextCore + 1 ) % self.numCores
+        if self.pool:
+            defaults[ 'pool' ] = self.pool
+        if self.cpuPlacer:
+            core, node = ( self.cpuPlacement.get( name ) or
+                           self.cpuPlacer.next() )
+            defaults.update( cores=core, mems=node )
         self.nextIP += 1
         defaults.update( params )
         if not cls:
             cls = self.host
+        self.placeShard( cls, defaults )
         h = cls( name, **defaults )
         self.hosts.append( h )
         self.nameToNode[ name ] = h
         return h
 
+    def placeShard( self, cls, params ):
+        """Pick a shard (round-robin) for a new node, if we have shards
+           and its class starts its shell using Node.startShell()
+           cls: node class or constructor
+           params: node parameters, to add 'shard' to"""
+        if not self.shards or 'shard' in params:
+            return
+        while isinstance( cls, partial ):
+            cls = cls.func
+        if getattr( cls, 'startShell', None ) is not Node.startShell:
+            # Class runs its shell its own way
+            return
+        params[ 'shard' ] = self.shards[ self.nextShard ]
+        self.nextShard = ( self.nextShard + 1 ) % len( self.shards )
+
     def delNode( self, node, nodes=None):
         """Delete node
            node: node to delete
@@ -247,6 +302,15 @@ def delNode( self, node, nodes=None):
         node.terminate()
         nodes.remove( node )
         del self.nameToNode[ node.name ]
+        # Our links went away with our interfaces
+        for peer in list( self.nodeLinks.get( node, {} ) ):
+            for link in list( self.nodeLinks[ node ][ peer ] ):
+                self.unindexLink( link )
+                self.links.remove( link )
+                for intf in link.intf1, link.intf2:
+                    if intf and intf.node is not node:
+                        intf.node.delIntf( intf )
+        self.nodeLinks.pop( node, None )
 
     def delHost( self, host ):
         "Delete a host"
@@ -263,6 +327,7 @@ def addSwitch( self, name, cls=None, **params ):
         defaults.update( params )
         if not cls:
             cls = self.switch
+        self.placeShard( cls, defaults )
         sw = cls( name, **defaults )
         if not self.inNamespace and self.listenPort:
             self.listenPort += 1
@@ -405,19 +470,39 @@ def addLink( self, node1, node2, port1=None, port2=None,
         cls = self.link if cls is None else cls
         link = cls( node1, node2, **options )
         self.links.append( link )
+        self.indexLink( link, node1, node2 )
         return link
 
+    def indexLink( self, link, node1, node2 ):
+        """Add link to our node pair -> link index
+           link: link to add
+           node1, node2: nodes that link connects"""
+        self.linkNodes[ link ] = ( node1, node2 )
+        peers1 = self.nodeLinks.setdefault( node1, {} )
+        peers2 = self.nodeLinks.setdefault( node2, {} )
+        links = peers1.setdefault( node2, [] )
+        peers2[ node1 ] = links
+        links.append( link )
+
+    def unindexLink( self, link ):
+        """Remove link from our node pair -> link index
+           link: link to remove"""
+        node1, node2 = self.linkNodes.pop( link )
+        links = self.nodeLinks[ node1 ][ node2 ]
+        links.remove( link )
+        if not links:
+            del self.nodeLinks[ node1 ][ node2 ]
+            self.nodeLinks[ node2 ].pop( node1, None )
+
     def delLink( self, link ):
         "Remove a link from this network"
+        self.unindexLink( link )
         link.delete()
         self.links.remove( link )
 
     def linksBetween( self, node1, node2 ):
         "Return Links between node1 and node2"
-        return [ link for link in self.links
-                 if ( node1, node2 ) in (
-                    ( link.intf1.node, link.intf2.node ),
-                    ( link.intf2.node, link.intf1.node ) ) ]
+        return list( self.nodeLinks.get( node1, {} ).get( node2, () ) )
 
     def delLinkBetween( self, node1, node2, index=0, allLinks=False ):
         """Delete link(s) between node1 and node2
@@ -432,9 +517,12 @@ def delLinkBetween( self, node1, node2, index=0, allLinks=False ):
         return links
 
     def configHosts( self ):
-        "Configure a set of hosts."
-        for host in self.hosts:
-            info( host.name + ' ' )
+        """Configure a set of hosts.
+           Hosts are independent, so we configure up to self.workers
+           of them at a time."""
+
+        def configHost( host ):
+            "Configure a single host"
             intf = host.defaultIntf()
             if intf:
                 host.configDefault()
@@ -447,7 +535,15 @@ def configHosts( self ):
             # quietRun( 'renice +18 -p ' + repr( host.pid ) )
             # This may not be the right place to do this, but
             # it needs to be done somewhere.
+            info( host.name + ' ' )
+        results = runParallel( configHost, self.hosts, self.workers )
         info( '\n' )
+        failed = [ ( host, err ) for host, _result, err in results if err ]
+        for host, err in failed:
+            error( '*** Error configuring %s: %s\n' % ( host, err ) )
+        if failed:
+            raise Exception( 'configHosts: could not configure %s' %
+                             ' '.join( host.name for host, _err in failed ) )
 
     def buildFromTopo( self, topo=None ):
         """Build mininet from a topology object
@@ -474,19 +570,17 @@ def buildFromTopo( self, topo=None ):
                 else:
                     self.addController( 'c%d' % i, cls )
 
+        if self.cpuPlacer:
+            self.cpuPlacement.update( self.cpuPlacer.place( topo ) )
+
         info( '*** Adding hosts:\n' )
         for hostName in topo.hosts():
-            self.addHost( hostName, **topo.nodeInfo( hostName ) )
+            self.addTopoNode( topo, hostName )
             info( hostName + ' ' )
 
         info( '\n*** Adding switches:\n' )
         for switchName in topo.switches():
-            # A bit ugly: add batch parameter if appropriate
-            params = topo.nodeInfo( switchName)
-            cls = params.get( 'cls', self.switch )
-            if hasattr( cls, 'batchStartup' ):
-                params.setdefault( 'batch', True )
-            self.addSwitch( switchName, **params )
+            self.addTopoNode( topo, switchName )
             info( switchName + ' ' )
 
         info( '\n*** Adding links:\n' )
@@ -497,6 +591,174 @@ def buildFromTopo( self, topo=None ):
 
         info( '\n' )
 
+    def addTopoNode( self, topo, name ):
+        """Add a host or switch from a topology
+           topo: Topo
+           name: node name
+           returns: added node"""
+        params = dict( topo.nodeInfo( name ) )
+        if not topo.isSwitch( name ):
+            return self.addHost( name, **params )
+        # A bit ugly: add batch parameter if appropriate
+        cls = params.get( 'cls', self.switch )
+        if hasattr( cls, 'batchStartup' ):
+            params.setdefault( 'batch', True )
+        return self.addSwitch( name, **params )
+
+    # Intf parameters that TCIntf.config() can change in place
+    tcParams = ( 'bw', 'delay', 'jitter', 'loss', 'max_queue_size',
+                 'speedup', 'use_hfsc', 'use_tbf', 'latency_ms',
+                 'enable_ecn', 'enable_red' )
+
+    def findLink( self, linkInfo ):
+        """Return the Link matching a topology link, or None
+           linkInfo: link info dict"""
+        node1 = self[ linkInfo[ 'node1' ] ]
+        node2 = self[ linkInfo[ 'node2' ] ]
+        ends = set( [ ( node1, linkInfo[ 'port1' ] ),
+                      ( node2, linkInfo[ 'port2' ] ) ] )
+        for link in self.linksBetween( node1, node2 ):
+            if set( ( intf.node, intf.node.ports.get( intf ) )
+                    for intf in ( link.intf1, link.intf2 ) ) == ends:
+                return link
+        return None
+
+    def intfParams( self, linkInfo ):
+        """Return the tc parameters for each end of a topology link,
+           or None if its interfaces could not be reconfigured in place
+           linkInfo: link info dict
+           returns: ( params1, params2 ) or None"""
+        result = []
+        for n in '1', '2':
+            # As in Link(), link-wide params override params1/params2
+            params = dict( linkInfo.get( 'params' + n, {} ) )
+            params.update( linkInfo )
+            params = { k: v for k, v in params.items()
+                       if k in self.tcParams }
+            # TCIntf.config() doesn't clear settings if given none
+            if not any( params.get( k ) for k in
+                        ( 'bw', 'delay', 'loss', 'max_queue_size' ) ):
+                return None
+            result.append( params )
+        return tuple( result )
+
+    def canRetune( self, oldInfo, newInfo ):
+        """Can a changed link be reconfigured in place using tc?
+           oldInfo, newInfo: old and new link info dicts"""
+
+        def untuned( linkInfo ):
+            "Link info without tc parameters"
+            linkInfo = { k: v for k, v in linkInfo.items()
+                         if k not in self.tcParams }
+            for n in 'params1', 'params2':
+                if n in linkInfo:
+                    linkInfo[ n ] = { k: v for k, v in linkInfo[ n ].items()
+                                      if k not in self.tcParams }
+            return linkInfo
+        if untuned( oldInfo ) != untuned( newInfo ):
+            return False
+        link = self.findLink( oldInfo )
+        return bool( link and self.intfParams( newInfo ) and
+                     isinstance( link.intf1, TCIntf ) and
+                     isinstance( link.intf2, TCIntf ) )
+
+    def applyTopo( self, topo ):
+        """Change the network to match a new topology, creating,
+           deleting or reconfiguring only the nodes and links that
+           differ from the topology it was built from (self.topo).
+           Changed nodes are recreated, along with their links;
+           changed links are reconfigured with tc if possible,
+           and recreated otherwise.
+           topo: new Topo
+           returns: TopoDiff of the changes that were made"""
+        if self.topo is None and self.nameToNode:
+            # e.g. built with addHost() etc.: we can't tell which of
+            # our nodes and links the new topology already has
+            raise Exception( 'applyTopo: network has nodes but was not '
+                             'built from a topology' )
+        diff = topoDiff( self.topo or Topo(), topo )
+        if not self.built:
+            # Nothing to change yet: build() will use the new topology
+            self.topo = topo
+            return diff
+        renew = set( diff.delNodes + diff.changedNodes )
+        retune = [ ( old, new ) for old, new in diff.changedLinks
+                   if not renew.intersection(
+                       ( new[ 'node1' ], new[ 'node2' ] ) )
+                   and self.canRetune( old, new ) ]
+        retuned = set( linkKey( new ) for _old, new in retune )
+        # Links to delete; links to renewed nodes go away with them
+        delLinks = [ entry for entry in diff.delLinks + [
+            old for old, new in diff.changedLinks
+            if linkKey( new ) not in retuned ]
+            if not renew.intersection( ( entry[ 'node1' ],
+                                         entry[ 'node2' ] ) ) ]
+        # Links to add, including unchanged links to renewed nodes
+        addKeys = set( linkKey( entry ) for entry in diff.addLinks )
+        addKeys.update( linkKey( new ) for _old, new in diff.changedLinks
+                        if linkKey( new ) not in retuned )
+        addLinks = [ entry for _src, _dst, entry in
+                     topo.links( sort=True, withInfo=True )
+                     if linkKey( entry ) in addKeys or
+                     renew.intersection( ( entry[ 'node1' ],
+                                           entry[ 'node2' ] ) ) ]
+        info( '*** Applying topology changes: '
+              '%d nodes, %d links to delete, %d nodes, %d links to add, '
+              '%d links to reconfigure\n' % (
+                  len( renew ), len( delLinks ),
+                  len( diff.addNodes ) + len( diff.changedNodes ),
+                  len( addLinks ), len( retune ) ) )
+        for linkInfo in delLinks:
+            link = self.findLink( linkInfo )
+            if not link:
+                continue
+            for intf in link.intf1, link.intf2:
+                if hasattr( intf.node, 'detach' ):
+                    intf.node.detach( intf )
+            self.delLink( link )
+        for name in Topo.sorted( renew ):
+            node = self[ name ]
+            for intf in node.intfList():
+                link = intf.link
+                if not link:
+                    continue
+                peer = link.intf2 if intf is link.intf1 else link.intf1
+                if ( peer.node.name not in renew and
+                     hasattr( peer.node, 'detach' ) ):
+                    peer.node.detach( peer )
+            self.delNode( node )
+        newNodes = [ self.addTopoNode( topo, name ) for name in
+                     topo.sorted( diff.addNodes + diff.changedNodes ) ]
+        newSwitches = [ n for n in newNodes if n in self.switches ]
+        # Hosts that need to be (re)configured
+        config = set( n for n in newNodes if n in self.hosts )
+        for linkInfo in addLinks:
+            link = self.addLink( **linkInfo )
+            for intf in link.intf1, link.intf2:
+                node = intf.node
+                if node in newSwitches:
+                    continue
+                if hasattr( node, 'attach' ):
+                    node.attach( intf )
+                elif node in self.hosts and not node.IP():
+                    config.add( node )
+        for old, new in retune:
+            link = self.findLink( old )
+            params1, params2 = self.intfParams( new )
+            link.intf1.config( **params1 )
+            link.intf2.config( **params2 )
+        for host, _result, err in runParallel(
+                lambda h: h.configDefault(), list( config ), self.workers ):
+            if err:
+                error( '*** Error configuring %s: %s\n' % ( host, err ) )
+        if self.started:
+            self.startSwitches( newSwitches )
+        if self.autoStaticArp and ( config or renew ):
+            self.staticArp()
+        info( '\n' )
+        self.topo = topo
+        return diff
+
     def configureControlNetwork( self ):
         "Control net config hook: override in subclass"
         raise Exception( 'configureControlNetwork: '
@@ -540,6 +802,30 @@ def staticArp( self ):
                 if src != dst:
                     src.setARP( ip=dst.IP(), mac=dst.MAC() )
 
+    def intfStates( self, nodes=None ):
+        """Look up interface states with one ip -o link command per
+           network namespace rather than one per interface
+           nodes: nodes to look up (default: all nodes)
+           returns: { node: { intf name: set of flags } }"""
+        if nodes is None:
+            nodes = self.values()
+        # Nodes without shells (e.g. unused LazyHosts) can still pexec()
+        nodes = [ node for node in nodes if node.pid ]
+        rootNodes = [ node for node in nodes if not node.inNamespace ]
+        states = {}
+        if rootNodes:
+            # Nodes in the root namespace all see the same interfaces
+            rootStates = ipLinkStates()
+            states.update( ( node, rootStates ) for node in rootNodes )
+        nsNodes = [ node for node in nodes if node.inNamespace ]
+        for node, result, err in runParallel(
+                ipLinkStates, nsNodes, self.workers ):
+            if err:
+                error( '*** %s: could not get interface states: %s\n' %
+                       ( node, err ) )
+            states[ node ] = result or {}
+        return states
+
     def start( self ):
         "Start controller and switches."
         if not self.built:
@@ -550,40 +836,106 @@ def start( self ):
             controller.start()
         info( '\n' )
         info( '*** Starting %s switches\n' % len( self.switches ) )
-        for switch in self.switches:
+        self.startSwitches( self.switches )
+        info( '\n' )
+        self.started = True
+        if self.waitConn:
+            self.waitConnected( self.waitConn )
+        if self.apiPath and not self.api:
+            self.api = APIServer( self, self.apiPath,
+                                  workers=self.workers ).start()
+
+    def startSwitches( self, switches ):
+        """Start switches, using batchStartup() where available
+           switches: switches to start"""
+        for switch in switches:
             info( switch.name + ' ')
             switch.start( self.controllers )
         started = {}
-        for swclass, switches in groupby(
-                sorted( self.switches,
-                        key=lambda s: str( type( s ) ) ), type ):
-            switches = tuple( switches )
+        for swclass, group in groupby(
+                sorted( switches, key=lambda s: str( type( s ) ) ), type ):
+            group = tuple( group )
             if hasattr( swclass, 'batchStartup' ):
-                success = swclass.batchStartup( switches )
+                success = swclass.batchStartup( group )
                 started.update( { s: s for s in success } )
-        info( '\n' )
-        if self.waitConn:
-            self.waitConnected( self.waitConn )
+        return started
+
+    @staticmethod
+    def _isPlainLink( link ):
+        """Is link a veth pair whose stop() and delete() methods
+           are the stock Link/Intf ones?"""
+
+        def func( method ):
+            "Return underlying function (python 2 unbound methods)"
+            return getattr( method, '__func__', method )
+        cls = type( link )
+        if ( func( cls.stop ) is not func( Link.stop ) or
+             func( cls.delete ) is not func( Link.delete ) ):
+            return False
+        return all( intf and
+                    func( type( intf ).delete ) is func( Intf.delete )
+                    for intf in ( link.intf1, link.intf2 ) )
+
+    def stopLinks( self, links ):
+        """Stop a list of links.
+           Plain veth links with an end in the root namespace are
+           deleted using a single ip -batch command, since a namespace
+           (and the peers of its interfaces) may outlive its shell if
+           other processes are still running in it. Plain links between
+           namespaces are removed by the kernel when the namespaces go
+           away. Other links are stopped one at a time using link.stop().
+           links: links to stop"""
+        rootIntfs = []
+        for link in links:
+            if not self._isPlainLink( link ):
+                link.stop()
+                continue
+            intf1, intf2 = link.intf1, link.intf2
+            for intf in intf1, intf2:
+                if not intf.node.inNamespace:
+                    # Deleting one end of a veth pair deletes its peer
+                    rootIntfs.append( intf.name )
+                    break
+            for intf in intf1, intf2:
+                intf.node.delIntf( intf )
+                intf.link = None
+            link.intf1 = link.intf2 = None
+        if rootIntfs:
+            ipBatch( [ 'link del ' + name for name in rootIntfs ] )
+
+    @staticmethod
+    def terminateNodes( nodes ):
+        """Terminate a list of nodes, using batchTerminate() for
+           classes that don't override terminate()
+           nodes: nodes to terminate"""
+        for cls, group in groupby(
+                sorted( nodes, key=lambda n: str( type( n ) ) ), type ):
+            group = list( group )
+            if ( getattr( cls.terminate, '__func__', cls.terminate ) is
+                 getattr( Node.terminate, '__func__', Node.terminate ) ):
+                cls.batchTerminate( group )
+            else:
+                for node in group:
+                    node.terminate()
 
     def stop( self ):
         "Stop the controller(s), switches and hosts"
+        if self.api:
+            self.api.stop()
+            self.api = None
         info( '*** Stopping %i controllers\n' % len( self.controllers ) )
         for controller in self.controllers:
             info( controller.name + ' ' )
             controller.stop()
         info( '\n' )
         # Unlimit cfs hosts to speed up shutdown
-        for h in self.hosts:
-            if hasattr( h, 'unlimit' ):
-                h.unlimit()
+        limited = [ h for h in self.hosts if hasattr( h, 'unlimit' ) ]
+        runParallel( lambda h: h.unlimit(), limited, self.workers )
         if self.terms:
             info( '*** Stopping %i terms\n' % len( self.terms ) )
             self.stopXterms()
         info( '*** Stopping %i links\n' % len( self.links ) )
-        for link in self.links:
-            info( '.' )
-            link.stop()
-        info( '\n' )
+        self.stopLinks( self.links )
         info( '*** Stopping %i switches\n' % len( self.switches ) )
         stopped = {}
         for swclass, switches in groupby(
@@ -593,16 +945,22 @@ def stop( self ):
             if hasattr( swclass, 'batchShutdown' ):
                 success = swclass.batchShutdown( switches )
                 stopped.update( { s: s for s in success } )
-        for switch in self.switches:
-            info( switch.name + ' ' )
-            if switch not in stopped:
-                switch.stop()
-            switch.terminate()
-        info( '\n' )
+        remaining = [ s for s in self.switches if s not in stopped ]
+        for switch, _result, err in runParallel(
+                lambda s: s.stop(), remaining, self.workers ):
+            if err:
+                error( '*** Error stopping %s: %s\n' % ( switch, err ) )
+        self.terminateNodes( self.switches )
+        info( ' '.join( s.name for s in self.switches ) + '\n' )
         info( '*** Stopping %i hosts\n' % len( self.hosts ) )
-        for host in self.hosts:
-            info( host.name + ' ' )
-            host.terminate()
+        self.terminateNodes( self.hosts )
+        info( ' '.join( h.name for h in self.hosts ) )
+        if self.shards:
+            info( '\n*** Stopping %d shards' % len( self.shards ) )
+            for shard in self.shards:
+                shard.stop()
+            self.shards = []
+        self.started = False
         info( '\n*** Done\n' )
 
     def run( self, test, *args, **kwargs ):
@@ -872,6 +1230,13 @@ def runCpuLimitTest( self, cpu, duration=5 ):
         pct = cpu * 100
         info( '*** Testing CPU %.0f%% bandwidth limit\n' % pct )
         hosts = self.hosts
+        # Make sure we can read each host's CPU time from its cgroup
+        # before we start any processes
+        for host in hosts:
+            usage = getattr( host, 'cpuUsage', None )
+            if not usage or usage() is None:
+                raise Exception( 'runCpuLimitTest: could not read CPU usage '
+                                 'of %s from its cgroup' % host )
         cores = int( quietRun( 'nproc' ) )
         # number of processes to run a while loop on per host
         num_procs = int( ceil( cores * cpu ) )
@@ -884,19 +1249,16 @@ def runCpuLimitTest( self, cpu, duration=5 ):
         outputs = {}
         time = {}
         # get the initial cpu time for each host
+        # (from its cgroup, for either cgroup version)
         for host in hosts:
             outputs[ host ] = []
-            with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
-                       host, 'r' ) as f:
-                time[ host ] = float( f.read() )
+            time[ host ] = host.cpuUsage()
         for _ in range( duration ):
             sleep( 1 )
             for host in hosts:
-                with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
-                           host, 'r' ) as f:
-                    readTime = float( f.read() )
-                outputs[ host ].append( ( ( readTime - time[ host ] )
-                                        / 1000000000 ) / cores * 100 )
+                readTime = host.cpuUsage()
+                outputs[ host ].append( ( readTime - time[ host ] )
+                                        / cores * 100 )
                 time[ host ] = readTime
         for h, pids in pids.items():
             for pid in pids:
@@ -1010,13 +1372,20 @@ def configureRoutedControlNetwork( self, ip='192.168.123.1',
             switch.setHostRoute( cip, sintf )
         info( '\n' )
         info( '*** Testing control network\n' )
-        while not cintf.isUp():
-            info( '*** Waiting for', cintf, 'to come up\n' )
+        # Check all the control interfaces with one ip -o link per
+        # namespace rather than one ifconfig per interface
+        intfs = [ cintf ] + [ switch.controlIntf
+                              for switch in self.switches ]
+        while True:
+            states = self.intfStates( set( intf.node for intf in intfs ) )
+            down = [ intf for intf in intfs
+                     if not intf.isUp( states=states.get( intf.node, {} ) ) ]
+            if not down:
+                break
+            info( '*** Waiting for', ' '.join( str( intf ) for intf in down ),
+                  'to come up\n' )
             sleep( 1 )
         for switch in self.switches:
-            while not sintf.isUp():
-                info( '*** Waiting for', sintf, 'to come up\n' )
-                sleep( 1 )
             if self.ping( hosts=[ switch, controller ] ) != 0:
                 error( '*** Error: control network test failed\n' )
                 exit( 1 )
@@ -57,16 +57,20 @@
 import re
 import signal
 import select
+import socket
 from re import findall
 from subprocess import Popen, PIPE
 from sys import exit  # pylint: disable=redefined-builtin
+from threading import Lock
+from weakref import WeakValueDictionary
 from time import sleep
 
 from mininet.log import info, error, warn, debug
 from mininet.util import ( quietRun, errRun, errFail, moveIntf, isShellBuiltin,
                            numCores, retry, mountCgroups, BaseString, decode,
                            encode, getincrementaldecoder, Python3, which,
-                           StrictVersion )
+                           StrictVersion, cpuTopology, cpuNodes, natural,
+                           cgroupMounts, cachedProbe, portOpen )
 from mininet.moduledeps import moduleDeps, pathCheck, TUN
 from mininet.link import Link, Intf, TCIntf, OVSIntf
 
@@ -74,6 +78,11 @@
 # pylint: disable=too-many-arguments
 
 
+class ShellBusy( AssertionError ):
+    """A node's shell is running another command (or isn't running);
+       an AssertionError, since that is what sendCmd() used to raise"""
+
+
 class Node( object ):
     """A virtual network node is simply a shell in a network namespace.
        We communicate with it using pipes."""
@@ -84,6 +93,11 @@ def __init__( self, name, inNamespace=True, **params ):
         """name: name of node
            inNamespace: in network namespace?
            privateDirs: list of private directory strings or tuples
+           pool: NodePool to take our shell from (optional)
+           transport: talk to our shell using a 'pty' (default)
+               or a 'socket' pair
+           shard: Shard to start our shell and run cmd() in
+               (optional; see mininet.shard)
            params: Node parameters (see config() for details)"""
 
         # Make sure class actually works
@@ -108,16 +122,33 @@ def __init__( self, name, inNamespace=True, **params ):
 
         self.nameToIntf = {}  # dict of interface names to Intfs
 
+        # Cache of connectionsTo() results, indexed by peer node
+        self.peerIntfs = None
+
         # Make pylint happy
         ( self.shell, self.execed, self.pid, self.stdin, self.stdout,
             self.lastPid, self.lastCmd, self.pollOut ) = (
                 None, None, None, None, None, None, None, None )
         self.waiting = False
+        # Makes checking and setting waiting atomic, so that only one
+        # thread at a time can use our shell
+        self.shellLock = Lock()
         self.readbuf = ''
 
         # Incremental decoder for buffered reading
         self.decoder = getincrementaldecoder()
 
+        # Optional NodePool to take our shell from and return it to
+        self.pool = params.get( 'pool' )
+
+        # How we talk to our shell: 'pty' or 'socket'
+        self.transport = params.get( 'transport', 'pty' )
+        if self.transport not in ( 'pty', 'socket' ):
+            raise Exception( 'unknown transport %s' % self.transport )
+
+        # Shard that our shell is running in, if any
+        self.shard = None
+
         # Start command interpreter shell
         self.master, self.slave = None, None  # pylint
         self.startShell()
@@ -126,8 +157,10 @@ def __init__( self, name, inNamespace=True, **params ):
     # File descriptor to node mapping support
     # Class variables and methods
 
-    inToNode = {}  # mapping of input fds to nodes
-    outToNode = {}  # mapping of output fds to nodes
+    # Entries are removed in cleanup(), and the weak references
+    # keep us from holding on to nodes that were never cleaned up
+    inToNode = WeakValueDictionary()  # mapping of input fds to nodes
+    outToNode = WeakValueDictionary()  # mapping of output fds to nodes
 
     @classmethod
     def fdToNode( cls, fd ):
@@ -137,55 +170,156 @@ def fdToNode( cls, fd ):
         node = cls.outToNode.get( fd )
         return node or cls.inToNode.get( fd )
 
+    def registerFds( self ):
+        "Add our shell's file descriptors to inToNode/outToNode"
+        self.outToNode[ self.stdout.fileno() ] = self
+        self.inToNode[ self.stdin.fileno() ] = self
+
+    def unregisterFds( self ):
+        "Remove our shell's file descriptors from inToNode/outToNode"
+        for fdToNode, f in ( ( self.outToNode, self.stdout ),
+                             ( self.inToNode, self.stdin ) ):
+            fd = f.fileno()
+            # The fd may have been reused by another node
+            if fdToNode.get( fd ) is self:
+                del fdToNode[ fd ]
+
     # Command support via shell process in namespace
     def startShell( self, mnopts=None ):
         "Start a shell process for running commands"
         if self.shell:
             error( "%s: shell is already running\n" % self.name )
             return
+        if mnopts is None and self.canPool():
+            state = self.pool.get( self.transport )
+            if state:
+                debug( '%s: using pooled shell %s\n' % (
+                    self.name, state[ 'pid' ] ) )
+                self.attachShell( state )
+                return
+        if mnopts is None and self.params.get( 'shard' ):
+            self.startShardShell( self.params[ 'shard' ] )
+            return
         # mnexec: (c)lose descriptors, (d)etach from tty,
         # (p)rint pid, and run in (n)amespace
         opts = '-cd' if mnopts is None else mnopts
         if self.inNamespace:
             opts += 'n'
+        self.spawnShell( [ 'mnexec', opts ] )
+        self.pid = self.shell.pid
+
+    def spawnShell( self, mncmd ):
+        """Spawn our command shell and wait for its prompt
+           mncmd: mnexec command (list) to run the shell with"""
         # bash -i: force interactive
         # -s: pass $* to shell, and make process easy to find in ps
         # prompt is set to sentinel chr( 127 )
-        cmd = [ 'mnexec', opts, 'env', 'PS1=' + chr( 127 ),
-                'bash', '--norc', '--noediting',
-                '-is', 'mininet:' + self.name ]
-
-        # Spawn a shell subprocess in a pseudo-tty, to disable buffering
-        # in the subprocess and insulate it from signals (e.g. SIGINT)
-        # received by the parent
-        self.master, self.slave = pty.openpty()
+        cmd = mncmd + [ 'env', 'PS1=' + chr( 127 ),
+                        'bash', '--norc', '--noediting',
+                        '-is', 'mininet:' + self.name ]
+
+        if self.transport == 'socket':
+            # A socketpair has no pty limit or termios processing,
+            # but commands see that their output isn't a terminal
+            self.master, self.slave = self.openSocketpair()
+        else:
+            # Spawn a shell subprocess in a pseudo-tty, to disable
+            # buffering in the subprocess and insulate it from signals
+            # (e.g. SIGINT) received by the parent
+            self.master, self.slave = pty.openpty()
         self.shell = self._popen( cmd, stdin=self.slave, stdout=self.slave,
                                   stderr=self.slave, close_fds=False )
+        if self.transport == 'socket':
+            # The shell has its own copy of our socket
+            os.close( self.slave )
+            self.slave = None
+        self.openShellIO()
+        # Wait for prompt
+        while True:
+            data = self.read( 1024 )
+            if data[ -1 ] == chr( 127 ):
+                break
+            self.pollOut.poll()
+        self.waiting = False
+        # +m: disable job control notification
+        if self.transport == 'socket':
+            self.cmd( 'unset HISTFILE; set +m' )
+        else:
+            self.cmd( 'unset HISTFILE; stty -echo; set +m' )
+
+    def startShardShell( self, shard ):
+        """Have a shard start our shell, and talk to it using our
+           copy of its pty or socket
+           shard: Shard"""
+        self.shell, self.master = shard.startShell( self )
+        debug( '%s: shell %d in shard%d\n' % (
+            self.name, self.shell.pid, shard.index ) )
+        self.shard = shard
+        # The shard holds the other end of our pty or socket
+        self.slave = None
+        self.pid = self.shell.pid
+        self.openShellIO()
+        self.waiting = False
+
+    def openShellIO( self ):
+        "Set up our I/O state for talking to our shell via self.master"
         # XXX BL: This doesn't seem right, and we should also probably
         # close our files when we exit...
         self.stdin = os.fdopen( self.master, 'r' )
         self.stdout = self.stdin
-        self.pid = self.shell.pid
         self.pollOut = select.poll()
         self.pollOut.register( self.stdout )
         # Maintain mapping between file descriptors and nodes
         # This is useful for monitoring multiple nodes
         # using select.poll()
-        self.outToNode[ self.stdout.fileno() ] = self
-        self.inToNode[ self.stdin.fileno() ] = self
+        self.registerFds()
         self.execed = False
         self.lastCmd = None
         self.lastPid = None
         self.readbuf = ''
-        # Wait for prompt
-        while True:
-            data = self.read( 1024 )
-            if data[ -1 ] == chr( 127 ):
-                break
-            self.pollOut.poll()
+
+    @staticmethod
+    def openSocketpair():
+        """Open a connected pair of unix stream sockets
+           returns: file descriptors for our end and the shell's end"""
+        ours, theirs = socket.socketpair()
+        fds = os.dup( ours.fileno() ), os.dup( theirs.fileno() )
+        ours.close()
+        theirs.close()
+        return fds
+
+    # Shell state that moves with a shell to and from a NodePool
+    shellAttrs = ( 'shell', 'master', 'slave', 'stdin', 'stdout', 'pid',
+                   'pollOut', 'decoder', 'readbuf', 'execed', 'lastCmd',
+                   'lastPid', 'waiting' )
+
+    # Set to False in subclasses whose shells can't be reused
+    poolable = True
+
+    def canPool( self ):
+        "Can we take our shell from, and return it to, self.pool?"
+        return bool( self.pool and self.poolable and self.inNamespace and
+                     not self.params.get( 'shard' ) )
+
+    def detachShell( self ):
+        """Detach our shell so that it can be used by another node
+           returns: dict of shell state for attachShell()"""
+        state = { attr: getattr( self, attr ) for attr in self.shellAttrs }
+        # A shell can only be reused by a node with the same transport
+        state[ 'transport' ] = self.transport
+        self.unregisterFds()
+        for attr in self.shellAttrs:
+            setattr( self, attr, None )
+        self.readbuf = ''
         self.waiting = False
-        # +m: disable job control notification
-        self.cmd( 'unset HISTFILE; stty -echo; set +m' )
+        return state
+
+    def attachShell( self, state ):
+        """Use a shell detached from another node
+           state: shell state from detachShell()"""
+        for attr in self.shellAttrs:
+            setattr( self, attr, state[ attr ] )
+        self.registerFds()
 
     def mountPrivateDirs( self ):
         "mount private directories"
@@ -231,13 +365,17 @@ def cleanup( self ):
         # if self.name in intfName:
         # quietRun( 'ip link del ' + intfName )
         if self.shell:
+            self.unregisterFds()
             # Close ptys
             self.stdin.close()
-            os.close(self.slave)
-            if self.waitExited:
+            if self.slave is not None:
+                os.close(self.slave)
+            # Our shard also cleans up its side when it reaps our shell
+            if self.waitExited or self.shard:
                 debug( 'waiting for', self.pid, 'to terminate\n' )
                 self.shell.wait()
         self.shell = None
+        self.shard = None
 
     # Subshell I/O, commands and control
 
@@ -275,11 +413,33 @@ def write( self, data ):
     def terminate( self ):
         "Send kill signal to Node and clean up after it."
         self.unmountPrivateDirs()
+        if self.canPool() and self.pool.put( self ):
+            return
         if self.shell:
             if self.shell.poll() is None:
                 os.killpg( self.shell.pid, signal.SIGHUP )
         self.cleanup()
 
+    @classmethod
+    def batchTerminate( cls, nodes ):
+        """Terminate a list of nodes together: signal all of their
+           shells at once and then reap them, so that we wait for
+           the slowest node rather than for every node in turn.
+           Note: this does not call terminate(), so it should only be
+           used for classes that don't override it.
+           nodes: nodes to terminate
+           returns: terminated nodes"""
+        for node in nodes:
+            node.unmountPrivateDirs()
+        kill = [ node for node in nodes
+                 if not ( node.canPool() and node.pool.put( node ) ) ]
+        for node in kill:
+            if node.shell and node.shell.poll() is None:
+                os.killpg( node.shell.pid, signal.SIGHUP )
+        for node in kill:
+            node.cleanup()
+        return nodes
+
     def stop( self, deleteIntfs=False ):
         """Stop node.
            deleteIntfs: delete interfaces? (False)"""
@@ -299,8 +459,8 @@ def sendCmd( self, *args, **kwargs ):
         """Send a command, followed by a command to echo a sentinel,
            and return without waiting for the command to complete.
            args: command and arguments, or string
-           printPid: print command's PID? (False)"""
-        assert self.shell and not self.waiting
+           printPid: print command's PID? (False)
+           raises: ShellBusy if our shell is busy"""
         printPid = kwargs.get( 'printPid', False )
         # Allow sendCmd( [ list ] )
         if len( args ) == 1 and isinstance( args[ 0 ], list ):
@@ -314,19 +474,36 @@ def sendCmd( self, *args, **kwargs ):
         if not re.search( r'\w', cmd ):
             # Replace empty commands with something harmless
             cmd = 'echo -n'
-        self.lastCmd = cmd
+        line = cmd
         # if a builtin command is backgrounded, it still yields a PID
         if len( cmd ) > 0 and cmd[ -1 ] == '&':
             # print ^A{pid}\n so monitor() can set lastPid
-            cmd += ' printf "\\001%d\\012" $! '
+            line += ' printf "\\001%d\\012" $! '
         elif printPid and not isShellBuiltin( cmd ):
-            cmd = 'mnexec -p ' + cmd
-        self.write( cmd + '\n' )
+            line = 'mnexec -p ' + cmd
+        if not self.claimShell():
+            raise ShellBusy( '%s: shell is busy or not running' % self )
+        self.lastCmd = cmd
         self.lastPid = None
-        self.waiting = True
+        self.write( line + '\n' )
+
+    def claimShell( self ):
+        """Mark our shell as busy, unless it already is; the owner
+           releases it when waitOutput()/monitor() clear waiting
+           returns: True if we claimed our shell"""
+        with self.shellLock:
+            if not self.shell or self.waiting:
+                return False
+            self.waiting = True
+            return True
 
     def sendInt( self, intr=chr( 3 ) ):
         "Interrupt running command."
+        if self.transport == 'socket':
+            # No tty to turn ^C into SIGINT, so send it ourselves
+            debug( 'sendInt: sending SIGINT to %d\n' % self.shell.pid )
+            os.killpg( self.shell.pid, signal.SIGINT )
+            return
         debug( 'sendInt: writing chr(%d)\n' % ord( intr ) )
         self.write( intr )
 
@@ -339,10 +516,15 @@ def monitor( self, timeoutms=None, findPid=True ):
         if not ready:
             return ''
         data = self.read( 1024 )
-        pidre = r'\[\d+\] \d+\r\n'
+        # ptys turn \n into \r\n; sockets don't
+        pidre = r'\[\d+\] \d+\r?\n'
         # Look for PID
-        marker = chr( 1 ) + r'\d+\r\n'
-        if findPid and chr( 1 ) in data:
+        marker = chr( 1 ) + r'\d+\r?\n'
+        # The job line of a backgrounded command may arrive before
+        # (and without) its PID marker
+        bgJob = ( self.lastCmd and self.lastCmd[ -1 ] == '&' and
+                  re.findall( pidre, data ) )
+        if findPid and ( chr( 1 ) in data or bgJob ):
             # suppress the job and PID of a backgrounded command
             if re.findall( pidre, data ):
                 data = re.sub( pidre, '', data )
@@ -382,7 +564,15 @@ def cmd( self, *args, **kwargs ):
         verbose = kwargs.get( 'verbose', False )
         log = info if verbose else debug
         log( '*** %s : %s\n' % ( self.name, args ) )
-        if self.shell:
+        if self.shell and self.shard:
+            # Our shard runs the command, using another core
+            if not self.claimShell():
+                raise ShellBusy( '%s: shell is busy' % self )
+            try:
+                return self.shell.cmd( *args, **kwargs )
+            finally:
+                self.waiting = False
+        elif self.shell:
             self.sendCmd( *args, **kwargs )
             return self.waitOutput( verbose )
         else:
@@ -456,6 +646,7 @@ def addIntf( self, intf, port=None, moveIntfFn=moveIntf ):
         self.intfs[ port ] = intf
         self.ports[ intf ] = port
         self.nameToIntf[ intf.name ] = intf
+        self.peerIntfs = None
         debug( '\n' )
         debug( 'added intf %s (%d) to node %s\n' % (
                 intf, port, self.name ) )
@@ -471,6 +662,7 @@ def delIntf( self, intf ):
             del self.intfs[ port ]
             del self.ports[ intf ]
             del self.nameToIntf[ intf.name ]
+            self.peerIntfs = None
 
     def defaultIntf( self ):
         "Return interface for lowest port"
@@ -500,17 +692,18 @@ def intf( self, intf=None ):
 
     def connectionsTo( self, node):
         "Return [ intf1, intf2... ] for all intfs that connect self to node."
-        # We could optimize this if it is important
-        connections = []
-        for intf in self.intfList():
-            link = intf.link
-            if link:
-                node1, node2 = link.intf1.node, link.intf2.node
-                if node1 == self and node2 == node:
-                    connections += [ ( intf, link.intf2 ) ]
-                elif node1 == node and node2 == self:
-                    connections += [ ( intf, link.intf1 ) ]
-        return connections
+        if self.peerIntfs is None:
+            # Index our links by peer node; this is recomputed
+            # whenever we add or remove an interface
+            self.peerIntfs = {}
+            for intf in self.intfList():
+                link = intf.link
+                if not link or not link.intf1 or not link.intf2:
+                    continue
+                peer = link.intf2 if intf is link.intf1 else link.intf1
+                self.peerIntfs.setdefault( peer.node, [] ).append(
+                    ( intf, peer ) )
+        return list( self.peerIntfs.get( node, () ) )
 
     def deleteIntfs( self, checkName=True ):
         """Delete all of our interfaces.
@@ -576,6 +769,12 @@ def MAC( self, intf=None ):
         "Return MAC address of a node or specific interface."
         return self.intf( intf ).MAC()
 
+    def invalidateIPs( self ):
+        """Note that our interfaces' addresses may have been changed
+           outside of setIP() (e.g. by running ip or ifconfig)"""
+        for intf in self.intfList():
+            intf.invalidateIP()
+
     def intfIsUp( self, intf=None ):
         "Check if an interface is up."
         return self.intf( intf ).isUp()
@@ -681,10 +880,139 @@ class Host( Node ):
     "A host is simply a Node"
     pass
 
+
+class NodePool( object ):
+    """Pool of idle namespace + shell pairs, which may be reused by
+       nodes across Mininet instances to avoid starting a new shell
+       (and namespace) for each node.
+       Nodes created with pool=NodePool take a shell from the pool
+       (if one is available) and return it when they are terminated.
+       Returned shells are reset: other processes in the namespace
+       are killed, and interfaces other than lo, routes, neighbor
+       entries and resetSysctls are restored. Shell variables and
+       the working directory are not reset."""
+
+    # sysctls that are restored when a shell is returned
+    resetSysctls = ( 'net.ipv4.ip_forward',
+                     'net.ipv4.conf.all.forwarding',
+                     'net.ipv4.conf.all.rp_filter',
+                     'net.ipv4.conf.default.rp_filter',
+                     'net.ipv4.icmp_echo_ignore_broadcasts',
+                     'net.ipv6.conf.all.forwarding',
+                     'net.ipv6.conf.all.disable_ipv6',
+                     'net.ipv6.conf.default.disable_ipv6' )
+
+    def __init__( self, size=100 ):
+        """size: maximum number of idle shells to keep"""
+        self.size = size
+        self.idle = []
+        self.sysctls = None
+        self.count = 0
+        self.lock = Lock()
+
+    def newShell( self ):
+        "Start a new idle shell in a new namespace"
+        with self.lock:
+            self.count += 1
+            name = 'pool%d' % self.count
+        node = Node( name, inNamespace=True )
+        node.cmd( 'ip link set lo up' )
+        if self.sysctls is None:
+            # New namespaces all start with the same values
+            values = node.cmd( 'sysctl -e', *self.resetSysctls )
+            self.sysctls = dict( line.split( ' = ', 1 )
+                                 for line in values.splitlines()
+                                 if ' = ' in line )
+        return node.detachShell()
+
+    def fill( self, count=None ):
+        """Start idle shells
+           count: number of shells to add (default: up to size)"""
+        if count is None:
+            count = self.size - len( self.idle )
+        count = max( 0, min( count, self.size - len( self.idle ) ) )
+        for _ in range( count ):
+            state = self.newShell()
+            with self.lock:
+                self.idle.append( state )
+
+    def get( self, transport='pty' ):
+        """Return an idle shell's state, or None if none are available
+           transport: transport the shell must use ('pty' or 'socket')"""
+        with self.lock:
+            for i in range( len( self.idle ) - 1, -1, -1 ):
+                if self.idle[ i ][ 'transport' ] == transport:
+                    return self.idle.pop( i )
+            return None
+
+    def put( self, node ):
+        """Reset node's shell and return it to the pool
+           node: node whose shell we should take
+           returns: True if we took the shell"""
+        if ( not node.shell or node.shell.poll() is not None or
+             node.waiting or len( self.idle ) >= self.size ):
+            return False
+        try:
+            self.reset( node )
+        except Exception as e:  # pylint: disable=broad-except
+            debug( '%s: could not reset shell: %s\n' % ( node.name, e ) )
+            return False
+        state = node.detachShell()
+        with self.lock:
+            self.idle.append( state )
+        return True
+
+    def reset( self, node ):
+        """Return node's namespace to its initial state
+           node: node to reset"""
+        self.killOthers( node )
+        cmds = [ 'for i in $(ls /sys/class/net); do'
+                 ' [ $i = lo ] || ip link del $i; done',
+                 'ip link set lo up',
+                 'ip route flush table main',
+                 'ip -6 route flush table main',
+                 'ip neigh flush all' ]
+        if self.sysctls:
+            cmds.append( 'sysctl -q -w ' + ' '.join(
+                '%s=%s' % item for item in sorted( self.sysctls.items() ) ) )
+        node.cmd( '{ ' + ' ; '.join( cmds ) + ' ; } 2>/dev/null' )
+
+    @staticmethod
+    def killOthers( node ):
+        """Kill all processes in node's namespace other than its shell
+           node: node whose namespace we should clean up"""
+        netns = os.readlink( '/proc/%d/ns/net' % node.pid )
+        for entry in os.listdir( '/proc' ):
+            if not entry.isdigit() or int( entry ) == node.pid:
+                continue
+            try:
+                if os.readlink( '/proc/%s/ns/net' % entry ) == netns:
+                    os.kill( int( entry ), signal.SIGKILL )
+            except OSError:
+                # Process went away or isn't ours
+                pass
+
+    def close( self ):
+        "Shut down our idle shells"
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for state in idle:
+            if state[ 'shell' ].poll() is None:
+                os.killpg( state[ 'pid' ], signal.SIGHUP )
+        for state in idle:
+            state[ 'stdin' ].close()
+            # Socket transport shells have no slave fd
+            if state[ 'slave' ] is not None:
+                os.close( state[ 'slave' ] )
+            state[ 'shell' ].wait()
+
 class CPULimitedHost( Host ):
 
     "CPU limited host"
 
+    # Our shells are in cgroups
+    poolable = False
+
     def __init__( self, name, sched='cfs', **params ):
         Host.__init__( self, name, **params )
         # BL: Setting the correct period/quota is tricky, particularly
@@ -700,9 +1028,11 @@ def initCgroups( self ):
         "Deferred cgroup initialization"
         if self.cgroupsInited:
             return
-        # Initialize class if necessary
-        if not CPULimitedHost.inited:
-            CPULimitedHost.init()
+        # Initialize class if necessary (hosts may be configured
+        # concurrently, so make sure we only do this once)
+        with CPULimitedHost.initLock:
+            if not CPULimitedHost.inited:
+                CPULimitedHost.init()
         # Create a cgroup and move shell into it
         self.cgroup = 'cpu,cpuacct,cpuset:/' + self.name
         errFail( 'cgcreate -g ' + self.cgroup )
@@ -730,6 +1060,32 @@ def cgroupGet( self, param, resource='cpu' ):
         cmd = 'cgget -n -r %s /%s' % ( pname, self.name )
         return quietRun( cmd )[len(pname)+1:].strip()
 
+    cgroupRoots = None  # cgroup mount points, from cgroupMounts()
+    cpuLayout = None  # online CPUs, from cpuTopology()
+
+    def cpuUsage( self ):
+        """Return CPU time used by our cgroup (in seconds), read
+           directly from cgroupfs rather than with cgget, or None"""
+        if not self.cgroup:
+            return None
+        if CPULimitedHost.cgroupRoots is None:
+            CPULimitedHost.cgroupRoots = cgroupMounts()
+        roots = CPULimitedHost.cgroupRoots
+        try:
+            if self.cgversion == 'cgroup':
+                path = os.path.join( roots[ 'cpuacct' ], self.name,
+                                     'cpuacct.usage' )
+                with open( path ) as f:
+                    return int( f.read() ) / 1e9
+            path = os.path.join( roots[ 'cgroup2' ], self.name, 'cpu.stat' )
+            with open( path ) as f:
+                for line in f:
+                    if line.startswith( 'usage_usec ' ):
+                        return int( line.split()[ 1 ] ) / 1e6
+        except ( KeyError, IOError, OSError, ValueError ):
+            pass
+        return None
+
     def cgroupDel( self ):
         "Clean up our cgroup"
         # info( '*** deleting cgroup', self.cgroup, '\n' )
@@ -758,7 +1114,27 @@ def popen( self, *args, **kwargs ):
     def cleanup( self ):
         "Clean up Node, then clean up our cgroup"
         super( CPULimitedHost, self ).cleanup()
-        retry( retries=3, delaySecs=.1, fn=self.cgroupDel )
+        if self.cgroup:
+            retry( retries=3, delaySecs=.1, fn=self.cgroupDel )
+
+    @classmethod
+    def batchTerminate( cls, nodes ):
+        """Terminate hosts, then delete all of their cgroups
+           using a single cgdelete command"""
+        cgroups = [ h.cgroup for h in nodes if h.cgroup ]
+        for h in nodes:
+            # Don't delete cgroups one at a time in cleanup()
+            h.cgroup = None
+        super( CPULimitedHost, cls ).batchTerminate( nodes )
+
+        def cgroupsDel():
+            "Delete our cgroups"
+            _out, err, exitcode = errRun( [ 'cgdelete', '-r' ] + cgroups )
+            # See note in cgroupDel()
+            return exitcode == 0 or ( 'no such file' in err.lower() )
+        if cgroups:
+            retry( retries=3, delaySecs=.1, fn=cgroupsDel )
+        return nodes
 
     _rtGroupSched = False   # internal class var: Is CONFIG_RT_GROUP_SCHED set?
 
@@ -766,10 +1142,13 @@ def cleanup( self ):
     def checkRtGroupSched( cls ):
         "Check (Ubuntu,Debian) kernel config for CONFIG_RT_GROUP_SCHED for RT"
         if not cls._rtGroupSched:
-            release = quietRun( 'uname -r' ).strip('\r\n')
-            output = quietRun( 'grep CONFIG_RT_GROUP_SCHED /boot/config-%s' %
-                               release )
-            if output == '# CONFIG_RT_GROUP_SCHED is not set\n':
+            release = os.uname()[ 2 ]
+            try:
+                with open( '/boot/config-%s' % release ) as f:
+                    config = f.read().split( '\n' )
+            except ( IOError, OSError ):
+                config = []
+            if '# CONFIG_RT_GROUP_SCHED is not set' in config:
                 error( '\n*** error: please enable RT_GROUP_SCHED '
                        'in your kernel\n' )
                 exit( 1 )
@@ -847,16 +1226,26 @@ def setCPUFrac( self, f, sched=None ):
             sched = self.chrt()
         info( '(%s %s/%dus) ' % ( sched, setQuota, int( setPeriod ) ) )
 
-    def setCPUs( self, cores, mems=0 ):
-        "Specify (real) cores that our cgroup can run on"
-        if not cores:
+    def setCPUs( self, cores, mems=None ):
+        """Specify (real) cores that our cgroup can run on
+           cores: core number, list of cores or kernel CPU list string
+           mems: NUMA node(s) to allocate memory from
+                 (default: the NUMA nodes of our cores)"""
+        if cores is None or cores == '' or cores == []:
             return
+        if mems is None:
+            # Read the CPU layout once, rather than for every host
+            if CPULimitedHost.cpuLayout is None:
+                CPULimitedHost.cpuLayout = cpuTopology()
+            mems = cpuNodes( cores, CPULimitedHost.cpuLayout )
         if isinstance( cores, list ):
             cores = ','.join( [ str( c ) for c in cores ] )
+        if isinstance( mems, list ):
+            mems = ','.join( [ str( m ) for m in mems ] )
         self.cgroupSet( resource='cpuset', param='cpus',
                         value=cores )
-        # Memory placement is probably not relevant, but we
-        # must specify it anyway
+        # Allocating memory from a remote NUMA node slows down
+        # packet processing, so we use our cores' node(s)
         self.cgroupSet( resource='cpuset', param='mems',
                         value=mems)
         # We have to do this here after we've specified
@@ -865,19 +1254,23 @@ def setCPUs( self, cores, mems=0 ):
                  self.name, self.pid ) )
 
     # pylint: disable=arguments-differ
-    def config( self, cpu=-1, cores=None, **params ):
+    def config( self, cpu=-1, cores=None, mems=None, **params ):
         """cpu: desired overall system CPU fraction
            cores: (real) core(s) this host can run on
+           mems: NUMA node(s) for memory (default: nodes of cores)
            params: parameters for Node.config()"""
         r = Node.config( self, **params )
         self.initCgroups()
         # Was considering cpu={'cpu': cpu , 'sched': sched}, but
         # that seems redundant
         self.setParam( r, 'setCPUFrac', cpu=cpu )
-        self.setParam( r, 'setCPUs', cores=cores )
+        if cores is not None:
+            self.setParam( r, 'setCPUs',
+                           cores={ 'cores': cores, 'mems': mems } )
         return r
 
     inited = False
+    initLock = Lock()
     cgversion = 'cgroup2'
 
     @classmethod
@@ -892,6 +1285,124 @@ def unlimit( self ):
             self.setCPUFrac( -1, sched=self.sched )
 
 
+class CPUPlacer( object ):
+    """Topology-aware placement of hosts on (real) cores.
+       Hosts that are likely to talk to each other (hosts with the
+       same cpuGroup parameter, or else hosts on the same switch)
+       are packed onto the same NUMA node, and onto neighboring
+       cores within it, which usually share a last-level cache.
+       Use with CPULimitedHost, e.g. Mininet( autoPinCpus=True )."""
+
+    def __init__( self, cpus=None, reserve=0 ):
+        """cpus: list of CPUInfo (default: cpuTopology())
+           reserve: number of physical cores to keep free on each
+                    NUMA node, e.g. for softirq processing or OVS
+                    handler threads (see self.reserved)"""
+        if cpus is None:
+            cpus = cpuTopology()
+        # Order SMT siblings by CPU number, e.g. 0 before 16
+        thread = {}
+        for c in sorted( cpus ):
+            siblings = thread.setdefault( ( c.socket, c.core ), [] )
+            siblings.append( c.cpu )
+
+        def threadIndex( c ):
+            "Our index within our physical core"
+            return thread[ ( c.socket, c.core ) ].index( c.cpu )
+        self.nodes = sorted( set( c.node for c in cpus ) )
+        self.reserved = []
+        # Per-node slots: physical cores first, then their siblings
+        self.slots = {}
+        for node in self.nodes:
+            nodeCpus = [ c for c in cpus if c.node == node ]
+            physical = sorted( set( ( c.llc, c.socket, c.core )
+                                    for c in nodeCpus ) )
+            keep = physical[ reserve: ]
+            if not keep:
+                raise Exception( 'CPUPlacer: cannot reserve %d cores on'
+                                 ' NUMA node %d' % ( reserve, node ) )
+            keep = set( ( socket, core ) for _llc, socket, core in keep )
+            self.reserved += [ c.cpu for c in nodeCpus
+                               if ( c.socket, c.core ) not in keep ]
+            self.slots[ node ] = [
+                c.cpu for c in sorted(
+                    nodeCpus, key=lambda c: ( threadIndex( c ), c.llc,
+                                              c.socket, c.core, c.cpu ) )
+                if ( c.socket, c.core ) in keep ]
+        self.reserved.sort()
+        self.allSlots = [ ( cpu, node ) for node in self.nodes
+                          for cpu in self.slots[ node ] ]
+        self.nextSlot = 0
+
+    @staticmethod
+    def groups( topo ):
+        """Return lists of hosts that are likely to talk to each other,
+           in breadth-first order so that neighboring switches' hosts
+           are adjacent
+           topo: Topo
+           returns: list of lists of host names"""
+        keys, members, seen = [], {}, set()
+        for start in topo.nodes():
+            if start in seen:
+                continue
+            seen.add( start )
+            queue = [ start ]
+            while queue:
+                name = queue.pop( 0 )
+                neighbors = sorted( topo.g.neighbors( name ), key=natural )
+                if not topo.isSwitch( name ):
+                    switches = [ n for n in neighbors if topo.isSwitch( n ) ]
+                    key = topo.nodeInfo( name ).get(
+                        'cpuGroup', switches[ 0 ] if switches else name )
+                    if key not in members:
+                        keys.append( key )
+                    members.setdefault( key, [] ).append( name )
+                for n in neighbors:
+                    if n not in seen:
+                        seen.add( n )
+                        queue.append( n )
+        return [ members[ key ] for key in keys ]
+
+    def place( self, topo ):
+        """Place a topology's hosts
+           topo: Topo
+           returns: { host name: ( core, NUMA node ) }"""
+        groups = self.groups( topo )
+        total = sum( len( group ) for group in groups )
+        cpus = len( self.allSlots )
+        # Each node's fair share of hosts, rounded up
+        share = [ -( -total * len( self.slots[ node ] ) // cpus )
+                  for node in self.nodes ]
+        load = [ 0 ] * len( self.nodes )
+        placement = {}
+        i, last = 0, len( self.nodes ) - 1
+        for group in groups:
+            # Move to the next node rather than split a group
+            if ( load[ i ] and load[ i ] + len( group ) > share[ i ] and
+                 i < last ):
+                i += 1
+            for host in group:
+                node = self.nodes[ i ]
+                slots = self.slots[ node ]
+                # Spill over if a group doesn't fit on one node
+                if load[ i ] >= len( slots ) and i < last:
+                    i += 1
+                    node = self.nodes[ i ]
+                    slots = self.slots[ node ]
+                placement[ host ] = ( slots[ load[ i ] % len( slots ) ],
+                                      node )
+                load[ i ] += 1
+        return placement
+
+    def next( self ):
+        """Return the next core for a host that isn't in a topology,
+           round-robin over our cores
+           returns: ( core, NUMA node )"""
+        slot = self.allSlots[ self.nextSlot ]
+        self.nextSlot = ( self.nextSlot + 1 ) % len( self.allSlots )
+        return slot
+
+
 # Some important things to note:
 #
 # The "IP" address which setIP() assigns to the switch is not
@@ -1132,7 +1643,7 @@ def setup( cls ):
                    'You may wish to try '
                    '"service openvswitch-switch start".\n' )
             exit( 1 )
-        version = quietRun( 'ovs-vsctl --version' )
+        version = cachedProbe( 'ovs-vsctl --version' )
         cls.OVSVersion = findall( r'\d+\.\d+', version )[ 0 ]
 
     @classmethod
@@ -1438,15 +1949,18 @@ def __init__( self, name, inNamespace=False, command='controller',
 
     def checkListening( self ):
         "Make sure no controllers are running on our port"
-        # Verify that Telnet is installed first:
-        out, _err, returnCode = errRun( "which telnet" )
-        if 'telnet' not in out or returnCode != 0:
-            raise Exception( "Error running telnet to check for listening "
-                             "controllers; please check that it is "
-                             "installed." )
-        listening = self.cmd( "echo A | telnet -e A %s %d" %
-                              ( self.ip, self.port ) )
-        if 'Connected' in listening:
+        if not self.inNamespace:
+            # We can check from here without running telnet
+            listening = portOpen( self.ip, self.port )
+        else:
+            # Verify that Telnet is installed first:
+            if not which( 'telnet' ):
+                raise Exception( "Error running telnet to check for "
+                                 "listening controllers; please check "
+                                 "that it is installed." )
+            listening = 'Connected' in self.cmd(
+                "echo A | telnet -e A %s %d" % ( self.ip, self.port ) )
+        if listening:
             servers = self.cmd( 'netstat -natp' ).split( '\n' )
             pstr = ':%d ' % self.port
             clist = servers[ 0:1 ] + [ s for s in servers if pstr in s ]
@@ -1587,8 +2101,12 @@ def checkListening( self ):
 
     def isListening( self, ip, port ):
         "Check if a remote controller is listening at a specific ip and port"
-        listening = self.cmd( "echo A | telnet -e A %s %d" % ( ip, port ) )
-        if 'Connected' not in listening:
+        if not self.inNamespace:
+            listening = portOpen( ip, port )
+        else:
+            listening = 'Connected' in self.cmd(
+                "echo A | telnet -e A %s %d" % ( ip, port ) )
+        if not listening:
             warn( "Unable to contact the remote controller"
                   " at %s:%d\n" % ( ip, port ) )
             return False
@@ -4,10 +4,14 @@
 This contains additional Node types which you may find to be useful.
 """
 
-from mininet.node import Node, Switch
-from mininet.log import info, warn
+import os
+import signal
+from subprocess import PIPE, STDOUT
+
+from mininet.node import Node, Host, Switch
+from mininet.log import info, warn, error, debug
 from mininet.moduledeps import pathCheck
-from mininet.util import quietRun
+from mininet.util import quietRun, decode
 
 
 class LinuxBridge( Switch ):
@@ -69,6 +73,118 @@ def setup( cls ):
                 warn( 'Warning: Linux bridge may not work with', out, '\n' )
 
 
+class LazyHost( Host ):
+    """A host whose namespace is held by a sleep process rather than
+       an interactive shell, to save memory and ptys.
+       cmd() runs simple commands in a new process using popen().
+       A shell is started when one is needed, i.e. for sendCmd()
+       (e.g. from the CLI) or for commands run in the background,
+       and is kept until the host is terminated."""
+
+    # Our namespace isn't held by our shell
+    poolable = False
+
+    def __init__( self, name, **params ):
+        self.pause = None
+        Host.__init__( self, name, **params )
+
+    def startShell( self, mnopts=None ):
+        "Start a pause process to hold our namespace"
+        if self.pause:
+            error( "%s: pause process is already running\n" % self.name )
+            return
+        # mnexec: (c)lose descriptors, (d)etach from tty,
+        # run in (n)amespace and (p)rint pid once we're in it
+        opts = '-cd' if mnopts is None else mnopts
+        if self.inNamespace:
+            opts += 'n'
+        opts += 'p'
+        # Name the process so that mn -c can find it
+        cmd = [ 'mnexec', opts, 'bash', '-c',
+                'exec -a mininet:%s sleep infinity' % self.name ]
+        self.pause = self._popen( cmd, stdin=PIPE, stdout=PIPE )
+        self.pause.stdin.close()
+        # Wait until our namespace has been created
+        line = decode( self.pause.stdout.readline() )
+        self.pause.stdout.close()
+        self.pid = int( line.strip( chr( 1 ) + '\r\n' ) )
+
+    def startLazyShell( self ):
+        "Start a shell in our namespace if we don't have one yet"
+        if not self.shell and self.pause:
+            debug( '%s: starting shell\n' % self.name )
+            self.spawnShell( [ 'mnexec', '-cda', str( self.pid ) ] )
+
+    def sendCmd( self, *args, **kwargs ):
+        "Start our shell if necessary, then send a command to it"
+        self.startLazyShell()
+        return Host.sendCmd( self, *args, **kwargs )
+
+    def sendInt( self, *args, **kwargs ):
+        "Interrupt our shell's command, if we have a shell"
+        if self.shell:
+            Host.sendInt( self, *args, **kwargs )
+
+    def monitor( self, *args, **kwargs ):
+        "Return output from our shell, or '' if we have no shell"
+        if not self.shell:
+            return ''
+        return Host.monitor( self, *args, **kwargs )
+
+    def cmd( self, *args, **kwargs ):
+        """Run a command and return its output, using our shell if we
+           have one or the command needs it, and popen() otherwise"""
+        if self.shell or not self.pause:
+            return Host.cmd( self, *args, **kwargs )
+        words = args[ 0 ] if ( len( args ) == 1 and
+                               isinstance( args[ 0 ], list ) ) else args
+        cmd = ' '.join( str( c ) for c in words )
+        if cmd.rstrip().endswith( '&' ) or kwargs.get( 'printPid' ):
+            # Background jobs need a shell to belong to
+            self.startLazyShell()
+            return Host.cmd( self, *args, **kwargs )
+        log = info if kwargs.get( 'verbose' ) else debug
+        log( '*** %s : %s\n' % ( self.name, args ) )
+        popen = self.popen( [ 'bash', '-c', cmd ], stdin=PIPE,
+                            stdout=PIPE, stderr=STDOUT )
+        out, _err = popen.communicate()
+        output = decode( out )
+        log( output )
+        return output
+
+    def cleanup( self ):
+        "Clean up our shell, if any, and stop our pause process"
+        super( LazyHost, self ).cleanup()
+        if self.pause:
+            if self.pause.poll() is None:
+                os.killpg( self.pause.pid, signal.SIGHUP )
+            if self.waitExited:
+                self.pause.wait()
+            self.pause = None
+
+
+class LinuxRouter( Node ):
+    "A Node with IP forwarding enabled (see mininet.routing)"
+
+    # pylint: disable=arguments-differ
+    def config( self, multipath=False, **params ):
+        """multipath: we have multipath routes (set by compileRoutes());
+                      spread their flows using layer 4 hashing"""
+        super( LinuxRouter, self).config( **params )
+        # Enable forwarding on the router
+        self.cmd( 'sysctl net.ipv4.ip_forward=1' )
+        if multipath:
+            policy = 'net.ipv4.fib_multipath_hash_policy'
+            self.cmd( 'sysctl -q -w %s=1' % policy )
+            if self.cmd( 'sysctl -n %s' % policy ).strip() != '1':
+                warn( '*** %s: could not set %s; multipath routes will '
+                      'hash flows by address only\n' % ( self, policy ) )
+
+    def terminate( self ):
+        self.cmd( 'sysctl net.ipv4.ip_forward=0' )
+        super( LinuxRouter, self ).terminate()
+
+
 class NAT( Node ):
     "NAT: Provides connectivity to external network"
 
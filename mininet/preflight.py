@@ -0,0 +1,265 @@
+"""
+Preflight checks: estimate the resources that a topology will need,
+and compare them with the system's current limits before building it.
+
+Large networks can fail halfway through a long build when they run
+out of ptys, file descriptors, processes or memory, or work badly if
+the ARP table is too small. fixLimits() raises a fixed set of limits;
+preflight() instead looks at the topology and the node, switch and
+link classes, raises the sysctls and rlimits that are too low, and
+raises an exception if anything is still short - before any network
+namespace has been created.
+
+Example:
+
+    from mininet.preflight import preflight
+    preflight( TreeTopo( depth=4, fanout=8 ), host=CPULimitedHost )
+
+or, from the command line: mn --topo tree,4,8 --preflight
+
+The estimates are deliberately rough (and somewhat generous).
+"""
+
+import os
+from collections import namedtuple
+from functools import partial
+from resource import getrlimit, RLIMIT_NOFILE
+
+from mininet.log import info, error, debug
+from mininet.node import ( Host, CPULimitedHost, OVSSwitch, UserSwitch,
+                           Controller, DefaultController, NullController )
+from mininet.nodelib import LazyHost
+from mininet.link import Link, OVSLink
+from mininet.util import sysctlTestAndSet, rlimitTestAndSet
+
+
+# Rough memory use (bytes) of a node's shell (bash, pty, namespace)
+# and of an interface (veth end with queues)
+SHELLMEM = 3 << 20
+INTFMEM = 64 << 10
+
+# Spare file descriptors for the Mininet process itself
+SPAREFDS = 256
+
+# Resource: one resource that the topology needs
+# name: resource name
+# need: how much the topology needs
+# have: how much is currently available (None: unknown/no limit)
+# setting: sysctl or rlimit we can raise (None: can't be fixed)
+Resource = namedtuple( 'Resource', 'name need have setting' )
+
+
+def baseClass( cls ):
+    """Return the class and parameters of a node or link constructor
+       cls: class or partial() (as from customClass)
+       returns: class, params"""
+    params = {}
+    while isinstance( cls, partial ):
+        params = dict( cls.keywords or {}, **params )
+        cls = cls.func
+    return cls, params
+
+
+def isA( cls, base ):
+    "Is cls (which may not be a class) a subclass of base?"
+    return isinstance( cls, type ) and issubclass( cls, base )
+
+
+def estimate( topo, host=Host, switch=OVSSwitch, link=Link,
+              controller=DefaultController, peers=None ):
+    """Estimate the resources that a topology needs
+       topo: Topo
+       host, switch, link, controller: default classes (as for Mininet)
+       peers: number of other hosts each host talks to
+              (default: all of them, as for pingAll())
+       returns: dict of resource name -> amount"""
+    # pylint: disable=too-many-locals
+    need = dict( shells=0, ptys=0, fds=SPAREFDS, processes=0,
+                 interfaces=0, neighbors=0, cgroups=0, memory=0 )
+
+    def addShell( cls, params ):
+        "Count a node's shell"
+        need[ 'shells' ] += 1
+        need[ 'processes' ] += 1
+        if isA( cls, LazyHost ):
+            # A pause process, which keeps no fds open, holds the
+            # namespace; shells are only started when needed
+            pass
+        elif params.get( 'transport' ) == 'socket':
+            need[ 'fds' ] += 1
+        else:
+            # We keep both ends of the pty open
+            need[ 'ptys' ] += 1
+            need[ 'fds' ] += 2
+        if isA( cls, CPULimitedHost ):
+            need[ 'cgroups' ] += 1
+
+    hosts = topo.hosts()
+    for name in hosts:
+        opts = topo.nodeInfo( name )
+        cls, params = baseClass( opts.get( 'cls', host ) )
+        addShell( cls, dict( params, **opts ) )
+        # Loopback interface in each namespace
+        need[ 'interfaces' ] += 1
+    for name in topo.switches():
+        opts = topo.nodeInfo( name )
+        cls, params = baseClass( opts.get( 'cls', switch ) )
+        addShell( cls, dict( params, **opts ) )
+        if isA( cls, UserSwitch ):
+            # ofdatapath and ofprotocol, plus a tap interface
+            need[ 'processes' ] += 2
+            need[ 'interfaces' ] += 1
+    controllers = controller if isinstance( controller, list ) else [
+        controller ]
+    for cls in controllers:
+        cls, params = baseClass( cls )
+        if cls and cls is not NullController:
+            addShell( cls, params )
+            if isA( cls, Controller ):
+                need[ 'processes' ] += 1
+    # Each link is a veth pair, except for OVS patch links
+    for node1, node2, opts in topo.links( withInfo=True ):
+        cls = baseClass( opts.get( 'cls', link ) )[ 0 ]
+        if ( isA( cls, OVSLink ) and topo.isSwitch( node1 ) and
+             topo.isSwitch( node2 ) ):
+            continue
+        need[ 'interfaces' ] += 2
+    # Every host may have an ARP entry for each of its peers, and
+    # the kernel's neighbor table is shared by all namespaces
+    if peers is None:
+        peers = len( hosts ) - 1
+    need[ 'neighbors' ] = len( hosts ) * max( 0, peers )
+    need[ 'memory' ] = ( need[ 'shells' ] * SHELLMEM +
+                         need[ 'interfaces' ] * INTFMEM )
+    return need
+
+
+def readInt( path, default=None ):
+    "Return first number in a /proc file, or default"
+    try:
+        with open( path ) as f:
+            return int( f.read().split()[ 0 ] )
+    except ( IOError, OSError, ValueError, IndexError ):
+        return default
+
+
+def memAvailable():
+    "Return available memory (bytes), or None if unknown"
+    try:
+        with open( '/proc/meminfo' ) as f:
+            for line in f:
+                if line.startswith( 'MemAvailable:' ):
+                    return int( line.split()[ 1 ] ) * 1024
+    except ( IOError, OSError ):
+        pass
+    return None
+
+
+def processCount():
+    "Return number of running processes"
+    return len( [ d for d in os.listdir( '/proc' ) if d.isdigit() ] )
+
+
+def resources( need ):
+    """Compare needs with what is available now
+       need: dict from estimate()
+       returns: list of Resource"""
+    ptyMax = readInt( '/proc/sys/kernel/pty/max' )
+    ptyUsed = readInt( '/proc/sys/kernel/pty/nr', 0 )
+    fileMax = readInt( '/proc/sys/fs/file-max' )
+    fileUsed = readInt( '/proc/sys/fs/file-nr', 0 )
+    openFds = len( os.listdir( '/proc/self/fd' ) )
+    procMax = min( readInt( '/proc/sys/kernel/pid_max', 32768 ),
+                   readInt( '/proc/sys/kernel/threads-max', 32768 ) )
+    procs = processCount()
+    gcThresh = readInt( '/proc/sys/net/ipv4/neigh/default/gc_thresh3' )
+    backlog = readInt( '/proc/sys/net/core/netdev_max_backlog' )
+
+    def avail( limit, used ):
+        "Return what's left of a limit"
+        return None if limit is None else limit - used
+
+    return [
+        Resource( 'ptys', need[ 'ptys' ], avail( ptyMax, ptyUsed ),
+                  'kernel.pty.max' ),
+        Resource( 'fds', need[ 'fds' ],
+                  getrlimit( RLIMIT_NOFILE )[ 0 ] - openFds,
+                  'RLIMIT_NOFILE' ),
+        Resource( 'files', need[ 'fds' ], avail( fileMax, fileUsed ),
+                  'fs.file-max' ),
+        Resource( 'processes', need[ 'processes' ], procMax - procs,
+                  'kernel.pid_max' ),
+        Resource( 'neighbors', need[ 'neighbors' ], gcThresh,
+                  'net.ipv4.neigh.default.gc_thresh3' ),
+        # Packets queued per CPU; busy interfaces all feed it
+        Resource( 'backlog', max( 1000, need[ 'interfaces' ] ), backlog,
+                  'net.core.netdev_max_backlog' ),
+        Resource( 'memory', need[ 'memory' ], memAvailable(), None ),
+        Resource( 'interfaces', need[ 'interfaces' ], None, None ),
+        Resource( 'cgroups', need[ 'cgroups' ], None, None ) ]
+
+
+def raiseLimit( resource ):
+    """Raise a limit so that a resource's need is met
+       resource: Resource
+       returns: True if we changed the limit"""
+    short = resource.need - resource.have
+    name = resource.setting
+    if name == 'RLIMIT_NOFILE':
+        rlimitTestAndSet( RLIMIT_NOFILE,
+                          getrlimit( RLIMIT_NOFILE )[ 0 ] + short )
+    elif name == 'kernel.pid_max':
+        limit = readInt( '/proc/sys/kernel/pid_max' ) + short
+        sysctlTestAndSet( name, limit )
+        sysctlTestAndSet( 'kernel.threads-max', limit )
+    elif name == 'net.ipv4.neigh.default.gc_thresh3':
+        # Keep the usual 1:2:4 ratio of the thresholds
+        limit = resource.need
+        sysctlTestAndSet( 'net.ipv4.neigh.default.gc_thresh1', limit // 4 )
+        sysctlTestAndSet( 'net.ipv4.neigh.default.gc_thresh2', limit // 2 )
+        sysctlTestAndSet( name, limit )
+    elif name in ( 'kernel.pty.max', 'fs.file-max' ):
+        current = readInt( '/proc/sys/' + name.replace( '.', '/' ) )
+        sysctlTestAndSet( name, current + short )
+    else:
+        sysctlTestAndSet( name, resource.need )
+    return True
+
+
+def preflight( topo, fix=True, **params ):
+    """Check that the system has the resources a topology needs,
+       raising limits if fix is set
+       topo: Topo
+       fix: raise sysctls and rlimits that are too low
+       params: host, switch, link, controller, peers (see estimate())
+       returns: list of Resource (after any fixes)
+       raises: Exception if resources are still short"""
+    need = estimate( topo, **params )
+    info( '*** Preflight: %d shells, %d ptys, %d fds, %d processes, '
+          '%d interfaces, %d cgroups, %d MB\n' % (
+              need[ 'shells' ], need[ 'ptys' ], need[ 'fds' ],
+              need[ 'processes' ], need[ 'interfaces' ], need[ 'cgroups' ],
+              need[ 'memory' ] >> 20 ) )
+    checked = resources( need )
+    if fix:
+        for resource in checked:
+            if ( resource.setting and resource.have is not None and
+                 resource.have < resource.need ):
+                debug( '*** Raising %s for %d %s\n' % (
+                    resource.setting, resource.need, resource.name ) )
+                try:
+                    raiseLimit( resource )
+                except ( IOError, OSError, ValueError ) as e:
+                    error( '*** Could not raise %s: %s\n' % (
+                        resource.setting, e ) )
+        checked = resources( need )
+    short = [ r for r in checked
+              if r.have is not None and r.have < r.need ]
+    for r in short:
+        error( '*** Preflight: need %d %s but only %d are available%s\n' % (
+            r.need, r.name, r.have,
+            ' (%s)' % r.setting if r.setting else '' ) )
+    if short:
+        raise Exception( 'Preflight check failed: not enough %s' %
+                         ', '.join( r.name for r in short ) )
+    return checked
@@ -0,0 +1,201 @@
+"""
+Static routing for networks of Linux routers
+
+Rather than running a routing daemon (or adding each route by hand,
+as in examples/linuxrouter.py), we can compute every node's routes
+from the topology before the network starts, and install each node's
+whole routing table with a single ip -batch process.
+
+A routed topology is a Topo of routers (usually LinuxRouter nodes)
+and hosts, linked directly to each other; each link is its own IP
+subnet.
+
+addressLinks( topo ): give each link a subnet, and each node an IP
+    address (and each single-link host a default route)
+compileRoutes( topo ): compute shortest-path (optionally ECMP) routes
+    for each multi-link node, and mark nodes with multipath routes
+installRoutes( net, routes ): install routes in a running network
+
+Example:
+
+    topo = MyRoutedTopo()
+    addressLinks( topo )
+    routes = compileRoutes( topo, ecmp=True )
+    net = Mininet( topo=topo, controller=None )
+    net.start()
+    installRoutes( net, routes )
+"""
+
+from mininet.log import info, error
+from mininet.util import netParse, ipStr, ipBatch, runParallel
+
+
+def addressLinks( topo, ipBase='10.0.0.0/8', prefixLen=30 ):
+    """Assign a subnet to each link of a routed topology, by setting
+       link params1/params2 and node ip (and defaultRoute for nodes
+       with a single link)
+       topo: Topo of routers and hosts
+       ipBase: address space for link subnets
+       prefixLen: link subnet prefix length (30 or 31)
+       returns: list of subnets (e.g. '10.0.0.4/30'), in link order"""
+    if prefixLen not in ( 30, 31 ):
+        raise Exception( 'addressLinks: prefixLen must be 30 or 31' )
+    base, baseLen = netParse( ipBase )
+    size = 1 << ( 32 - prefixLen )
+    # /31 subnets use both addresses; /30 skips network and broadcast
+    first = 1 if prefixLen == 30 else 0
+    links = topo.links( sort=True, withKeys=True, withInfo=True )
+    if len( links ) * size > 1 << ( 32 - baseLen ):
+        raise Exception( 'addressLinks: not enough addresses in %s for %d '
+                         'links' % ( ipBase, len( links ) ) )
+    subnets = []
+    # Address of each node's lowest port, which will be its default intf
+    defaults = {}
+    for i, ( node1, node2, key, opts ) in enumerate( links ):
+        start = base + i * size
+        ip1, ip2 = ipStr( start + first ), ipStr( start + first + 1 )
+        opts = dict( opts )
+        opts[ 'params1' ] = dict( opts.get( 'params1', {} ),
+                                  ip='%s/%d' % ( ip1, prefixLen ) )
+        opts[ 'params2' ] = dict( opts.get( 'params2', {} ),
+                                  ip='%s/%d' % ( ip2, prefixLen ) )
+        topo.setlinkInfo( node1, node2, opts, key=key )
+        subnets.append( '%s/%d' % ( ipStr( start ), prefixLen ) )
+        for node, port, ip, peer in ( ( node1, opts[ 'port1' ], ip1, ip2 ),
+                                      ( node2, opts[ 'port2' ], ip2, ip1 ) ):
+            if node not in defaults or port < defaults[ node ][ 0 ]:
+                defaults[ node ] = ( port, ip, peer )
+    degree = {}
+    for node1, node2 in topo.links():
+        for node in node1, node2:
+            degree[ node ] = degree.get( node, 0 ) + 1
+    for node, ( _port, ip, peer ) in defaults.items():
+        if topo.isSwitch( node ):
+            continue
+        opts = dict( topo.nodeInfo( node ) )
+        opts[ 'ip' ] = '%s/%d' % ( ip, prefixLen )
+        if degree[ node ] == 1:
+            opts.setdefault( 'defaultRoute', 'via %s' % peer )
+        topo.setNodeInfo( node, opts )
+    return subnets
+
+
+def linkAddresses( opts ):
+    """Return a link's addresses and subnet
+       opts: link info with params1 and params2 ip
+       returns: ip1, ip2, subnet (or None if not addressed)"""
+    ip1 = opts.get( 'params1', {} ).get( 'ip' )
+    ip2 = opts.get( 'params2', {} ).get( 'ip' )
+    if not ip1 or not ip2:
+        return None
+    addr, prefixLen = netParse( ip1 )
+    mask = ( 0xffffffff << ( 32 - prefixLen ) ) & 0xffffffff
+    return ( ip1.split( '/' )[ 0 ], ip2.split( '/' )[ 0 ],
+             '%s/%d' % ( ipStr( addr & mask ), prefixLen ) )
+
+
+def compileRoutes( topo, ecmp=False ):
+    """Compute shortest-path routes to every link subnet
+       topo: Topo whose links have addresses (e.g. from addressLinks())
+       ecmp: use all equal-cost next hops rather than the first one
+       returns: { node: [ ip route commands for ipBatch() ] } for
+                each node with more than one link
+       Nodes with multipath routes get the multipath=True param, which
+       LinuxRouter uses, so call this before building the network."""
+    # pylint: disable=too-many-locals,too-many-branches
+    # adjacency: node -> list of ( neighbor, our address, their address )
+    adjacency, subnets = {}, []
+    for node1, node2, opts in topo.links( sort=True, withInfo=True ):
+        if topo.isSwitch( node1 ) or topo.isSwitch( node2 ):
+            continue
+        addresses = linkAddresses( opts )
+        if not addresses:
+            continue
+        ip1, ip2, subnet = addresses
+        adjacency.setdefault( node1, [] ).append( ( node2, ip1, ip2 ) )
+        adjacency.setdefault( node2, [] ).append( ( node1, ip2, ip1 ) )
+        subnets.append( ( subnet, node1, node2 ) )
+    routes = {}
+    for source in topo.sorted( adjacency ):
+        links = adjacency[ source ]
+        if len( links ) < 2:
+            # Hosts with one link only need a default route
+            continue
+        # Breadth-first search, tracking which of our links (as a
+        # bit mask) lead to each node along shortest paths
+        dist, hops = { source: 0 }, { source: 0 }
+        level = []
+        for i, ( neighbor, _ours, _theirs ) in enumerate( links ):
+            if neighbor not in dist:
+                dist[ neighbor ] = 1
+                hops[ neighbor ] = 0
+                level.append( neighbor )
+            if dist[ neighbor ] == 1:
+                hops[ neighbor ] |= 1 << i
+        while level:
+            nextLevel = []
+            for node in level:
+                d, mask = dist[ node ] + 1, hops[ node ]
+                for neighbor, _ours, _theirs in adjacency[ node ]:
+                    if neighbor not in dist:
+                        dist[ neighbor ] = d
+                        hops[ neighbor ] = mask
+                        nextLevel.append( neighbor )
+                    elif dist[ neighbor ] == d:
+                        hops[ neighbor ] |= mask
+            level = nextLevel
+        cmds = []
+        for subnet, node1, node2 in subnets:
+            if source in ( node1, node2 ):
+                continue  # directly connected
+            d1, d2 = dist.get( node1 ), dist.get( node2 )
+            if d1 is None and d2 is None:
+                continue  # unreachable
+            if d2 is None or ( d1 is not None and d1 < d2 ):
+                mask = hops[ node1 ]
+            elif d1 is None or d2 < d1:
+                mask = hops[ node2 ]
+            else:
+                mask = hops[ node1 ] | hops[ node2 ]
+            gateways = [ links[ i ][ 2 ] for i in range( len( links ) )
+                         if mask & ( 1 << i ) ]
+            if ecmp and len( gateways ) > 1:
+                cmds.append( 'route replace %s %s' % ( subnet, ' '.join(
+                    'nexthop via %s' % gw for gw in gateways ) ) )
+            else:
+                cmds.append( 'route replace %s via %s' % (
+                    subnet, gateways[ 0 ] ) )
+        routes[ source ] = cmds
+        multipath = any( 'nexthop' in cmd for cmd in cmds )
+        opts = topo.nodeInfo( source )
+        if multipath != opts.get( 'multipath', False ):
+            opts = dict( opts )
+            if multipath:
+                opts[ 'multipath' ] = True
+            else:
+                del opts[ 'multipath' ]
+            topo.setNodeInfo( source, opts )
+    return routes
+
+
+def installRoutes( net, routes, workers=None ):
+    """Install routes, with one ip -batch process per node
+       net: Mininet network
+       routes: { node name: [ ip route commands ] }
+       workers: max number of nodes to configure concurrently
+       returns: True if all routes were installed"""
+    names = [ name for name in routes if routes[ name ] ]
+    info( '*** Installing %d routes on %d nodes\n' % (
+        sum( len( routes[ name ] ) for name in names ), len( names ) ) )
+
+    def install( name ):
+        "Install routes for one node"
+        return ipBatch( routes[ name ], node=net[ name ] )
+
+    ok = True
+    for name, result, exc in runParallel( install, names, workers ):
+        if exc or result.ret:
+            error( '*** %s: error installing routes: %s\n' % (
+                name, exc or result.out ) )
+            ok = False
+    return ok
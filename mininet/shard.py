@@ -0,0 +1,212 @@
+"""
+Shards: worker processes that run node shells
+
+A single Mininet process normally owns every node's shell, so command
+round trips (for example, configuring thousands of hosts) are limited
+to one core. Mininet( shards=N ) starts N Shard worker processes, and
+each host's and switch's shell is started by, and belongs to, one of
+them.
+
+How does a sharded node work?
+
+- The shard starts the node's shell and passes us a copy of the
+  shell's pty (or socket) file descriptor along with its pid.
+
+- The shard also passes us the node's own channel, which it serves
+  in a thread of its own. Node.cmd() sends the command over that
+  channel and the shard runs it and returns its output, so that
+  nodes in the same shard run commands concurrently, and commands
+  to many nodes (e.g. from configHosts()) use all cores.
+
+- sendCmd(), monitor(), waitOutput() etc. use our copy of the file
+  descriptor, so the CLI and select/poll-based code work as usual.
+  Node.claimShell() keeps these and the shard from using the shell
+  at the same time.
+
+- popen() and terminals attach to the node's namespace using its pid,
+  so they don't involve the shard at all.
+
+Limitations:
+
+- Requires Python 3 (file descriptor passing).
+- Only classes using Node's startShell() are sharded; others (e.g.
+  LazyHost, cluster edition's remote nodes) run locally.
+- Sharded nodes don't use NodePool.
+"""
+
+import os
+import socket
+from signal import signal, SIGINT, SIG_IGN
+from threading import Lock, Thread
+
+from mininet.node import Node
+
+try:
+    from multiprocessing import get_context
+    from multiprocessing.connection import Connection
+    from multiprocessing.reduction import send_handle, recv_handle
+except ImportError:  # Python 2
+    get_context = None
+
+
+class Shard( object ):
+    "A worker process that runs the shells for a set of nodes"
+
+    def __init__( self, index ):
+        "index: shard number"
+        if not get_context:
+            raise Exception( 'Shard requires Python 3' )
+        # fork() keeps our log level and search path in the worker
+        context = get_context( 'fork' )
+        self.index = index
+        self.conn, child = context.Pipe()
+        # Only serializes starting shells: commands use node channels
+        self.lock = Lock()
+        self.process = context.Process(
+            target=self.serve, args=( child, ),
+            name='mininet:shard%d' % index )
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+
+    def startShell( self, node ):
+        """Start a shell for a node
+           node: Node
+           returns: ShardShell, our copy of the shell's fd"""
+        params = { 'inNamespace': node.inNamespace,
+                   'transport': node.transport }
+        with self.lock:
+            self.conn.send( ( node.name, params ) )
+            status, result = self.conn.recv()
+            if status == 'error':
+                raise Exception( 'shard%d: %s: %s' % (
+                    self.index, node.name, result ) )
+            fd = recv_handle( self.conn )
+            channel = Connection( recv_handle( self.conn ) )
+        return ShardShell( self, node.name, result, channel ), fd
+
+    def stop( self ):
+        "Stop our worker process"
+        with self.lock:
+            if self.process.is_alive():
+                self.conn.send( None )
+            self.process.join( 5 )
+            self.conn.close()
+
+    @classmethod
+    def serve( cls, conn ):
+        """Worker process: start shells, and a thread to serve each
+           node's channel
+           conn: connection to our Shard object"""
+        # The CLI's ^C is meant for nodes, not for us
+        signal( SIGINT, SIG_IGN )
+        nodes = {}
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            name, params = request
+            try:
+                # Private directories are mounted by the caller
+                node = Node( name, privateDirs=[], **params )
+            except Exception as e:  # pylint: disable=broad-except
+                conn.send( ( 'error', repr( e ) ) )
+                continue
+            nodes[ name ] = node
+            ours, theirs = socket.socketpair()
+            conn.send( ( 'ok', node.pid ) )
+            send_handle( conn, node.master, os.getppid() )
+            send_handle( conn, theirs.fileno(), os.getppid() )
+            theirs.close()
+            thread = Thread( target=cls.serveNode,
+                             args=( node, Connection( ours.detach() ),
+                                    nodes ) )
+            thread.daemon = True
+            thread.start()
+        for node in list( nodes.values() ):
+            node.terminate()
+        conn.close()
+
+    @staticmethod
+    def serveNode( node, conn, nodes ):
+        """Worker thread: run methods for a node until its shell exits
+           node: Node
+           conn: node's channel
+           nodes: dict of running nodes, to remove node from"""
+        while True:
+            try:
+                method, args, kwargs = conn.recv()
+            except EOFError:
+                break
+            try:
+                if method == 'cmd':
+                    result = node.cmd( *args, **kwargs )
+                elif method == 'poll':
+                    result = node.shell.poll()
+                elif method == 'wait':
+                    shell = node.shell
+                    node.cleanup()
+                    result = shell.wait() if shell else None
+                else:
+                    raise Exception( 'unknown method %s' % method )
+            except Exception as e:  # pylint: disable=broad-except
+                conn.send( ( 'error', repr( e ) ) )
+                continue
+            conn.send( ( 'ok', result ) )
+            if method == 'wait':
+                break
+        if nodes.get( node.name ) is node:
+            del nodes[ node.name ]
+        conn.close()
+
+
+class ShardShell( object ):
+    "Stands in for the Popen() object of a shell running in a Shard"
+
+    def __init__( self, shard, name, pid, conn ):
+        """shard: Shard
+           name: node name
+           pid: shell pid
+           conn: node's channel to the shard"""
+        self.shard = shard
+        self.name = name
+        self.pid = pid
+        self.conn = conn
+        # Per node, so that nodes in one shard don't wait for each other
+        self.lock = Lock()
+        self.returncode = None
+        self.done = False
+
+    def call( self, method, *args, **kwargs ):
+        """Call a method for our node in its shard
+           method: 'cmd', 'poll' or 'wait'
+           returns: result"""
+        with self.lock:
+            self.conn.send( ( method, args, kwargs ) )
+            status, result = self.conn.recv()
+        if status == 'error':
+            raise Exception( 'shard%d: %s: %s' % (
+                self.shard.index, self.name, result ) )
+        return result
+
+    def cmd( self, *args, **kwargs ):
+        "Have the shard run a command in our shell and return its output"
+        return self.call( 'cmd', *args, **kwargs )
+
+    def poll( self ):
+        "Return exit status, or None if still running"
+        if not self.done:
+            self.returncode = self.call( 'poll' )
+        return self.returncode
+
+    def wait( self ):
+        "Have the shard reap the shell, and return its exit status"
+        if not self.done:
+            self.returncode = self.call( 'wait' )
+            self.done = True
+            self.conn.close()
+        return self.returncode
+
+    def send_signal( self, sig ):
+        "Send a signal to the shell"
+        os.kill( self.pid, sig )
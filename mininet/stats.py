@@ -0,0 +1,185 @@
+"""
+Resource usage sampling for Mininet nodes (used by the CLI's top
+command)
+
+Samples are read from /proc and cgroupfs rather than by running
+commands in the nodes, so that sampling a large network is cheap:
+each sample makes one pass over /proc for CPU and memory, and reads
+/proc/<pid>/net/dev once per network namespace for interface
+counters.
+
+CPU time is taken from a node's cgroup if it has one (e.g.
+CPULimitedHost); otherwise it is the total for the processes in the
+node's network namespace (or, for nodes in the root namespace, in the
+process tree under the node's shell). Memory is resident set size.
+
+Example:
+
+    stats = NodeStats( net.hosts )
+    before = stats.sample()
+    sleep( 1 )
+    for node, rates in stats.rates( before, stats.sample() ).items():
+        print( node, rates[ 'cpu' ], rates[ 'mem' ] )
+"""
+
+import os
+from time import time
+
+from mininet.util import netDevStats, quietRun, runParallel
+
+CLKTCK = os.sysconf( 'SC_CLK_TCK' )
+PAGESIZE = os.sysconf( 'SC_PAGE_SIZE' )
+
+# Interface rates: name, /proc/net/dev counter, scale
+RATES = ( ( 'rxbps', 'rx_bytes', 8 ), ( 'txbps', 'tx_bytes', 8 ),
+          ( 'rxpps', 'rx_packets', 1 ), ( 'txpps', 'tx_packets', 1 ) )
+
+
+def procStats( proc='/proc' ):
+    """Read every process's parent, CPU time and resident memory
+       proc: procfs mount point
+       returns: { pid: ( ppid, cpu seconds, rss bytes ) }"""
+    procs = {}
+    for name in os.listdir( proc ):
+        if not name.isdigit():
+            continue
+        try:
+            with open( '%s/%s/stat' % ( proc, name ) ) as f:
+                stat = f.read()
+        except ( IOError, OSError ):
+            continue  # Process has exited
+        # The command name may contain spaces, so skip past it
+        fields = stat[ stat.rfind( ')' ) + 2: ].split()
+        procs[ int( name ) ] = (
+            int( fields[ 1 ] ),
+            ( int( fields[ 11 ] ) + int( fields[ 12 ] ) ) / float( CLKTCK ),
+            int( fields[ 21 ] ) * PAGESIZE )
+    return procs
+
+
+def netns( pid, proc='/proc' ):
+    "Return the network namespace of pid, or None if it has exited"
+    try:
+        return os.readlink( '%s/%s/ns/net' % ( proc, pid ) )
+    except ( IOError, OSError ):
+        return None
+
+
+def flowCount( switch ):
+    "Return number of flows in an OVS switch, or None"
+    out = quietRun( [ 'ovs-ofctl', 'dump-aggregate', switch.name ] )
+    for field in out.split():
+        if field.startswith( 'flow_count=' ):
+            return int( field.split( '=' )[ 1 ] )
+    return None
+
+
+class NodeStats( object ):
+    "Sample resource usage of a set of nodes"
+
+    def __init__( self, nodes, flows=False, workers=None ):
+        """nodes: nodes to sample
+           flows: also count flows in (OVS) switches
+           workers: max number of concurrent flow queries"""
+        self.nodes = list( nodes )
+        self.flows = flows
+        self.workers = workers
+        self.rootns = netns( 'self' )
+        # Network namespace of each node in its own namespace
+        self.nodeNs = {}
+        for node in self.nodes:
+            ns = netns( node.pid ) if node.pid else None
+            if ns and ns != self.rootns:
+                self.nodeNs[ ns ] = node
+
+    def usage( self, procs ):
+        """Attribute processes' CPU time and memory to our nodes
+           procs: process stats from procStats()
+           returns: { node: cpu seconds }, { node: rss bytes }"""
+        cpu, mem = {}, {}
+        # Processes in a node's network namespace belong to it
+        for pid, ( _ppid, secs, rss ) in procs.items():
+            node = self.nodeNs.get( netns( pid ) )
+            if node:
+                cpu[ node ] = cpu.get( node, 0 ) + secs
+                mem[ node ] = mem.get( node, 0 ) + rss
+        # Nodes in the root namespace own their shell's process tree
+        children = {}
+        for pid, ( ppid, _secs, _rss ) in procs.items():
+            children.setdefault( ppid, [] ).append( pid )
+        inNs = set( self.nodeNs.values() )
+        for node in self.nodes:
+            if not node.pid or node in inNs:
+                continue
+            stack, total, rss = [ node.pid ], 0, 0
+            while stack:
+                pid = stack.pop()
+                if pid in procs:
+                    total += procs[ pid ][ 1 ]
+                    rss += procs[ pid ][ 2 ]
+                stack.extend( children.get( pid, () ) )
+            cpu[ node ], mem[ node ] = total, rss
+        return cpu, mem
+
+    def sample( self ):
+        """Take a sample
+           returns: { node: { 'time', 'cpu', 'mem', 'intfs', 'flows' } }"""
+        now = time()
+        cpu, mem = self.usage( procStats() )
+        inNs = set( self.nodeNs.values() )
+        # Interface counters: one read per namespace
+        rootIntfs = None
+        samples = {}
+        for node in self.nodes:
+            usage = getattr( node, 'cpuUsage', None )
+            secs = usage() if usage else None
+            names = node.intfNames()
+            if node not in inNs:
+                if rootIntfs is None:
+                    rootIntfs = netDevStats()
+                intfs = dict( ( name, rootIntfs[ name ] ) for name in names
+                              if name in rootIntfs )
+            else:
+                try:
+                    intfs = netDevStats( node.pid, names )
+                except ( IOError, OSError ):
+                    intfs = {}
+            samples[ node ] = { 'time': now,
+                                'cpu': secs if secs is not None
+                                else cpu.get( node, 0 ),
+                                'mem': mem.get( node, 0 ),
+                                'intfs': intfs, 'flows': None }
+        if self.flows:
+            switches = [ n for n in self.nodes if hasattr( n, 'dpctl' ) ]
+            for switch, count, _err in runParallel(
+                    flowCount, switches, self.workers ):
+                samples[ switch ][ 'flows' ] = count
+        return samples
+
+    @staticmethod
+    def rates( before, after ):
+        """Compute usage rates between two samples
+           before, after: samples from sample()
+           returns: { node: { 'cpu': % of a core, 'mem': bytes,
+                      'flows': count or None, 'intfs': { intf:
+                      { 'rxbps', 'txbps', 'rxpps', 'txpps' } } } }"""
+        rates = {}
+        for node, cur in after.items():
+            prev = before.get( node )
+            if prev is None:
+                continue
+            elapsed = max( cur[ 'time' ] - prev[ 'time' ], 1e-6 )
+            intfs = {}
+            for name, counters in cur[ 'intfs' ].items():
+                last = prev[ 'intfs' ].get( name )
+                if last is not None:
+                    intfs[ name ] = dict(
+                        ( key, max( 0, counters[ counter ] -
+                                    last[ counter ] ) * scale / elapsed )
+                        for key, counter, scale in RATES )
+            # Processes that exit take their CPU time with them
+            rates[ node ] = {
+                'cpu': max( 0, cur[ 'cpu' ] - prev[ 'cpu' ] ) * 100 / elapsed,
+                'mem': cur[ 'mem' ], 'flows': cur[ 'flows' ],
+                'intfs': intfs }
+        return rates
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the JSON-RPC control API."""
+
+import os
+import stat
+import sys
+import unittest
+from tempfile import mkdtemp
+
+from mininet.net import Mininet
+from mininet.topo import Topo
+from mininet.api import ( APIServer, APIClient, APIError, METHOD_NOT_FOUND,
+                          INVALID_PARAMS, SERVER_ERROR )
+from mininet.log import setLogLevel
+from mininet.clean import cleanup
+
+
+class testAPI( unittest.TestCase ):
+    "Drive a running network through the control API"
+
+    def setUp( self ):
+        topo = Topo()
+        h1, h2, h3 = [ topo.addHost( 'h%d' % i ) for i in ( 1, 2, 3 ) ]
+        topo.addLink( h1, h2 )
+        topo.addLink( h2, h3 )
+        self.path = os.path.join( mkdtemp(), 'mn.sock' )
+        self.net = Mininet( topo=topo, controller=None, api=self.path )
+        self.net.start()
+        self.client = APIClient( self.path )
+
+    def tearDown( self ):
+        self.client.close()
+        self.net.stop()
+        self.assertFalse( os.path.exists( self.path ) )
+        os.rmdir( os.path.dirname( self.path ) )
+        if sys.exc_info() != ( None, None, None ):
+            cleanup()
+
+    def testMode( self ):
+        "Only our user can connect to the socket"
+        mode = os.stat( self.path ).st_mode
+        self.assertTrue( stat.S_ISSOCK( mode ) )
+        self.assertEqual( stat.S_IMODE( mode ) & 0o077, 0 )
+
+    def testCmd( self ):
+        "Run commands in node shells and namespaces"
+        call = self.client.call
+        self.assertEqual( call( 'nodes' )[ 'hosts' ], [ 'h1', 'h2', 'h3' ] )
+        self.assertEqual( call( 'cmd', node='h1', cmd='echo hi' ).strip(),
+                          'hi' )
+        lines = []
+        result = call( 'popen', node='h2', cmd='echo a; echo b',
+                       stream=True,
+                       notify=lambda _m, params: lines.append(
+                           params[ 'line' ] ) )
+        self.assertEqual( lines, [ 'a\n', 'b\n' ] )
+        self.assertEqual( result[ 'code' ], 0 )
+        stats = call( 'stats', nodes=[ 'h1' ] )
+        self.assertTrue( 'h1-eth0' in stats[ 'h1' ] )
+
+    def testBatch( self ):
+        "Batches keep each node's requests in order"
+        requests = [ { 'method': 'cmd',
+                       'params': { 'node': 'h%d' % ( i % 3 + 1 ),
+                                   'cmd': 'echo %d' % i } }
+                     for i in range( 9 ) ]
+        results = self.client.call( 'batch', requests=requests )
+        self.assertEqual( [ r[ 'result' ].strip() for r in results ],
+                          [ str( i ) for i in range( 9 ) ] )
+
+    def testErrors( self ):
+        "Bad requests return JSON-RPC errors"
+        call = self.client.call
+        for method, params, code in (
+                ( 'nosuchmethod', {}, METHOD_NOT_FOUND ),
+                ( 'cmd', { 'node': 'h99', 'cmd': 'true' }, INVALID_PARAMS ),
+                ( 'link', { 'node1': 'h1', 'node2': 'h3', 'status': 'up' },
+                  INVALID_PARAMS ),
+                ( 'cmd', { 'node': 'h1' }, INVALID_PARAMS ),
+                ( 'cmd', { 'node': 'h1', 'cmd': 'true', 'x': 1 },
+                  INVALID_PARAMS ),
+                ( 'linkConfig', { 'node1': 'h1', 'node2': 'h2',
+                                  '_notify': 1 }, INVALID_PARAMS ),
+                # A TypeError inside a method isn't the caller's params
+                ( 'stats', { 'nodes': 1 }, SERVER_ERROR ) ):
+            with self.assertRaises( APIError ) as context:
+                call( method, **params )
+            self.assertEqual( context.exception.code, code )
+        # The connection still works
+        self.assertTrue( call( 'link', node1='h1', node2='h2',
+                               status='up' ) )
+
+    def testBusy( self ):
+        "cmd fails if another thread is using the node's shell"
+        h1 = self.net[ 'h1' ]
+        h1.sendCmd( 'sleep 1000' )
+        with self.assertRaises( APIError ) as context:
+            self.client.call( 'cmd', node='h1', cmd='true' )
+        self.assertTrue( 'busy' in str( context.exception ) )
+        h1.sendInt()
+        h1.waitOutput()
+        self.assertEqual( self.client.call( 'cmd', node='h1',
+                                            cmd='echo ok' ).strip(), 'ok' )
+
+    def testNotSocket( self ):
+        "The server won't replace a file that isn't a socket"
+        path = os.path.join( os.path.dirname( self.path ), 'file' )
+        with open( path, 'w' ) as f:
+            f.write( 'data' )
+        with self.assertRaises( Exception ):
+            APIServer( self.net, path ).start()
+        self.assertTrue( os.path.isfile( path ) )
+        os.unlink( path )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test changing a running network with Mininet.applyTopo()."""
+
+import sys
+import unittest
+
+from mininet.net import Mininet
+from mininet.topo import Topo
+from mininet.log import setLogLevel
+from mininet.clean import cleanup
+
+
+def linkedTopo( n ):
+    "Return a topology of n hosts, each linked to h1"
+    topo = Topo()
+    topo.addHost( 'h1' )
+    for i in range( 2, n + 1 ):
+        topo.addLink( 'h1', topo.addHost( 'h%d' % i ) )
+    return topo
+
+
+class testApplyTopo( unittest.TestCase ):
+    "Apply topology changes to running networks"
+
+    def tearDown( self ):
+        if sys.exc_info() != ( None, None, None ):
+            cleanup()
+
+    def testGrow( self ):
+        "Only the new host and link are added"
+        net = Mininet( topo=linkedTopo( 2 ), controller=None )
+        net.start()
+        h2 = net[ 'h2' ]
+        diff = net.applyTopo( linkedTopo( 3 ) )
+        self.assertEqual( diff.addNodes, [ 'h3' ] )
+        self.assertTrue( net[ 'h2' ] is h2 )
+        self.assertEqual( len( net.links ), 2 )
+        net.stop()
+
+    def testNoTopo( self ):
+        "A network built without a topology can't be diffed"
+        net = Mininet( controller=None )
+        h1, h2 = net.addHost( 'h1' ), net.addHost( 'h2' )
+        net.addLink( h1, h2 )
+        net.start()
+        self.assertRaises( Exception, net.applyTopo, linkedTopo( 2 ) )
+        self.assertEqual( len( net.links ), 1 )
+        net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test CPUPlacer, which pins hosts to cores."""
+
+import unittest
+
+from mininet.node import CPUPlacer
+from mininet.topo import Topo
+from mininet.topolib import TreeTopo
+from mininet.util import CPUInfo
+
+
+def twoSockets():
+    "Two sockets, four cores each, two threads per core"
+    return [ CPUInfo( cpu=cpu, core=cpu % 4, socket=cpu % 8 // 4,
+                      node=cpu % 8 // 4, llc=cpu % 8 // 4 * 4 )
+             for cpu in range( 16 ) ]
+
+
+class testCPUPlacer( unittest.TestCase ):
+    "Test topology-aware CPU placement"
+
+    def testSwitchGroups( self ):
+        "Hosts on the same edge switch share a NUMA node"
+        placer = CPUPlacer( cpus=twoSockets() )
+        placement = placer.place( TreeTopo( depth=2, fanout=4 ) )
+        self.assertEqual( len( placement ), 16 )
+        for first in 1, 5, 9, 13:
+            nodes = set( placement[ 'h%d' % h ][ 1 ]
+                         for h in range( first, first + 4 ) )
+            self.assertEqual( len( nodes ), 1 )
+        # Both nodes are used, and no core is used twice
+        self.assertEqual( set( n for _c, n in placement.values() ),
+                          set( [ 0, 1 ] ) )
+        self.assertEqual( len( set( placement.values() ) ), 16 )
+
+    def testPhysicalCoresFirst( self ):
+        "A small group gets its own physical cores on one node"
+        placer = CPUPlacer( cpus=twoSockets() )
+        topo = Topo()
+        topo.addSwitch( 's1' )
+        for h in 'h1', 'h2', 'h3':
+            topo.addHost( h )
+            topo.addLink( h, 's1' )
+        placement = placer.place( topo )
+        self.assertEqual( sorted( placement.values() ),
+                          [ ( 0, 0 ), ( 1, 0 ), ( 2, 0 ) ] )
+
+    def testGroupHint( self ):
+        "cpuGroup overrides grouping by switch"
+        placer = CPUPlacer( cpus=twoSockets() )
+        topo = Topo()
+        topo.addSwitch( 's1' )
+        topo.addSwitch( 's2' )
+        topo.addLink( 's1', 's2' )
+        for h in range( 1, 17 ):
+            name = topo.addHost( 'h%d' % h, cpuGroup=h % 2 )
+            topo.addLink( name, 's1' if h <= 8 else 's2' )
+        placement = placer.place( topo )
+        for parity in 0, 1:
+            nodes = set( placement[ 'h%d' % h ][ 1 ]
+                         for h in range( 1, 17 ) if h % 2 == parity )
+            self.assertEqual( len( nodes ), 1 )
+
+    def testReserve( self ):
+        "Reserved cores (and their siblings) are never used"
+        placer = CPUPlacer( cpus=twoSockets(), reserve=1 )
+        self.assertEqual( placer.reserved, [ 0, 4, 8, 12 ] )
+        placement = placer.place( TreeTopo( depth=2, fanout=4 ) )
+        used = set( core for core, _node in placement.values() )
+        self.assertFalse( used & set( placer.reserved ) )
+        self.assertRaises( Exception, CPUPlacer, cpus=twoSockets(),
+                           reserve=4 )
+
+
+if __name__ == "__main__":
+    unittest.main()
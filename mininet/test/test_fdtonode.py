@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+"""
+Regression test for stale entries in Node.fdToNode()
+"""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Node
+from mininet.clean import cleanup
+from mininet.topo import SingleSwitchTopo
+
+class TestFdToNode( unittest.TestCase ):
+    "Verify that fdToNode() forgets nodes that have been cleaned up"
+
+    def testFdToNode( self ):
+        "Test that fds map to live nodes only"
+        for _ in range( 0, 3 ):
+            net = Mininet( SingleSwitchTopo() )
+            net.start()
+            fds = {}
+            for host in net.hosts:
+                fd = host.stdout.fileno()
+                fds[ fd ] = host
+                self.assertIs( Node.fdToNode( fd ), host )
+            net.stop()
+            for fd in fds:
+                self.assertIsNone( Node.fdToNode( fd ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test reuse of node shells through a NodePool."""
+
+import sys
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import NodePool
+from mininet.topo import Topo
+from mininet.stats import procStats, netns
+from mininet.log import setLogLevel
+from mininet.clean import cleanup
+
+
+class LinkedTopo( Topo ):
+    "Two directly linked hosts"
+    # pylint: disable=arguments-differ
+    def build( self, **hostOpts ):
+        h1 = self.addHost( 'h1', **hostOpts )
+        h2 = self.addHost( 'h2', **hostOpts )
+        self.addLink( h1, h2 )
+
+
+class testNodePool( unittest.TestCase ):
+    "Build, stop and rebuild networks with a NodePool"
+
+    def setUp( self ):
+        self.pool = NodePool()
+
+    def tearDown( self ):
+        self.pool.close()
+        self.assertEqual( self.pool.idle, [] )
+        if sys.exc_info() != ( None, None, None ):
+            cleanup()
+
+    def runNet( self, **hostOpts ):
+        "Build and start a network using our pool"
+        net = Mininet( topo=LinkedTopo( **hostOpts ), controller=None,
+                       pool=self.pool )
+        net.start()
+        return net
+
+    def testReuse( self ):
+        "Shells are reused, and their namespaces are reset"
+        net = self.runNet()
+        h1 = net[ 'h1' ]
+        pid = h1.pid
+        h1.cmd( 'ip link add extra0 type veth peer name extra1' )
+        h1.cmd( 'ip route add 10.99.0.0/16 dev lo' )
+        h1.cmd( 'sleep 1000 &' )
+        self.assertTrue( 'extra0' in h1.cmd( 'ls /sys/class/net' ) )
+        net.stop()
+        self.assertEqual( len( self.pool.idle ), 2 )
+        net = self.runNet()
+        h1 = net[ 'h1' ]
+        self.assertTrue( pid in ( h1.pid, net[ 'h2' ].pid ) )
+        for host in net.hosts:
+            intfs = sorted( host.cmd( 'ls /sys/class/net' ).split() )
+            self.assertEqual( intfs, [ host.name + '-eth0', 'lo' ] )
+            self.assertFalse( '10.99.0.0' in host.cmd( 'ip route' ) )
+            # The shell is the only process left in its namespace
+            ns = netns( host.pid )
+            self.assertEqual( [ p for p in procStats()
+                                if netns( p ) == ns ], [ host.pid ] )
+        net.stop()
+
+    def testSocketTransport( self ):
+        "Socket transport shells are only reused by socket nodes"
+        net = self.runNet( transport='socket' )
+        net.stop()
+        self.assertEqual( len( self.pool.idle ), 2 )
+        self.assertEqual( self.pool.get(), None )
+        net = self.runNet()
+        self.assertEqual( len( self.pool.idle ), 2 )
+        self.assertEqual( net[ 'h1' ].transport, 'pty' )
+        net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test preflight resource estimates."""
+
+import unittest
+from functools import partial
+
+from mininet.node import Host, CPULimitedHost, UserSwitch, NullController
+from mininet.link import OVSLink
+from mininet.nodelib import LazyHost
+from mininet.topo import LinearTopo
+from mininet.preflight import estimate, resources, SPAREFDS
+
+
+class testPreflight( unittest.TestCase ):
+    "Test estimate(), which counts the resources a topology needs"
+
+    def testLinear( self ):
+        "Count shells, ptys and interfaces for a linear topology"
+        need = estimate( LinearTopo( k=4 ) )
+        # 4 hosts, 4 switches and a controller
+        self.assertEqual( need[ 'shells' ], 9 )
+        self.assertEqual( need[ 'ptys' ], 9 )
+        # 7 veth pairs and 4 host loopbacks
+        self.assertEqual( need[ 'interfaces' ], 18 )
+        self.assertEqual( need[ 'neighbors' ], 12 )
+        self.assertEqual( need[ 'cgroups' ], 0 )
+
+    def testClasses( self ):
+        "Node and link classes change the estimate"
+        need = estimate( LinearTopo( k=4 ),
+                         host=partial( CPULimitedHost, transport='socket' ),
+                         switch=UserSwitch, link=OVSLink,
+                         controller=NullController, peers=1 )
+        self.assertEqual( need[ 'shells' ], 8 )
+        self.assertEqual( need[ 'ptys' ], 4 )
+        self.assertEqual( need[ 'cgroups' ], 4 )
+        # 4 hosts + 3 * 4 for user switches
+        self.assertEqual( need[ 'processes' ], 16 )
+        self.assertEqual( need[ 'neighbors' ], 4 )
+        # Loopbacks, taps and host links (switch links are patches)
+        self.assertEqual( need[ 'interfaces' ], 4 + 4 + 2 * 4 )
+
+    def testLazy( self ):
+        "Lazy hosts need no ptys or fds until they start a shell"
+        need = estimate( LinearTopo( k=4 ), host=LazyHost,
+                         controller=NullController )
+        # Only the 4 switches have shells
+        self.assertEqual( need[ 'ptys' ], 4 )
+        self.assertEqual( need[ 'fds' ], SPAREFDS + 2 * 4 )
+        # A pause process for each host
+        self.assertEqual( need[ 'processes' ], 8 )
+
+    def testResources( self ):
+        "Limits are reported for each resource"
+        need = estimate( LinearTopo( k=2 ), host=Host )
+        names = [ r.name for r in resources( need ) ]
+        for name in 'ptys', 'fds', 'processes', 'neighbors', 'memory':
+            self.assertTrue( name in names )
+
+
+if __name__ == "__main__":
+    unittest.main()
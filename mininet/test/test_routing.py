@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test static route compilation"""
+
+import unittest
+
+from mininet.topo import Topo
+from mininet.routing import addressLinks, compileRoutes
+
+
+class TestRouting( unittest.TestCase ):
+    "Test addressLinks() and compileRoutes()"
+
+    @staticmethod
+    def diamond():
+        "h1 - r1 - ( r2 | r3 ) - r4 - h2"
+        topo = Topo()
+        h1, h2 = topo.addHost( 'h1' ), topo.addHost( 'h2' )
+        r1, r2, r3, r4 = [ topo.addHost( 'r%d' % i ) for i in range( 1, 5 ) ]
+        for node1, node2 in ( ( h1, r1 ), ( r1, r2 ), ( r1, r3 ),
+                              ( r2, r4 ), ( r3, r4 ), ( r4, h2 ) ):
+            topo.addLink( node1, node2 )
+        return topo
+
+    def testAddressLinks( self ):
+        "Each link gets its own /30, and hosts get a default route"
+        topo = self.diamond()
+        subnets = addressLinks( topo )
+        self.assertEqual( len( subnets ), 6 )
+        self.assertEqual( len( set( subnets ) ), 6 )
+        h1 = topo.nodeInfo( 'h1' )
+        r1 = topo.nodeInfo( 'r1' )
+        self.assertEqual( h1[ 'defaultRoute' ],
+                          'via %s' % r1[ 'ip' ].split( '/' )[ 0 ] )
+        self.assertTrue( 'defaultRoute' not in r1 )
+        for _n1, _n2, opts in topo.links( withInfo=True ):
+            self.assertTrue( opts[ 'params1' ][ 'ip' ].endswith( '/30' ) )
+
+    def testCompileRoutes( self ):
+        "Routes use shortest paths, and ECMP uses both of them"
+        topo = self.diamond()
+        addressLinks( topo )
+        routes = compileRoutes( topo )
+        self.assertEqual( sorted( routes ), [ 'r1', 'r2', 'r3', 'r4' ] )
+        # r1 has 3 directly connected subnets out of 6
+        self.assertEqual( len( routes[ 'r1' ] ), 3 )
+        self.assertFalse( any( 'nexthop' in cmd for cmd in routes[ 'r1' ] ) )
+        ecmp = compileRoutes( topo, ecmp=True )
+        multipath = [ cmd for cmd in ecmp[ 'r1' ] if 'nexthop' in cmd ]
+        # Only the r4-h2 subnet is reachable through both r2 and r3
+        self.assertEqual( len( multipath ), 1 )
+        self.assertEqual( multipath[ 0 ].count( 'nexthop via' ), 2 )
+        # Only routers with multipath routes are marked
+        self.assertTrue( topo.nodeInfo( 'r1' ).get( 'multipath' ) )
+        self.assertFalse( topo.nodeInfo( 'r2' ).get( 'multipath' ) )
+        compileRoutes( topo )
+        self.assertFalse( topo.nodeInfo( 'r1' ).get( 'multipath' ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test running node shells in shard worker processes."""
+
+import sys
+import time
+import unittest
+
+from mininet.net import Mininet
+from mininet.topo import Topo
+from mininet.util import runParallel, Python3
+from mininet.log import setLogLevel
+from mininet.clean import cleanup
+
+
+class LinkedTopo( Topo ):
+    "Two directly linked hosts"
+
+    def build( self ):
+        h1 = self.addHost( 'h1' )
+        h2 = self.addHost( 'h2' )
+        self.addLink( h1, h2 )
+
+
+@unittest.skipUnless( Python3, 'shards require Python 3' )
+class testShard( unittest.TestCase ):
+    "Build a network whose hosts' shells run in one shard"
+
+    def setUp( self ):
+        self.net = Mininet( topo=LinkedTopo(), controller=None, shards=1 )
+        self.net.start()
+
+    def tearDown( self ):
+        self.net.stop()
+        self.assertEqual( self.net.shards, [] )
+        if sys.exc_info() != ( None, None, None ):
+            cleanup()
+
+    def testCmd( self ):
+        "cmd() runs in the shard, and sendCmd() runs locally"
+        h1, h2 = self.net.hosts
+        self.assertTrue( h1.shard and h1.shard is h2.shard )
+        self.assertEqual( h1.cmd( 'echo $$' ).strip(), str( h1.pid ) )
+        h2.sendCmd( 'echo hello' )
+        self.assertEqual( h2.waitOutput().strip(), 'hello' )
+        self.assertTrue( 'h1-eth0' in h1.cmd( 'ip link' ) )
+
+    def testConcurrent( self ):
+        "Nodes in the same shard run commands at the same time"
+        start = time.time()
+        runParallel( lambda h: h.cmd( 'sleep 1' ), self.net.hosts,
+                     workers=2 )
+        self.assertLess( time.time() - start, 1.8 )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test resource usage sampling."""
+
+import os
+import unittest
+
+from mininet.stats import procStats, NodeStats
+
+
+class testStats( unittest.TestCase ):
+    "Test procStats() and NodeStats.rates()"
+
+    def testProcStats( self ):
+        "We can find ourselves and our parent"
+        procs = procStats()
+        ppid, cpu, rss = procs[ os.getpid() ]
+        self.assertEqual( ppid, os.getppid() )
+        self.assertTrue( cpu >= 0 )
+        self.assertTrue( rss > 0 )
+
+    def testRates( self ):
+        "Rates are per second, and never negative"
+        counters = dict( rx_bytes=1000, tx_bytes=0,
+                         rx_packets=10, tx_packets=5 )
+        before = { 'h1': { 'time': 10.0, 'cpu': 1.0, 'mem': 100,
+                           'flows': None,
+                           'intfs': { 'h1-eth0': counters } } }
+        after = { 'h1': { 'time': 12.0, 'cpu': 2.0, 'mem': 200,
+                          'flows': None,
+                          'intfs': { 'h1-eth0': dict(
+                              counters, rx_bytes=3000, tx_packets=1 ),
+                              'h1-eth1': counters } } }
+        rates = NodeStats.rates( before, after )[ 'h1' ]
+        self.assertEqual( rates[ 'cpu' ], 50 )
+        self.assertEqual( rates[ 'mem' ], 200 )
+        intf = rates[ 'intfs' ][ 'h1-eth0' ]
+        self.assertEqual( intf[ 'rxbps' ], 8000 )
+        self.assertEqual( intf[ 'rxpps' ], 0 )
+        self.assertEqual( intf[ 'txpps' ], 0 )
+        # New interfaces have no rate yet
+        self.assertEqual( list( rates[ 'intfs' ] ), [ 'h1-eth0' ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test that Mininet.stop() cleans up after a network."""
+
+import os
+import signal
+import sys
+import unittest
+
+from mininet.net import Mininet
+from mininet.topo import Topo
+from mininet.util import quietRun
+from mininet.log import setLogLevel
+from mininet.clean import cleanup
+
+
+class RootLinkTopo( Topo ):
+    "A host linked to a node in the root namespace"
+
+    def build( self ):
+        h1 = self.addHost( 'h1' )
+        r1 = self.addHost( 'r1', inNamespace=False )
+        self.addLink( h1, r1 )
+
+
+class testStop( unittest.TestCase ):
+    "Stop networks whose namespaces outlive their shells"
+
+    def tearDown( self ):
+        if sys.exc_info() != ( None, None, None ):
+            cleanup()
+
+    def testRootLinks( self ):
+        "Root namespace ends of links are deleted"
+        net = Mininet( topo=RootLinkTopo(), controller=None )
+        net.start()
+        h1 = net[ 'h1' ]
+        # Keeps h1's namespace alive after its shell exits
+        h1.cmd( "( trap '' HUP; exec sleep 1000 ) &" )
+        pid = h1.lastPid
+        self.assertTrue( pid )
+        try:
+            net.stop()
+            self.assertTrue( 'r1-eth0' not in quietRun( 'ip -o link' ) )
+        finally:
+            os.kill( pid, signal.SIGKILL )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test functions defined in mininet.topo."""
+
+import unittest
+
+from mininet.topo import ( Topo, LinearTopo, topoDiff, linkKey,
+                           CompactMultiGraph )
+from mininet.topolib import TreeTopo
+
+
+class testTopoDiff( unittest.TestCase ):
+    "Test topoDiff(), which compares two topologies"
+
+    def testSame( self ):
+        "Identical topologies have no differences"
+        diff = topoDiff( LinearTopo( k=3 ), LinearTopo( k=3 ) )
+        self.assertFalse( any( diff ) )
+
+    def testGrow( self ):
+        "Adding a switch adds its nodes and links"
+        diff = topoDiff( LinearTopo( k=2 ), LinearTopo( k=3 ) )
+        self.assertEqual( diff.addNodes, [ 'h3', 's3' ] )
+        self.assertEqual( diff.delNodes, [] )
+        self.assertEqual( len( diff.addLinks ), 2 )
+        self.assertEqual( diff.delLinks, [] )
+
+    def testShrink( self ):
+        "Removing a switch deletes its nodes and links"
+        diff = topoDiff( LinearTopo( k=3 ), LinearTopo( k=2 ) )
+        self.assertEqual( diff.delNodes, [ 'h3', 's3' ] )
+        self.assertEqual( len( diff.delLinks ), 2 )
+
+    def testChanged( self ):
+        "Changed node and link parameters are reported as changes"
+        old, new = Topo(), Topo()
+        for topo, delay, ip in ( old, '1ms', '10.0.0.1' ), ( new, '2ms',
+                                                              '10.0.0.2' ):
+            topo.addSwitch( 's1' )
+            topo.addHost( 'h1', ip=ip )
+            topo.addLink( 'h1', 's1', delay=delay )
+        diff = topoDiff( old, new )
+        self.assertEqual( diff.changedNodes, [ 'h1' ] )
+        self.assertEqual( len( diff.changedLinks ), 1 )
+        oldInfo, newInfo = diff.changedLinks[ 0 ]
+        self.assertEqual( ( oldInfo[ 'delay' ], newInfo[ 'delay' ] ),
+                          ( '1ms', '2ms' ) )
+
+    def testLinkKey( self ):
+        "Link keys don't depend on link direction"
+        info = dict( node1='s1', port1=2, node2='h1', port2=0 )
+        rev = dict( node1='h1', port1=0, node2='s1', port2=2 )
+        self.assertEqual( linkKey( info ), linkKey( rev ) )
+
+
+class testTopoIndex( unittest.TestCase ):
+    "Test Topo's port index and cached sorted views"
+
+    def testPorts( self ):
+        "port() finds single and parallel links"
+        topo = LinearTopo( k=3 )
+        self.assertEqual( topo.port( 's1', 's2' ), ( 2, 2 ) )
+        self.assertEqual( topo.port( 'h1', 's1' ), ( 0, 1 ) )
+        self.assertEqual( topo.port( 'h1', 's2' ), [] )
+        topo.addLink( 's1', 's2' )
+        self.assertEqual( topo.port( 's2', 's1' ), [ ( 2, 2 ), ( 4, 3 ) ] )
+        self.assertRaises( KeyError, topo.port, 'h9', 's1' )
+
+    def testReusedPort( self ):
+        "Reusing a port number replaces its index entry"
+        topo = Topo()
+        for name in 's1', 's2', 's3':
+            topo.addSwitch( name )
+        topo.addLink( 's1', 's2', port1=1, port2=1 )
+        self.assertEqual( topo.port( 's1', 's2' ), ( 1, 1 ) )
+        topo.addLink( 's1', 's3', port1=1, port2=1 )
+        self.assertEqual( topo.port( 's1', 's2' ), [] )
+        self.assertEqual( topo.port( 's1', 's3' ), ( 1, 1 ) )
+
+    def testViews( self ):
+        "Sorted views are updated when the topology changes"
+        topo = LinearTopo( k=2 )
+        self.assertEqual( topo.nodes(), [ 'h1', 'h2', 's1', 's2' ] )
+        topo.addSwitch( 's10' )
+        topo.addHost( 'h10' )
+        topo.addLink( 'h10', 's10' )
+        self.assertEqual( topo.switches(), [ 's1', 's2', 's10' ] )
+        self.assertEqual( topo.hosts(), [ 'h1', 'h2', 'h10' ] )
+        self.assertTrue( ( 'h10', 's10' ) in topo.links( sort=True ) )
+        # Returned lists may be changed safely
+        topo.hosts().append( 'h99' )
+        self.assertEqual( len( topo.hosts() ), 3 )
+        topo.setNodeInfo( 'h10', { 'isSwitch': True } )
+        self.assertEqual( topo.switches(), [ 'h10', 's1', 's2', 's10' ] )
+
+
+class testCompactMultiGraph( unittest.TestCase ):
+    "Test CompactMultiGraph, which stores a Topo's graph compactly"
+
+    def testSameTopo( self ):
+        "A compact TreeTopo has the same nodes, links and ports"
+        topo = TreeTopo( depth=2, fanout=3 )
+        compact = TreeTopo( depth=2, fanout=3, graph=CompactMultiGraph )
+        self.assertEqual( compact.nodes(), topo.nodes() )
+        self.assertEqual( compact.hosts(), topo.hosts() )
+        self.assertEqual( compact.links( sort=True, withKeys=True,
+                                         withInfo=True ),
+                          topo.links( sort=True, withKeys=True,
+                                      withInfo=True ) )
+        self.assertEqual( compact.port( 's1', 's2' ), topo.port( 's1', 's2' ) )
+        self.assertEqual( compact.linkInfo( 'h1', 's2' ),
+                          topo.linkInfo( 'h1', 's2' ) )
+        self.assertEqual( sorted( compact.g.neighbors( 's2' ) ),
+                          sorted( topo.g.neighbors( 's2' ) ) )
+        self.assertFalse( any( topoDiff( topo, compact ) ) )
+
+    def testMultiLinks( self ):
+        "Parallel links get increasing keys"
+        topo = Topo( graph=CompactMultiGraph )
+        topo.addSwitch( 's1' )
+        topo.addSwitch( 's2' )
+        keys = [ topo.addLink( 's1', 's2' ) for _ in range( 3 ) ]
+        self.assertEqual( keys, [ 1, 2, 3 ] )
+        self.assertEqual( sorted( topo.g[ 's2' ][ 's1' ] ), [ 1, 2, 3 ] )
+
+    def testSetInfo( self ):
+        "Link and node info can be changed"
+        topo = Topo( graph=CompactMultiGraph )
+        topo.addHost( 'h1' )
+        topo.addHost( 'h2' )
+        topo.addLink( 'h1', 'h2', delay='1ms' )
+        info = topo.linkInfo( 'h1', 'h2' )
+        info[ 'delay' ] = '2ms'
+        topo.setlinkInfo( 'h1', 'h2', info )
+        self.assertEqual( topo.linkInfo( 'h2', 'h1' )[ 'delay' ], '2ms' )
+        topo.setNodeInfo( 'h1', { 'ip': '10.0.0.9' } )
+        self.assertEqual( topo.nodeInfo( 'h1' ), { 'ip': '10.0.0.9' } )
+        self.assertEqual( topo.nodeInfo( 'h2' ), {} )
+
+    def testChangeInPlace( self ):
+        "Changing one node's info in place doesn't change other nodes"
+        topo = Topo( graph=CompactMultiGraph )
+        for i in range( 3 ):
+            topo.addHost( 'h%d' % i )
+        topo.addSwitch( 's1' )
+        topo.addSwitch( 's2' )
+        topo.addLink( 'h0', 's1', delay='1ms' )
+        topo.addLink( 'h1', 's1', delay='1ms' )
+        topo.nodeInfo( 'h0' )[ 'ip' ] = '10.9.9.9/8'
+        topo.nodeInfo( 's1' )[ 'dpid' ] = '99'
+        self.assertEqual( topo.nodeInfo( 'h0' ), { 'ip': '10.9.9.9/8' } )
+        self.assertEqual( topo.nodeInfo( 'h1' ), {} )
+        self.assertEqual( topo.nodeInfo( 'h2' ), {} )
+        self.assertEqual( topo.nodeInfo( 's1' ),
+                          { 'isSwitch': True, 'dpid': '99' } )
+        self.assertEqual( topo.nodeInfo( 's2' ), { 'isSwitch': True } )
+        self.assertEqual( topo.switches(), [ 's1', 's2' ] )
+        topo.linkInfo( 'h0', 's1' )[ 'delay' ] = '2ms'
+        self.assertEqual( topo.linkInfo( 'h1', 's1' )[ 'delay' ], '1ms' )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test saving, loading and caching topologies."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from functools import partial
+
+from mininet.link import TCLink
+from mininet.node import Host
+from mininet.topo import Topo, CompactMultiGraph, topoDiff
+from mininet.topolib import TreeTopo
+from mininet.topofile import saveTopo, loadTopo, cachedTopo
+
+
+class MyHost( Host ):
+    "A host class from outside of mininet"
+
+
+def partialTopo():
+    "Return a topology whose options can't be saved"
+    topo = Topo()
+    topo.addHost( 'h1', cls=partial( Host, ip='10.0.0.9' ) )
+    return topo
+
+
+class testTopoFile( unittest.TestCase ):
+    "Test topology files and the topology cache"
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def roundTrip( self, topo, name, **params ):
+        "Save and load topo, and check that nothing changed"
+        path = os.path.join( self.tmpdir, name )
+        saveTopo( topo, path )
+        loaded = loadTopo( path, **params )
+        self.assertFalse( any( topoDiff( topo, loaded ) ) )
+        self.assertEqual( loaded.port( 's1', 's2' ), topo.port( 's1', 's2' ) )
+        return loaded
+
+    def testTree( self ):
+        "Save and load a tree, compressed or not"
+        topo = TreeTopo( depth=2, fanout=3 )
+        self.roundTrip( topo, 'tree.topo' )
+        self.roundTrip( topo, 'tree.topo.gz', graph=CompactMultiGraph )
+
+    def testOptions( self ):
+        "Classes in options are saved by name"
+        topo = Topo()
+        topo.addSwitch( 's1', dpid='1' )
+        topo.addSwitch( 's2' )
+        topo.addHost( 'h1', ip='10.0.0.1/24' )
+        topo.addLink( 'h1', 's1', cls=TCLink, bw=10 )
+        topo.addLink( 's1', 's2', port1=5, port2=7 )
+        topo.addLink( 's1', 's2' )
+        loaded = self.roundTrip( topo, 'options.topo' )
+        self.assertTrue( loaded.linkInfo( 'h1', 's1' )[ 'cls' ] is TCLink )
+        self.assertEqual( loaded.port( 's1', 's2' )[ 0 ], ( 5, 7 ) )
+
+    def testUntrusted( self ):
+        "Classes are only imported from mininet and trusted modules"
+        topo = Topo()
+        topo.addHost( 'h1', cls=MyHost )
+        path = os.path.join( self.tmpdir, 'untrusted.topo' )
+        saveTopo( topo, path )
+        self.assertRaises( Exception, loadTopo, path )
+        loaded = loadTopo( path, modules=[ MyHost.__module__ ] )
+        self.assertTrue( loaded.nodeInfo( 'h1' )[ 'cls' ] is MyHost )
+
+    def testNotClass( self ):
+        "Only Node, Link, Intf and Topo classes are imported"
+        path = os.path.join( self.tmpdir, 'crafted.topo' )
+        for target in 'mininet.util.quietRun', 'shutil.Error':
+            with open( path, 'w' ) as f:
+                f.write( '{"format":"mininet-topo","version":1}\n' )
+                f.write( '["n","h1",{"cls":{"__import__":"%s"}}]\n' %
+                         target )
+            self.assertRaises( Exception, loadTopo, path,
+                               modules=[ 'shutil' ] )
+        topo = Topo()
+        topo.addHost( 'h1', cls=shutil.Error )
+        self.assertRaises( TypeError, saveTopo, topo, path )
+
+    def testCache( self ):
+        "The second cachedTopo() call loads the cached file"
+        cacheDir = os.path.join( self.tmpdir, 'cache' )
+        built = cachedTopo( TreeTopo, 2, fanout=2, cacheDir=cacheDir )
+        self.assertEqual( len( os.listdir( cacheDir ) ), 1 )
+        loaded = cachedTopo( TreeTopo, 2, fanout=2, cacheDir=cacheDir )
+        self.assertFalse( isinstance( loaded, TreeTopo ) )
+        self.assertFalse( any( topoDiff( built, loaded ) ) )
+        cachedTopo( TreeTopo, 2, fanout=3, cacheDir=cacheDir )
+        self.assertEqual( len( os.listdir( cacheDir ) ), 2 )
+
+    def testUncachable( self ):
+        "Topologies that can't be saved are built but not cached"
+        cacheDir = os.path.join( self.tmpdir, 'cache' )
+        topo = cachedTopo( partialTopo, cacheDir=cacheDir )
+        self.assertEqual( topo.hosts(), [ 'h1' ] )
+        self.assertEqual( os.listdir( cacheDir ), [] )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test topology generators defined in mininet.topolib."""
+
+import unittest
+
+from mininet.topo import CompactMultiGraph
+from mininet.topolib import ( FatTreeTopo, LeafSpineTopo, JellyfishTopo,
+                              DragonflyTopo, BCubeTopo )
+
+
+def degrees( topo, nodes ):
+    "Return set of link counts for nodes"
+    counts = dict( ( n, 0 ) for n in nodes )
+    for src, dst in topo.links():
+        for node in src, dst:
+            if node in counts:
+                counts[ node ] += 1
+    return set( counts.values() )
+
+
+class testTopolib( unittest.TestCase ):
+    "Test datacenter topology generators"
+
+    def checkDpids( self, topo ):
+        "Switch dpids are unique and nonzero"
+        dpids = [ int( topo.nodeInfo( s )[ 'dpid' ], 16 )
+                  for s in topo.switches() ]
+        self.assertEqual( len( set( dpids ) ), len( dpids ) )
+        self.assertFalse( 0 in dpids )
+
+    def testFatTree( self ):
+        "A k=4 fat tree has 20 switches and 16 hosts"
+        topo = FatTreeTopo( k=4 )
+        self.assertEqual( len( topo.switches() ), 20 )
+        self.assertEqual( len( topo.hosts() ), 16 )
+        # Every switch uses all k ports
+        self.assertEqual( degrees( topo, topo.switches() ), set( [ 4 ] ) )
+        self.assertEqual( topo.port( 'edge1', 'h1' ), ( 1, 0 ) )
+        self.assertEqual( topo.port( 'edge1', 'agg1' ), ( 3, 1 ) )
+        self.checkDpids( topo )
+
+    def testLeafSpine( self ):
+        "Leaves have ratio * uplinks hosts"
+        topo = LeafSpineTopo( leaves=3, spines=2, ratio=3 )
+        self.assertEqual( len( topo.hosts() ), 18 )
+        self.assertEqual( degrees( topo, [ 'leaf1', 'leaf2', 'leaf3' ] ),
+                          set( [ 8 ] ) )
+        self.assertEqual( degrees( topo, [ 'spine1', 'spine2' ] ),
+                          set( [ 3 ] ) )
+        self.checkDpids( topo )
+
+    def testJellyfish( self ):
+        "Jellyfish is regular and reproducible"
+        topo = JellyfishTopo( switches=20, degree=5, hosts=0, seed=3 )
+        self.assertEqual( degrees( topo, topo.switches() ), set( [ 5 ] ) )
+        same = JellyfishTopo( switches=20, degree=5, hosts=0, seed=3,
+                              graph=CompactMultiGraph )
+        self.assertEqual( topo.links( sort=True ), same.links( sort=True ) )
+        self.checkDpids( topo )
+
+    def testDragonfly( self ):
+        "Every pair of dragonfly groups is linked once"
+        topo = DragonflyTopo( routers=4, hosts=2, globalLinks=2 )
+        self.assertEqual( len( topo.switches() ), 36 )
+        self.assertEqual( len( topo.hosts() ), 72 )
+        # 2 hosts + 3 local + 2 global links per router
+        self.assertEqual( degrees( topo, topo.switches() ), set( [ 7 ] ) )
+        self.checkDpids( topo )
+
+    def testBCube( self ):
+        "BCube(4, 1) servers have 2 links, switches have 4"
+        topo = BCubeTopo( n=4, k=1 )
+        self.assertEqual( len( topo.hosts() ), 16 )
+        self.assertEqual( len( topo.switches() ), 8 )
+        self.assertEqual( degrees( topo, topo.hosts() ), set( [ 2 ] ) )
+        self.assertEqual( degrees( topo, topo.switches() ), set( [ 4 ] ) )
+        self.checkDpids( topo )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test talking to node shells over a socket pair."""
+
+import sys
+import unittest
+from time import sleep
+
+from mininet.node import Host
+from mininet.log import setLogLevel
+from mininet.clean import cleanup
+
+
+class testSocketTransport( unittest.TestCase ):
+    "Run commands on a host with transport='socket'"
+
+    def setUp( self ):
+        self.host = Host( 'h1', transport='socket' )
+
+    def tearDown( self ):
+        self.host.terminate()
+        if sys.exc_info() != ( None, None, None ):
+            cleanup()
+
+    def testCmd( self ):
+        "Commands run and return their output without a pty"
+        self.assertEqual( self.host.slave, None )
+        self.assertEqual( self.host.cmd( 'echo hello' ), 'hello\n' )
+        self.assertEqual( self.host.cmd( '[ -t 1 ] || echo notty' ),
+                          'notty\n' )
+
+    def testMonitor( self ):
+        "monitor() strips background job PIDs and finds lastPid"
+        host = self.host
+        out = host.cmd( 'sleep 1000 &' )
+        self.assertEqual( out, '' )
+        self.assertTrue( host.lastPid )
+        host.cmd( 'kill %d' % host.lastPid )
+        host.sendCmd( 'echo one; echo two' )
+        out = ''
+        while host.waiting:
+            out += host.monitor()
+        self.assertEqual( out, 'one\ntwo\n' )
+
+    def testSendInt( self ):
+        "sendInt() interrupts a foreground command"
+        host = self.host
+        host.sendCmd( 'sleep 1000' )
+        self.assertTrue( host.waiting )
+        # Give the shell time to start sleep
+        sleep( .2 )
+        host.sendInt()
+        host.waitOutput()
+        self.assertFalse( host.waiting )
+        self.assertEqual( host.cmd( 'echo still here' ), 'still here\n' )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
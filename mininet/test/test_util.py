@@ -3,9 +3,15 @@
 """Package: mininet
    Test functions defined in mininet.util."""
 
+import os
+import shutil
+import socket
+import tempfile
 import unittest
 
-from mininet.util import quietRun
+from mininet.util import ( quietRun, runParallel, parseCpuList, cpuTopology,
+                           netDevStats, ipLinkStates, which, cachedProbe,
+                           loadProbes, portOpen )
 
 class testQuietRun( unittest.TestCase ):
     """Test quietRun that runs a command and returns its merged output from
@@ -36,5 +42,145 @@ def testMultipleReads( self ):
             self.assertEqual( n, len( output ) )
 
 
+class testRunParallel( unittest.TestCase ):
+    "Test runParallel, which calls a function on items concurrently"
+
+    @staticmethod
+    def square( n ):
+        "Square n, or fail if n is negative"
+        if n < 0:
+            raise ValueError( 'negative: %d' % n )
+        return n * n
+
+    def testOrder( self ):
+        "Results are returned in item order"
+        for workers in 1, 3, 100:
+            results = runParallel( self.square, range( 10 ), workers )
+            self.assertEqual( [ r[ 1 ] for r in results ],
+                              [ n * n for n in range( 10 ) ] )
+
+    def testErrors( self ):
+        "Exceptions are reported per item"
+        results = runParallel( self.square, [ 1, -2, 3 ], workers=2 )
+        self.assertEqual( [ err is None for _i, _r, err in results ],
+                          [ True, False, True ] )
+        self.assertTrue( isinstance( results[ 1 ][ 2 ], ValueError ) )
+
+    def testEmpty( self ):
+        "No items, no results"
+        self.assertEqual( runParallel( self.square, [] ), [] )
+
+
+class testCpuTopology( unittest.TestCase ):
+    "Test cpuTopology, which reads the CPU layout from sysfs"
+
+    def setUp( self ):
+        self.sysfs = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.sysfs )
+
+    def write( self, path, text ):
+        "Write a file in our fake sysfs"
+        path = os.path.join( self.sysfs, path )
+        if not os.path.isdir( os.path.dirname( path ) ):
+            os.makedirs( os.path.dirname( path ) )
+        with open( path, 'w' ) as f:
+            f.write( text + '\n' )
+
+    def testParseCpuList( self ):
+        "CPU lists may contain ranges"
+        self.assertEqual( parseCpuList( '0-2,5,7-8' ), [ 0, 1, 2, 5, 7, 8 ] )
+        self.assertEqual( parseCpuList( '' ), [] )
+
+    def testTwoSockets( self ):
+        "Two sockets with two SMT cores each, one NUMA node per socket"
+        self.write( 'cpu/online', '0-7' )
+        for cpu in range( 8 ):
+            socket, core = cpu % 4 // 2, cpu % 2
+            base = 'cpu/cpu%d/' % cpu
+            self.write( base + 'topology/physical_package_id', str( socket ) )
+            self.write( base + 'topology/core_id', str( core ) )
+            self.write( base + 'cache/index0/level', '1' )
+            self.write( base + 'cache/index0/shared_cpu_list',
+                        '%d,%d' % ( cpu % 4, cpu % 4 + 4 ) )
+            self.write( base + 'cache/index3/level', '3' )
+            self.write( base + 'cache/index3/shared_cpu_list',
+                        '0-1,4-5' if socket == 0 else '2-3,6-7' )
+        self.write( 'node/node0/cpulist', '0-1,4-5' )
+        self.write( 'node/node1/cpulist', '2-3,6-7' )
+        cpus = cpuTopology( self.sysfs )
+        self.assertEqual( [ c.cpu for c in cpus ], list( range( 8 ) ) )
+        self.assertEqual( [ c.node for c in cpus ], [ 0, 0, 1, 1 ] * 2 )
+        self.assertEqual( [ c.llc for c in cpus ], [ 0, 0, 2, 2 ] * 2 )
+        self.assertEqual( cpus[ 6 ].core, 0 )
+
+
+class testNetDevStats( unittest.TestCase ):
+    "Test netDevStats(), which reads /proc/<pid>/net/dev"
+
+    def testLoopback( self ):
+        "Our own namespace has a loopback interface"
+        stats = netDevStats()
+        self.assertTrue( 'lo' in stats )
+        self.assertEqual( len( stats[ 'lo' ] ), 16 )
+        self.assertTrue( stats[ 'lo' ][ 'rx_bytes' ] >= 0 )
+        self.assertEqual( netDevStats( os.getpid(), intfs=[] ), {} )
+
+
+class testIpLinkStates( unittest.TestCase ):
+    "Test ipLinkStates(), which parses ip -o link show"
+
+    def testLoopback( self ):
+        "Our own namespace has a loopback interface, which is up"
+        states = ipLinkStates()
+        self.assertTrue( 'lo' in states )
+        self.assertTrue( 'UP' in states[ 'lo' ] )
+        self.assertTrue( 'LOOPBACK' in states[ 'lo' ] )
+
+
+class testProbes( unittest.TestCase ):
+    "Test in-process probes and the probe cache"
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cacheFile = os.path.join( self.tmpdir, 'cache',
+                                       'probes.json' )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+        loadProbes.caches.pop( self.cacheFile, None )
+
+    def testWhich( self ):
+        "which() finds executables in the path"
+        self.assertEqual( which( 'sh', path='/nonexistent:/bin' ), '/bin/sh' )
+        self.assertEqual( which( 'sh', path='/nonexistent' ), None )
+        self.assertEqual( which( '/bin/sh' ), '/bin/sh' )
+
+    def testCachedProbe( self ):
+        "Probe output is cached on disk until the program changes"
+        cacheFile = self.cacheFile
+        self.assertEqual( cachedProbe( 'echo probe', cacheFile=cacheFile ),
+                          'probe\n' )
+        # A fresh process reads the cached output rather than running echo
+        loadProbes.caches.clear()
+        loadProbes( cacheFile )[ 'echo probe' ][ 'out' ] = 'cached'
+        self.assertEqual( cachedProbe( 'echo probe', cacheFile=cacheFile ),
+                          'cached' )
+        # Depending on another program changes the key
+        self.assertEqual( cachedProbe( 'echo probe', binaries=[ 'sh' ],
+                                       cacheFile=cacheFile ), 'probe\n' )
+
+    def testPortOpen( self ):
+        "portOpen() connects to a listening TCP port"
+        server = socket.socket()
+        server.bind( ( '127.0.0.1', 0 ) )
+        server.listen( 1 )
+        port = server.getsockname()[ 1 ]
+        self.assertTrue( portOpen( '127.0.0.1', port ) )
+        server.close()
+        self.assertFalse( portOpen( '127.0.0.1', port ) )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -351,6 +351,99 @@ def testPythonInterpreter( self ):
         p.sendline( 'exit' )
         p.wait()
 
+    def testGroup( self ):
+        "Test all and group CLI commands"
+        p = pexpect.spawn( 'mn -w --topo single,4' )
+        p.expect( self.prompt )
+        p.sendline( 'all h* echo hello' )
+        expected = [ 'h%d: +hello' % i for i in range( 1, 5 ) ]
+        while expected:
+            index = p.expect( expected )
+            expected.pop( index )
+        p.expect( self.prompt )
+        p.sendline( 'group -n 2 h1-h2,h4 echo hello' )
+        expected = [ 'h1: +hello', 'h2: +hello', 'h4: +hello' ]
+        while expected:
+            index = p.expect( expected )
+            expected.pop( index )
+        p.expect( self.prompt )
+        p.sendline( 'group -t 1 h1-h4 sleep 10' )
+        p.expect( 'Timed out' )
+        p.expect( self.prompt )
+        # Commands that ignore ^C are killed
+        p.sendline( 'group -t 1 h1 bash -c \'trap "" INT; sleep 30\'' )
+        p.expect( 'killing' )
+        p.expect( self.prompt )
+        p.sendline( 'h1 echo $(( 6 * 7 ))' )
+        p.expect( '42' )
+        p.expect( self.prompt )
+        p.sendline( 'exit' )
+        p.wait()
+
+    def testGroupLazy( self ):
+        "Test that group starts shells for lazy hosts"
+        p = pexpect.spawn( 'mn -w --topo single,2 --host lazy' )
+        p.expect( self.prompt )
+        p.sendline( 'group h1-h2 echo hello' )
+        expected = [ 'h1: +hello', 'h2: +hello' ]
+        while expected:
+            index = p.expect( expected )
+            expected.pop( index )
+        p.expect( self.prompt )
+        p.sendline( 'exit' )
+        p.wait()
+
+    def testParallel( self ):
+        "Test parallel blocks and bg/await CLI commands"
+        p = pexpect.spawn( 'mn -w --topo single,3' )
+        p.expect( self.prompt )
+        p.sendline( 'parallel' )
+        p.sendline( 'h1 sleep 1; echo one' )
+        p.sendline( 'h2 echo two' )
+        p.sendline( 'h1 echo three' )
+        p.sendline( 'end' )
+        # h2 shouldn't wait for h1, but h1's commands run in order
+        p.expect( 'h2: +two' )
+        p.expect( 'h1: +one' )
+        p.expect( 'h1: +three' )
+        p.expect( self.prompt )
+        p.sendline( 'bg h1-h3 sleep 1; echo done' )
+        p.expect( self.prompt )
+        # Commands can't use nodes that are running bg commands
+        p.sendline( 'pingall' )
+        p.expect( 'busy' )
+        p.expect( self.prompt )
+        p.sendline( 'await' )
+        expected = [ 'h%d: +done' % i for i in range( 1, 4 ) ]
+        while expected:
+            index = p.expect( expected )
+            expected.pop( index )
+        p.expect( self.prompt )
+        p.sendline( 'exit' )
+        p.wait()
+
+    def testChangedIP( self ):
+        "Test node name substitution after an address change"
+        p = pexpect.spawn( 'mn -w' )
+        p.expect( self.prompt )
+        p.sendline( 'h1 echo h2' )
+        p.expect( '10.0.0.2' )
+        p.expect( self.prompt )
+        p.sendline( 'h2 ifconfig h2-eth0 10.0.0.22' )
+        p.expect( self.prompt )
+        p.sendline( 'h1 ping -c 1 h2' )
+        p.expect( '10.0.0.22' )
+        p.expect( '0% packet loss' )
+        p.expect( self.prompt )
+        # A failed setIP() doesn't leave a bogus address cached
+        p.sendline( "py h2.setIP( '300.0.0.1/8' )" )
+        p.expect( self.prompt )
+        p.sendline( 'h1 echo h2' )
+        p.expect( '10.0.0.22' )
+        p.expect( self.prompt )
+        p.sendline( 'exit' )
+        p.wait()
+
     def testLink( self ):
         "Test link CLI command using ping"
         p = pexpect.spawn( 'mn -w' )
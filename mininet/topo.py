@@ -11,6 +11,9 @@
 setup for testing, and can even be emulated with the Mininet package.
 """
 
+from array import array
+from collections import namedtuple
+
 from mininet.util import irange, natural, naturalSeq
 
 # pylint: disable=too-many-arguments
@@ -85,6 +88,279 @@ def __getitem__( self, node ):
         "Return link dict for given src node"
         return self.edge[ node ]
 
+    def neighbors( self, node ):
+        "Return list of nodes linked to node"
+        return list( self.edge.get( node, {} ) )
+
+    def __len__( self ):
+        "Return the number of nodes"
+        return len( self.node )
+
+    def convertTo( self, cls, data=False, keys=False ):
+        """Convert to a new object of networkx.MultiGraph-like class cls
+           data: include node and edge data
+           keys: include edge keys as well as edge data"""
+        g = cls()
+        g.add_nodes_from( self.nodes( data=data ) )
+        g.add_edges_from( self.edges( data=( data or keys ), keys=keys ) )
+        return g
+
+
+class EdgeKeys( dict ):
+    """Edge attribute dicts by key, for two nodes of a
+       CompactMultiGraph; setting an entry updates the graph"""
+
+    def __init__( self, graph, src, dst ):
+        dict.__init__( self )
+        self.graph, self.src, self.dst = graph, src, dst
+        self.index = {}  # key -> edge index
+
+    def __setitem__( self, key, attrs ):
+        if key in self.index:
+            self.graph.setEdge( self.index[ key ], attrs )
+        else:
+            self.graph.add_edge( self.src, self.dst, key, dict( attrs ) )
+        dict.__setitem__( self, key, attrs )
+
+
+class NodeAttrs( dict ):
+    """Node attribute dicts by name, for a CompactMultiGraph.
+       Nodes with equal attributes share a dict until one of them is
+       looked up, which gives it a private copy that is safe to change;
+       peek() returns the (possibly shared) dict without copying it"""
+
+    def __init__( self ):
+        dict.__init__( self )
+        self.private = set()  # names whose dicts aren't shared
+
+    def __getitem__( self, name ):
+        attrs = dict.__getitem__( self, name )
+        if name not in self.private:
+            attrs = dict( attrs )
+            dict.__setitem__( self, name, attrs )
+            self.private.add( name )
+        return attrs
+
+    def __setitem__( self, name, attrs ):
+        dict.__setitem__( self, name, attrs )
+        self.private.discard( name )
+
+    def get( self, name, default=None ):
+        return self[ name ] if name in self else default
+
+    def peek( self, name ):
+        "Return name's attribute dict for reading only"
+        return dict.__getitem__( self, name )
+
+
+class CompactMultiGraph( object ):
+    """MultiGraph with compact storage, for large generated topologies.
+       Node names are interned to integer ids, edges and their ports
+       are kept in arrays, adjacency is built (as CSR arrays) only when
+       it is needed, and identical attribute dicts are shared.
+       Edge attribute dicts are built on demand, so change them with
+       Topo.setlinkInfo() rather than in place; node attribute dicts
+       are copied when they are looked up (see NodeAttrs), so that
+       changing one in place doesn't change other nodes."""
+
+    # flags for node1/node2 attributes that match src/dst
+    NODE1, NODE2 = 1, 2
+
+    def __init__( self ):
+        self.node = NodeAttrs()  # name -> attribute dict
+        self.ids = {}  # name -> id
+        self.names = []  # id -> name
+        self.src, self.dst = array( 'l' ), array( 'l' )
+        self.port1, self.port2 = array( 'l' ), array( 'l' )
+        self.flags = array( 'b' )
+        self.keys = []
+        self.opts = []  # other edge attributes (shared dicts)
+        self.lastKey = {}  # src id << 32 | dst id -> highest int key
+        self.shared = {}  # sorted attribute items -> shared dict
+        self.csr = None  # ( offsets, edge indices ), built on demand
+
+    def intern( self, node ):
+        "Return id for node, adding it if necessary"
+        nid = self.ids.get( node )
+        if nid is None:
+            nid = self.ids[ node ] = len( self.names )
+            self.names.append( node )
+            if node not in self.node:
+                self.node[ node ] = self.share( {} )
+            self.csr = None
+        return nid
+
+    def share( self, attrs ):
+        "Return a shared dict equal to attrs, if attrs are hashable"
+        try:
+            key = tuple( sorted( attrs.items() ) )
+            shared = self.shared.get( key )
+        except TypeError:
+            return attrs
+        if shared is None:
+            # Our own copy, so that the caller can't change it
+            shared = self.shared[ key ] = dict( attrs )
+        return shared
+
+    def add_node( self, node, attr_dict=None, **attrs):
+        """Add node to graph
+           attr_dict: attribute dict (optional)
+           attrs: more attributes (optional)
+           warning: updates attr_dict with attrs"""
+        attr_dict = {} if attr_dict is None else attr_dict
+        attr_dict.update( attrs )
+        self.intern( node )
+        self.node[ node ] = self.share( attr_dict )
+
+    def pack( self, src, dst, attrs ):
+        """Split edge attributes into what we store in arrays
+           returns: flags, port1, port2, shared dict of the rest"""
+        attrs = dict( attrs )
+        flags = 0
+        if 'node1' in attrs and attrs[ 'node1' ] == src:
+            flags |= self.NODE1
+            del attrs[ 'node1' ]
+        if 'node2' in attrs and attrs[ 'node2' ] == dst:
+            flags |= self.NODE2
+            del attrs[ 'node2' ]
+        port1, port2 = attrs.pop( 'port1', -1 ), attrs.pop( 'port2', -1 )
+        if not isinstance( port1, int ) or port1 < 0:
+            if port1 != -1:
+                attrs[ 'port1' ] = port1
+            port1 = -1
+        if not isinstance( port2, int ) or port2 < 0:
+            if port2 != -1:
+                attrs[ 'port2' ] = port2
+            port2 = -1
+        return flags, port1, port2, self.share( attrs )
+
+    def unpack( self, i ):
+        "Return attribute dict for edge i"
+        attrs = dict( self.opts[ i ] )
+        flags = self.flags[ i ]
+        if flags & self.NODE1:
+            attrs[ 'node1' ] = self.names[ self.src[ i ] ]
+        if flags & self.NODE2:
+            attrs[ 'node2' ] = self.names[ self.dst[ i ] ]
+        if self.port1[ i ] >= 0:
+            attrs[ 'port1' ] = self.port1[ i ]
+        if self.port2[ i ] >= 0:
+            attrs[ 'port2' ] = self.port2[ i ]
+        return attrs
+
+    def add_edge( self, src, dst, key=None, attr_dict=None, **attrs ):
+        """Add edge to graph
+           key: optional key
+           attr_dict: optional attribute dict
+           attrs: more attributes
+           warning: updates attr_dict with attrs"""
+        attr_dict = {} if attr_dict is None else attr_dict
+        attr_dict.update( attrs )
+        sid, did = self.intern( src ), self.intern( dst )
+        pair = ( sid << 32 | did ) if sid <= did else ( did << 32 | sid )
+        # If no key, pick next ordinal number
+        lastKey = self.lastKey.get( pair, 0 )
+        if key is None:
+            key = lastKey + 1
+        if isinstance( key, int ) and key > lastKey:
+            self.lastKey[ pair ] = key
+        flags, port1, port2, opts = self.pack( src, dst, attr_dict )
+        self.src.append( sid )
+        self.dst.append( did )
+        self.flags.append( flags )
+        self.port1.append( port1 )
+        self.port2.append( port2 )
+        self.opts.append( opts )
+        self.keys.append( key )
+        self.csr = None
+        return key
+
+    def setEdge( self, i, attrs ):
+        "Replace the attributes of edge i"
+        src, dst = self.names[ self.src[ i ] ], self.names[ self.dst[ i ] ]
+        ( self.flags[ i ], self.port1[ i ], self.port2[ i ],
+          self.opts[ i ] ) = self.pack( src, dst, attrs )
+
+    def adjacency( self ):
+        """Return CSR adjacency: edges of node id n are
+           indices[ offsets[ n ]:offsets[ n + 1 ] ]"""
+        if self.csr is None:
+            offsets = array( 'l', [ 0 ] ) * ( len( self.names ) + 1 )
+            for ends in self.src, self.dst:
+                for nid in ends:
+                    offsets[ nid + 1 ] += 1
+            for n in range( len( self.names ) ):
+                offsets[ n + 1 ] += offsets[ n ]
+            fill = array( 'l', offsets )
+            indices = array( 'l', [ 0 ] ) * offsets[ -1 ]
+            for ends in self.src, self.dst:
+                for i, nid in enumerate( ends ):
+                    indices[ fill[ nid ] ] = i
+                    fill[ nid ] += 1
+            self.csr = offsets, indices
+        return self.csr
+
+    def edgeIndices( self, node ):
+        "Return indices of the edges of node (self-loops twice)"
+        offsets, indices = self.adjacency()
+        nid = self.ids[ node ]
+        return indices[ offsets[ nid ]:offsets[ nid + 1 ] ]
+
+    def nodes( self, data=False):
+        """Return list of graph nodes
+           data: return list of ( node, attrs)"""
+        if data:
+            # Copies, so that shared dicts can't be changed
+            return [ ( node, dict( self.node.peek( node ) ) )
+                     for node in self.node ]
+        return self.node.keys()
+
+    def edges_iter( self, data=False, keys=False ):
+        "Iterator: return graph edges, optionally with data and keys"
+        names = self.names
+        for i, key in enumerate( self.keys ):
+            src, dst = names[ self.src[ i ] ], names[ self.dst[ i ] ]
+            if data:
+                if keys:
+                    yield( src, dst, key, self.unpack( i ) )
+                else:
+                    yield( src, dst, self.unpack( i ) )
+            else:
+                if keys:
+                    yield( src, dst, key )
+                else:
+                    yield( src, dst )
+
+    def edges( self, data=False, keys=False ):
+        "Return list of graph edges"
+        return list( self.edges_iter( data=data, keys=keys ) )
+
+    def __getitem__( self, node ):
+        "Return link dict for given src node"
+        if node not in self.ids:
+            raise KeyError( node )
+        nid, result = self.ids[ node ], {}
+        for i in self.edgeIndices( node ):
+            other = self.dst[ i ] if self.src[ i ] == nid else self.src[ i ]
+            name = self.names[ other ]
+            entry = result.get( name )
+            if entry is None:
+                entry = result[ name ] = EdgeKeys( self, node, name )
+            key = self.keys[ i ]
+            entry.index[ key ] = i
+            dict.__setitem__( entry, key, self.unpack( i ) )
+        return result
+
+    def neighbors( self, node ):
+        "Return list of nodes linked to node"
+        if node not in self.ids:
+            return []
+        nid, result = self.ids[ node ], {}
+        for i in self.edgeIndices( node ):
+            other = self.dst[ i ] if self.src[ i ] == nid else self.src[ i ]
+            result[ self.names[ other ] ] = True
+        return list( result )
+
     def __len__( self ):
         "Return the number of nodes"
         return len( self.node )
@@ -108,13 +384,21 @@ def __init__( self, *args, **params ):
            hinfo: default host options
            sopts: default switch options
            lopts: default link options
+           graph: graph class (default: MultiGraph; use
+                  CompactMultiGraph for very large topologies)
            calls build()"""
-        self.g = MultiGraph()
+        self.g = params.pop( 'graph', MultiGraph )()
         self.hopts = params.pop( 'hopts', {} )
         self.sopts = params.pop( 'sopts', {} )
         self.lopts = params.pop( 'lopts', {} )
-        # ports[src][dst][sport] is port on dst that connects to src
+        # ports[src][sport] is ( dst, dport ) that connects to src
         self.ports = {}
+        # portIndex[src][dst] is list of ( sport, dport ) for src-dst,
+        # built when port() is first called
+        self.portIndex = None
+        # Natural sort keys and sorted views, cleared on changes
+        self.sortKeys = {}
+        self.views = {}
         self.build( *args, **params )
 
     def build( self, *args, **params ):
@@ -127,6 +411,8 @@ def addNode( self, name, **opts ):
            opts: node options
            returns: node name"""
         self.g.add_node( name, **opts )
+        if self.views:
+            self.views.clear()
         return name
 
     def addHost( self, name, **opts ):
@@ -159,29 +445,57 @@ def addLink( self, node1, node2, port1=None, port2=None,
         port1, port2 = self.addPort( node1, node2, port1, port2 )
         opts = dict( opts )
         opts.update( node1=node1, node2=node2, port1=port1, port2=port2 )
+        if self.views:
+            self.views.clear()
         return self.g.add_edge(node1, node2, key, opts )
 
+    def sortKey( self, name ):
+        "Return (cached) natural sort key for a node name"
+        key = self.sortKeys.get( name )
+        if key is None:
+            key = self.sortKeys[ name ] = natural( name )
+        return key
+
+    def view( self, name, fn ):
+        """Return a cached sorted view, computing it if necessary
+           name: view name
+           fn: function that returns the view"""
+        result = self.views.get( name )
+        if result is None:
+            result = self.views[ name ] = fn()
+        return result
+
     def nodes( self, sort=True ):
         "Return nodes in graph"
         if sort:
-            return self.sorted( self.g.nodes() )
+            return list( self.view( 'nodes', lambda: sorted(
+                self.g.nodes(), key=self.sortKey ) ) )
         else:
             return self.g.nodes()
 
     def isSwitch( self, n ):
         "Returns true if node is a switch."
-        return self.g.node[ n ].get( 'isSwitch', False )
+        node = self.g.node
+        # Don't make CompactMultiGraph copy a shared dict just to read it
+        attrs = node.peek( n ) if hasattr( node, 'peek' ) else node[ n ]
+        return attrs.get( 'isSwitch', False )
 
     def switches( self, sort=True ):
         """Return switches.
            sort: sort switches alphabetically
            returns: dpids list of dpids"""
+        if sort:
+            return list( self.view( 'switches', lambda: [
+                n for n in self.nodes() if self.isSwitch( n ) ] ) )
         return [ n for n in self.nodes( sort ) if self.isSwitch( n ) ]
 
     def hosts( self, sort=True ):
         """Return hosts.
            sort: sort hosts alphabetically
            returns: list of hosts"""
+        if sort:
+            return list( self.view( 'hosts', lambda: [
+                n for n in self.nodes() if not self.isSwitch( n ) ] ) )
         return [ n for n in self.nodes( sort ) if not self.isSwitch( n ) ]
 
     def iterLinks( self, withKeys=False, withInfo=False ):
@@ -208,12 +522,23 @@ def links( self, sort=False, withKeys=False, withInfo=False ):
            withKeys: return link keys
            withInfo: return link info
            returns: list of ( src, dst [,key, info ] )"""
-        links = list( self.iterLinks( withKeys, withInfo ) )
         if not sort:
-            return links
-        # Ignore info when sorting
-        tupleSize = 3 if withKeys else 2
-        return sorted( links, key=( lambda l: naturalSeq( l[ :tupleSize ] ) ) )
+            return list( self.iterLinks( withKeys, withInfo ) )
+        links = self.view( 'links', self.sortedLinks )
+        if withKeys and withInfo:
+            return list( links )
+        if withKeys:
+            return [ ( src, dst, key ) for src, dst, key, _info in links ]
+        if withInfo:
+            return [ ( src, dst, info ) for src, dst, _key, info in links ]
+        return [ ( src, dst ) for src, dst, _key, _info in links ]
+
+    def sortedLinks( self ):
+        "Return links with keys and info, sorted by ( src, dst, key )"
+        sortKey = self.sortKey
+        return sorted( self.iterLinks( withKeys=True, withInfo=True ),
+                       key=lambda l: ( sortKey( l[ 0 ] ), sortKey( l[ 1 ] ),
+                                       natural( l[ 2 ] ) ) )
 
     # This legacy port management mechanism is clunky and will probably
     # be removed at some point.
@@ -233,10 +558,22 @@ def addPort( self, src, dst, sport=None, dport=None ):
         if dport is None:
             dst_base = 1 if self.isSwitch( dst ) else 0
             dport = len( ports[ dst ] ) + dst_base
+        if self.portIndex is not None:
+            self.indexPort( src, sport, dst, dport )
+            self.indexPort( dst, dport, src, sport )
         ports[ src ][ sport ] = ( dst, dport )
         ports[ dst ][ dport ] = ( src, sport )
         return sport, dport
 
+    def indexPort( self, src, sport, dst, dport ):
+        "Helper function: add ports[ src ][ sport ] to port index"
+        index = self.portIndex.setdefault( src, {} )
+        old = self.ports.get( src, {} ).get( sport )
+        if old:
+            # Port is being reused
+            index[ old[ 0 ] ].remove( ( sport, old[ 1 ] ) )
+        index.setdefault( dst, [] ).append( ( sport, dport ) )
+
     def port( self, src, dst ):
         """Get port numbers.
             src: source switch name
@@ -246,10 +583,13 @@ def port( self, src, dst ):
                 sport = port on source switch leading to the destination switch
                 dport = port on destination switch leading to the source switch
             Note that you can also look up ports using linkInfo()"""
-        # A bit ugly and slow vs. single-link implementation ;-(
-        ports = [ ( sport, entry[ 1 ] )
-                  for sport, entry in self.ports[ src ].items()
-                  if entry[ 0 ] == dst ]
+        if self.portIndex is None:
+            self.portIndex = {}
+            for node, entries in self.ports.items():
+                index = self.portIndex[ node ] = {}
+                for sport, ( peer, dport ) in entries.items():
+                    index.setdefault( peer, [] ).append( ( sport, dport ) )
+        ports = list( self.portIndex[ src ].get( dst, () ) )
         return ports if len( ports ) != 1 else ports[ 0 ]
 
     def _linkEntry( self, src, dst, key=None ):
@@ -268,14 +608,18 @@ def setlinkInfo( self, src, dst, info, key=None ):
         "Set link metadata dict"
         entry, key = self._linkEntry( src, dst, key )
         entry[ key ] = info
+        self.views.clear()
 
     def nodeInfo( self, name ):
-        "Return metadata (dict) for node"
+        """Return metadata (dict) for node
+           note: use setNodeInfo() to change isSwitch, since
+           switches() and hosts() are cached"""
         return self.g.node[ name ]
 
     def setNodeInfo( self, name, info ):
         "Set metadata (dict) for node"
         self.g.node[ name ] = info
+        self.views.clear()
 
     def convertTo( self, cls, data=True, keys=True ):
         """Convert to a new object of networkx.MultiGraph-like class cls
@@ -283,12 +627,66 @@ def convertTo( self, cls, data=True, keys=True ):
            keys: include edge keys as well as edge data (default True)"""
         return self.g.convertTo( cls, data=data, keys=keys )
 
+    def preflight( self, fix=True, **params ):
+        """Check (and optionally raise) system limits for this topology
+           fix: raise sysctls and rlimits that are too low
+           params: host, switch, link, controller classes etc.
+           (see mininet.preflight)"""
+        # pylint: disable=import-outside-toplevel
+        from mininet.preflight import preflight
+        return preflight( self, fix=fix, **params )
+
     @staticmethod
     def sorted( items ):
         "Items sorted in natural (i.e. alphabetical) order"
         return sorted( items, key=natural )
 
 
+# Differences between two topologies, as returned by topoDiff():
+# addNodes, delNodes, changedNodes: lists of node names
+# addLinks, delLinks: lists of link info dicts
+# changedLinks: list of ( oldInfo, newInfo ) pairs
+TopoDiff = namedtuple( 'TopoDiff', 'addNodes delNodes changedNodes '
+                       'addLinks delLinks changedLinks' )
+
+
+def linkKey( info ):
+    """Return a key that identifies a link independently of its
+       direction: its two ( node, port ) endpoints, in sorted order.
+       info: link info dict (as returned by Topo.linkInfo())"""
+    ends = ( ( info[ 'node1' ], info[ 'port1' ] ),
+             ( info[ 'node2' ], info[ 'port2' ] ) )
+    return tuple( sorted( ends, key=naturalSeq ) )
+
+
+def topoDiff( old, new ):
+    """Compare two topologies.
+       old: old Topo
+       new: new Topo
+       returns: TopoDiff of changes needed to turn old into new
+       Nodes are matched by name and links by their endpoints;
+       a node or link whose parameters differ is 'changed'."""
+    oldNodes, newNodes = set( old.nodes() ), set( new.nodes() )
+    addNodes = new.sorted( newNodes - oldNodes )
+    delNodes = old.sorted( oldNodes - newNodes )
+    changedNodes = new.sorted(
+        n for n in newNodes & oldNodes
+        if old.nodeInfo( n ) != new.nodeInfo( n ) )
+    oldLinks = { linkKey( info ): info
+                 for _src, _dst, info in old.links( withInfo=True ) }
+    newLinks = { linkKey( info ): info
+                 for _src, _dst, info in new.links( withInfo=True ) }
+    addLinks = [ newLinks[ k ] for k in sorted( newLinks, key=naturalSeq )
+                 if k not in oldLinks ]
+    delLinks = [ oldLinks[ k ] for k in sorted( oldLinks, key=naturalSeq )
+                 if k not in newLinks ]
+    changedLinks = [ ( oldLinks[ k ], newLinks[ k ] )
+                     for k in sorted( newLinks, key=naturalSeq )
+                     if k in oldLinks and oldLinks[ k ] != newLinks[ k ] ]
+    return TopoDiff( addNodes, delNodes, changedNodes,
+                     addLinks, delLinks, changedLinks )
+
+
 # Our idiom defines additional parameters in build(param...)
 # pylint: disable=arguments-differ
 
@@ -0,0 +1,239 @@
+"""
+Topology files: saving, loading and caching Topo objects
+
+A topology file is a stream of JSON lines: a header, then one line
+for each node ( [ "n", name, opts ] ) and each link
+( [ "l", node1, node2, port1, port2, key, opts ] ). Files whose
+names end in .gz are compressed. Node, Link, Intf and Topo classes
+in options (e.g. cls=TCLink) are saved by name and imported when
+loading; other objects (e.g. functions or partial()s) can't be saved.
+
+Since a loaded topology's classes are instantiated when a network is
+built, loadTopo() only imports them from mininet modules, and from
+the modules it is explicitly given, e.g.
+loadTopo( path, modules=[ 'mytopos' ] ), and only if they are Node,
+Link, Intf or Topo subclasses. Only load topology files from sources
+that you trust with those modules.
+
+saveTopo( topo, path ): save a Topo
+loadTopo( path ): load a Topo (a FileTopo)
+cachedTopo( cls, *args, **kwargs ): build a Topo once and load it
+    from the topology cache after that
+
+For example, mn --topo file:mytopo.topo.gz loads a topology file.
+
+Note that a loaded Topo is a FileTopo, not an instance of the class
+that built it, so it only has the usual Topo methods.
+"""
+
+import gzip
+import json
+import os
+from functools import partial
+from importlib import import_module
+from tempfile import mkstemp
+
+from mininet.log import debug, warn
+from mininet.link import Link, Intf
+from mininet.node import Node
+from mininet.topo import Topo
+from mininet.util import Python3, CACHEDIR as MNCACHEDIR
+
+FORMAT = 'mininet-topo'
+VERSION = 1
+
+# Cache directory for cachedTopo()
+CACHEDIR = os.path.join( MNCACHEDIR, 'topos' )
+
+
+def openTopoFile( path, mode ):
+    "Open a (possibly gzipped) topology file for text I/O"
+    if path.endswith( '.gz' ):
+        return gzip.open( path, mode + 't' if Python3 else mode )
+    return open( path, mode )
+
+
+# Classes that topology files may refer to
+SAVECLASSES = ( Node, Link, Intf, Topo )
+
+
+def savable( obj ):
+    "Is obj a class that a topology file may refer to?"
+    return isinstance( obj, type ) and issubclass( obj, SAVECLASSES )
+
+
+def encodeValue( obj ):
+    "json default: save classes by name"
+    if savable( obj ):
+        return { '__import__': '%s.%s' % ( obj.__module__, obj.__name__ ) }
+    raise TypeError( 'cannot save %r in a topology file' % ( obj, ) )
+
+
+def decodeValue( obj, modules=() ):
+    """json object_hook: import saved classes
+       modules: modules other than mininet's that we may import from"""
+    if len( obj ) == 1 and '__import__' in obj:
+        module, name = obj[ '__import__' ].rsplit( '.', 1 )
+        if not ( module == 'mininet' or module.startswith( 'mininet.' )
+                 or module in modules ):
+            raise Exception( 'topology file refers to %s, but module %s '
+                             'is not trusted' % ( obj[ '__import__' ],
+                                                  module ) )
+        cls = getattr( import_module( module ), name )
+        if not savable( cls ):
+            raise Exception( 'topology file refers to %s, which is not '
+                             'a Node, Link, Intf or Topo class' %
+                             obj[ '__import__' ] )
+        return cls
+    return obj
+
+
+def saveTopo( topo, path ):
+    """Save a topology to a file
+       topo: Topo
+       path: file name (compressed if it ends in .gz)"""
+    encoder = json.JSONEncoder( default=encodeValue,
+                                separators=( ',', ':' ) )
+    with openTopoFile( path, 'w' ) as f:
+        f.write( encoder.encode( { 'format': FORMAT, 'version': VERSION,
+                                   'class': type( topo ).__name__ } ) )
+        f.write( '\n' )
+        for name in topo.nodes( sort=False ):
+            f.write( encoder.encode( [ 'n', name, topo.nodeInfo( name ) ] ) )
+            f.write( '\n' )
+        links = topo.iterLinks( withKeys=True, withInfo=True )
+        for node1, node2, key, info in links:
+            opts = dict( info )
+            for param in 'node1', 'node2', 'port1', 'port2':
+                opts.pop( param, None )
+            f.write( encoder.encode(
+                [ 'l', node1, node2, info.get( 'port1' ), info.get( 'port2' ),
+                  key, opts ] ) )
+            f.write( '\n' )
+
+
+class FileTopo( Topo ):
+    "Topology loaded from a topology file"
+
+    # Lines to decode at once
+    batchSize = 4096
+
+    # pylint: disable=arguments-differ
+    def build( self, path, modules=() ):
+        """path: topology file name
+           modules: other modules that classes may be imported from"""
+        with openTopoFile( path, 'r' ) as f:
+            header = json.loads( f.readline() or '{}' )
+            if ( header.get( 'format' ) != FORMAT or
+                 header.get( 'version' ) != VERSION ):
+                raise Exception( '%s: not a version %d topology file' %
+                                 ( path, VERSION ) )
+            for entry in self.entries( f, modules ):
+                if entry[ 0 ] == 'n':
+                    _, name, opts = entry
+                    self.addNode( name, **opts )
+                elif entry[ 0 ] == 'l':
+                    _, node1, node2, port1, port2, key, opts = entry
+                    self.addLink( node1, node2, port1, port2, key=key,
+                                  **opts )
+                else:
+                    raise Exception( '%s: unknown entry %s' %
+                                     ( path, entry[ 0 ] ) )
+
+    def entries( self, f, modules=() ):
+        """Decode the entries in a topology file, a batch of lines
+           at a time (which is much faster than line by line)
+           f: file, positioned after the header
+           modules: other modules that classes may be imported from"""
+        plain = json.JSONDecoder().decode
+        hooked = json.JSONDecoder( object_hook=partial(
+            decodeValue, modules=modules ) ).decode
+        lines = []
+        for line in f:
+            lines.append( line )
+            if len( lines ) == self.batchSize:
+                for entry in self.decodeBatch( lines, plain, hooked ):
+                    yield entry
+                lines = []
+        for entry in self.decodeBatch( lines, plain, hooked ):
+            yield entry
+
+    @staticmethod
+    def decodeBatch( lines, plain, hooked ):
+        "Decode lines, importing classes and functions only if needed"
+        text = '[' + ','.join( line for line in lines if line.strip() ) + ']'
+        decode = hooked if '"__import__"' in text else plain
+        return decode( text )
+
+
+def loadTopo( path, modules=(), **params ):
+    """Load a topology from a file
+       path: file name
+       modules: modules other than mininet's that classes in the file
+                may be imported from
+       params: other Topo parameters (e.g. graph)
+       returns: FileTopo"""
+    return FileTopo( path, modules=modules, **params )
+
+
+def topoHash( cls, args, kwargs ):
+    """Return a hash that identifies a topology, based on its class
+       (or function) and its arguments and source code
+       cls: Topo class or function that returns a Topo
+       args, kwargs: arguments for cls"""
+    # hashlib and inspect are slow to load, so mn imports them on demand
+    # pylint: disable=import-outside-toplevel
+    import hashlib
+    import inspect
+    fn = getattr( cls, 'func', cls )  # partial()
+    digest = hashlib.sha256()
+    for item in ( VERSION, getattr( fn, '__module__', '' ),
+                  getattr( fn, '__name__', '' ), repr( args ),
+                  repr( sorted( kwargs.items() ) ),
+                  repr( getattr( cls, 'args', () ) ),
+                  repr( sorted( ( getattr( cls, 'keywords', None ) or
+                                  {} ).items() ) ) ):
+        digest.update( str( item ).encode() )
+    # Editing the code that builds the topology invalidates the cache
+    try:
+        digest.update( inspect.getsource( fn ).encode() )
+        with open( inspect.getsourcefile( fn ), 'rb' ) as f:
+            digest.update( f.read() )
+    except ( IOError, OSError, TypeError ):
+        pass
+    return digest.hexdigest()
+
+
+def cachedTopo( cls, *args, **kwargs ):
+    """Build a topology, or load it from the topology cache
+       cls: Topo class or function that returns a Topo
+       cacheDir: cache directory (default: CACHEDIR)
+       args, kwargs: arguments for cls
+       returns: Topo"""
+    cacheDir = kwargs.pop( 'cacheDir', None ) or CACHEDIR
+    path = os.path.join( cacheDir, '%s.topo.gz' % topoHash(
+        cls, args, kwargs ) )
+    if os.path.exists( path ):
+        debug( '*** Loading cached topology %s\n' % path )
+        # We wrote the file, so trust the module that built it
+        module = getattr( getattr( cls, 'func', cls ), '__module__', None )
+        return loadTopo( path, modules=[ module ] )
+    topo = cls( *args, **kwargs )
+    if not os.path.isdir( cacheDir ):
+        os.makedirs( cacheDir )
+    # Write to a temporary file so readers never see a partial file
+    fd, tmp = mkstemp( dir=cacheDir, suffix='.topo.gz' )
+    os.close( fd )
+    try:
+        saveTopo( topo, tmp )
+        os.rename( tmp, path )
+    except TypeError as e:
+        # e.g. a partial() or function in its options
+        os.unlink( tmp )
+        warn( '*** Not caching topology: %s\n' % e )
+        return topo
+    except Exception:
+        os.unlink( tmp )
+        raise
+    debug( '*** Saved topology to cache %s\n' % path )
+    return topo
@@ -1,5 +1,7 @@
 "Library of potentially useful topologies for Mininet"
 
+from random import Random
+
 from mininet.topo import Topo
 from mininet.net import Mininet
 
@@ -81,4 +83,269 @@ def genHostName( loc, k ):
                 self.addLink( sw1, sw2 )
                 self.addLink( sw1, sw3 )
 
+
+# Datacenter topologies
+#
+# These generators are non-recursive and deterministic: the same
+# parameters always give the same names, dpids and port numbers.
+# Switch dpids are layer * 0x10000 + index, so they also tell you
+# where a switch is. Like other Topos, they accept graph=
+# CompactMultiGraph for very large topologies.
+#
+# WARNING: all of these topologies have LOOPS and WILL NOT WORK
+# with the default controller or any Ethernet bridge without STP
+# turned on (or a suitable controller), e.g.:
+# mn --topo fattree,4 --switch lxbr,stp=1 --test pingall
+
+class DCTopo( Topo ):
+    "Base class for datacenter topologies"
+
+    def build( self, *args, **params ):
+        self.hostNum = 1
+        self.buildDC( *args, **params )
+
+    def buildDC( self, *args, **params ):
+        "Override this method to build your datacenter."
+        pass
+
+    def addDCSwitch( self, name, layer, index, **opts ):
+        """Add a switch with a deterministic dpid
+           name: switch name
+           layer: layer number (>0)
+           index: switch number within layer (>0)"""
+        dpid = layer * 0x10000 + index
+        return self.addSwitch( name, dpid='%x' % dpid, **opts )
+
+    def addDCHosts( self, switch, count, **opts ):
+        """Add hosts h<n>, h<n+1>... and link them to a switch
+           switch: switch name
+           count: number of hosts
+           opts: link options
+           returns: list of host names"""
+        hosts = []
+        for _ in range( count ):
+            host = self.addHost( 'h%d' % self.hostNum )
+            self.hostNum += 1
+            self.addLink( host, switch, **opts )
+            hosts.append( host )
+        return hosts
+
+
+class FatTreeTopo( DCTopo ):
+    """k-ary fat tree: k pods of k/2 edge and k/2 aggregation switches,
+       (k/2)^2 core switches and k/2 hosts per edge switch (k^3/4 hosts)
+       Edge switch ports 1..k/2 lead to hosts and the rest to
+       aggregation switches; aggregation switch ports 1..k/2 lead to
+       edge switches and the rest to core switches."""
+
+    def buildDC( self, k=4, hosts=None ):
+        """k: switch port count (even)
+           hosts: hosts per edge switch (default: k/2)"""
+        if k < 2 or k % 2:
+            raise Exception( 'FatTreeTopo: k must be even and positive' )
+        half = k // 2
+        hosts = half if hosts is None else hosts
+        cores = [ self.addDCSwitch( 'core%d' % ( i + 1 ), 3, i + 1 )
+                  for i in range( half * half ) ]
+        for pod in range( k ):
+            aggs = [ self.addDCSwitch( 'agg%d' % ( pod * half + i + 1 ),
+                                       2, pod * half + i + 1 )
+                     for i in range( half ) ]
+            for i in range( half ):
+                edge = self.addDCSwitch( 'edge%d' % ( pod * half + i + 1 ),
+                                         1, pod * half + i + 1 )
+                self.addDCHosts( edge, hosts )
+                for agg in aggs:
+                    self.addLink( edge, agg )
+            # Aggregation switch i connects to core switches
+            # i*k/2 .. (i+1)*k/2 - 1
+            for i, agg in enumerate( aggs ):
+                for core in cores[ i * half:( i + 1 ) * half ]:
+                    self.addLink( agg, core )
+
+
+class LeafSpineTopo( DCTopo ):
+    """Leaf-spine (2-tier Clos) topology: every leaf switch connects to
+       every spine switch (possibly with several parallel links), and
+       each leaf has enough hosts to give the requested oversubscription
+       ratio (host links / spine links) when all links have the same
+       speed."""
+
+    def buildDC( self, leaves=4, spines=2, ratio=1, links=1, hosts=None,
+                 **linkopts ):
+        """leaves: number of leaf switches
+           spines: number of spine switches
+           ratio: oversubscription ratio (downlinks:uplinks)
+           links: number of links from each leaf to each spine
+           hosts: hosts per leaf (default: ratio * spines * links)
+           linkopts: options for all links (e.g. bw)"""
+        if hosts is None:
+            hosts = int( ratio * spines * links )
+        spineSwitches = [ self.addDCSwitch( 'spine%d' % ( i + 1 ), 2, i + 1 )
+                          for i in range( spines ) ]
+        for i in range( leaves ):
+            leaf = self.addDCSwitch( 'leaf%d' % ( i + 1 ), 1, i + 1 )
+            self.addDCHosts( leaf, hosts, **linkopts )
+            for spine in spineSwitches:
+                for _ in range( links ):
+                    self.addLink( leaf, spine, **linkopts )
+
+
+class JellyfishTopo( DCTopo ):
+    """Jellyfish: a random regular graph of switches, each with the
+       same number of ports to other switches, built with the
+       incremental algorithm from the Jellyfish paper and a seeded
+       random number generator (so it is reproducible)."""
+
+    def buildDC( self, switches=16, degree=4, hosts=1, seed=1 ):
+        """switches: number of switches
+           degree: switch-to-switch ports per switch
+           hosts: hosts per switch
+           seed: random seed"""
+        if degree >= switches:
+            raise Exception( 'JellyfishTopo: degree must be less than '
+                             'the number of switches' )
+        rand = Random( seed )
+        names = [ self.addDCSwitch( 's%d' % ( i + 1 ), 1, i + 1 )
+                  for i in range( switches ) ]
+        for name in names:
+            self.addDCHosts( name, hosts )
+        for a, b in sorted( self.jellyfish( switches, degree, rand ) ):
+            self.addLink( names[ a ], names[ b ] )
+
+    @staticmethod
+    def jellyfish( switches, degree, rand ):
+        """Return the links of a random regular graph
+           switches: number of switches
+           degree: links per switch
+           rand: Random()
+           returns: set of ( a, b ) switch index pairs, a < b"""
+        free = [ degree ] * switches
+        edges = set()
+        # Switches with free ports, and their positions in opened
+        opened, where = list( range( switches ) ), list( range( switches ) )
+
+        def pair( a, b ):
+            "Return sorted pair"
+            return ( a, b ) if a < b else ( b, a )
+
+        def use( node, count ):
+            "Use count ports (or free them, if negative) on node"
+            if free[ node ] == 0:
+                where[ node ] = len( opened )
+                opened.append( node )
+            free[ node ] -= count
+            if free[ node ] == 0:
+                last = opened.pop()
+                if last != node:
+                    opened[ where[ node ] ] = last
+                    where[ last ] = where[ node ]
+
+        def link( a, b ):
+            "Link a and b"
+            edges.add( pair( a, b ) )
+            use( a, 1 )
+            use( b, 1 )
+
+        def pick():
+            "Return an unlinked pair of switches with free ports, or None"
+            for _ in range( 100 ):
+                if len( opened ) < 2:
+                    return None
+                a, b = rand.sample( opened, 2 )
+                if pair( a, b ) not in edges:
+                    return a, b
+            # Few choices left: look at all of them
+            nodes = sorted( opened )
+            pairs = [ ( a, b ) for i, a in enumerate( nodes )
+                      for b in nodes[ i + 1: ] if ( a, b ) not in edges ]
+            return rand.choice( pairs ) if pairs else None
+
+        while True:
+            ends = pick()
+            if ends:
+                link( *ends )
+                continue
+            # A switch with two or more free ports can replace a
+            # random link (x, y) with links to x and y
+            stuck = sorted( i for i in opened if free[ i ] >= 2 )
+            if not stuck:
+                break
+            node = rand.choice( stuck )
+            candidates = [ ( x, y ) for x, y in sorted( edges )
+                           if node not in ( x, y ) and
+                           pair( node, x ) not in edges and
+                           pair( node, y ) not in edges ]
+            if not candidates:
+                break
+            x, y = rand.choice( candidates )
+            edges.remove( ( x, y ) )
+            use( x, -1 )
+            use( y, -1 )
+            link( node, x )
+            link( node, y )
+        return edges
+
+
+class DragonflyTopo( DCTopo ):
+    """Dragonfly: groups of fully connected routers (switches), with
+       global links so that every pair of groups is directly linked.
+       A balanced dragonfly has routers = 2 * hosts = 2 * globalLinks
+       and routers * globalLinks + 1 groups."""
+
+    def buildDC( self, routers=4, hosts=2, globalLinks=2, groups=None ):
+        """routers: routers per group (a)
+           hosts: hosts per router (p)
+           globalLinks: global links per router (h)
+           groups: number of groups (default: a * h + 1, the maximum)"""
+        ports = routers * globalLinks
+        groups = ports + 1 if groups is None else groups
+        if groups > ports + 1:
+            raise Exception( 'DragonflyTopo: at most %d groups' %
+                             ( ports + 1 ) )
+        switches = []
+        for g in range( groups ):
+            group = []
+            for r in range( routers ):
+                index = g * routers + r + 1
+                group.append( self.addDCSwitch(
+                    's%d' % index, g + 1, r + 1 ) )
+            for i, router in enumerate( group ):
+                self.addDCHosts( router, hosts )
+                for other in group[ :i ]:
+                    self.addLink( other, router )
+            switches.append( group )
+        # Group g's global port p (0..a*h-1) leads to group p if p < g,
+        # else to group p + 1; it belongs to router p // h
+        for g1 in range( groups ):
+            for g2 in range( g1 + 1, groups ):
+                r1 = switches[ g1 ][ ( g2 - 1 ) // globalLinks ]
+                r2 = switches[ g2 ][ g1 // globalLinks ]
+                self.addLink( r1, r2 )
+
+
+class BCubeTopo( DCTopo ):
+    """BCube(n, k): n^(k+1) servers (hosts), each with k+1 interfaces,
+       and k+1 levels of n^k n-port switches. The server with base-n
+       address a_k...a_0 connects to the level-l switch whose number
+       is that address without digit a_l.
+       Note that BCube servers forward packets for each other, so
+       hosts need IP forwarding and routes (e.g. from mininet.routing)."""
+
+    def buildDC( self, n=4, k=1 ):
+        """n: switch port count
+           k: highest level"""
+        count = n ** ( k + 1 )
+        hosts = [ self.addHost( 'h%d' % ( i + 1 ) ) for i in range( count ) ]
+        for level in range( k + 1 ):
+            low = n ** level
+            for index in range( n ** k ):
+                switch = self.addDCSwitch(
+                    's%dx%d' % ( level + 1, index + 1 ), level + 1,
+                    index + 1 )
+                # Insert each possible digit at position level
+                base = ( index // low ) * low * n + index % low
+                for digit in range( n ):
+                    self.addLink( hosts[ base + digit * low ], switch )
+
 # pylint: enable=arguments-differ
@@ -1,18 +1,22 @@
 "Utility functions for Mininet."
 
 import codecs
+import json
 import os
 import re
+import socket
 import sys
 
 from collections import namedtuple
 from fcntl import fcntl, F_GETFL, F_SETFL
 from functools import partial
 from os import O_NONBLOCK
+from pwd import getpwuid
 from resource import getrlimit, setrlimit, RLIMIT_NPROC, RLIMIT_NOFILE
 from select import poll, POLLIN, POLLHUP
 from subprocess import call, check_call, Popen, PIPE, STDOUT
 from sys import exit  # pylint: disable=redefined-builtin
+from threading import Thread, Lock
 from time import sleep
 
 from mininet.log import output, info, error, warn, debug
@@ -55,12 +59,17 @@ def getincrementaldecoder():
         "Return null codec for Python 2"
         return NullCodec
 
-try:
-    import packaging.version  # replacement for distutils.version
-    StrictVersion = packaging.version.parse
-except ImportError:  # python2.7 lacks ModuleNotFoundError
-    import distutils.version  # pylint: disable=deprecated-module
-    StrictVersion = distutils.version.StrictVersion
+def StrictVersion( version ):  # pylint: disable=invalid-name
+    """Return a comparable version; packaging is imported on first use
+       since it takes longer to load than most of Mininet"""
+    # pylint: disable=import-outside-toplevel
+    try:
+        import packaging.version  # replacement for distutils.version
+        return packaging.version.parse( version )
+    except ImportError:  # python2.7 lacks ModuleNotFoundError
+        import distutils.version  # pylint: disable=deprecated-module
+        return distutils.version.StrictVersion( version )
+
 
 try:
     oldpexpect = None
@@ -213,17 +222,94 @@ def quietRun( cmd, **kwargs ):
     "Run a command and return merged stdout and stderr"
     return errRun( cmd, stderr=STDOUT, **kwargs ).out
 
-def which(cmd, **kwargs ):
-    "Run a command and return merged stdout and stderr"
-    out, _, ret = errRun( ["which", cmd], stderr=STDOUT, **kwargs )
-    return out.rstrip() if ret == 0 else None
+def which( cmd, path=None ):
+    """Return the full path of an executable, or None
+       (like which(1), but without running it)
+       cmd: program name
+       path: search path (default: $PATH)"""
+    if path is None:
+        path = os.environ.get( 'PATH', os.defpath )
+    dirs = [ '' ] if os.sep in cmd else path.split( os.pathsep )
+    for d in dirs:
+        full = os.path.join( d, cmd )
+        if os.path.isfile( full ) and os.access( full, os.X_OK ):
+            return full
+    return None
+
+
+# Cache directory, in the home directory of the user we are running
+# as, whatever $HOME says (sudo may keep the invoking user's $HOME)
+CACHEDIR = os.path.join( getpwuid( os.getuid() ).pw_dir, '.cache',
+                         'mininet' )
+
+# Probe cache: output of commands that only changes when the programs
+# they run (or the kernel) are upgraded, so that we needn't run them
+# every time Mininet starts
+PROBECACHE = os.path.join( CACHEDIR, 'probes.json' )
+
+def loadProbes( cacheFile ):
+    "Return the probe cache in cacheFile, or an empty one"
+    if cacheFile not in loadProbes.caches:
+        try:
+            with open( cacheFile ) as f:
+                probes = json.load( f )
+            if not isinstance( probes, dict ):
+                raise ValueError( 'not a probe cache' )
+        except ( IOError, OSError, ValueError ):
+            probes = {}
+        loadProbes.caches[ cacheFile ] = probes
+    return loadProbes.caches[ cacheFile ]
+
+
+loadProbes.caches = {}
+
+
+def saveProbes( cacheFile ):
+    "Write the probe cache to cacheFile (quietly giving up on errors)"
+    try:
+        cacheDir = os.path.dirname( cacheFile )
+        if not os.path.isdir( cacheDir ):
+            os.makedirs( cacheDir )
+        # Write to a temporary file so readers never see a partial file
+        from tempfile import mkstemp  # pylint: disable=import-outside-toplevel
+        fd, tmp = mkstemp( dir=cacheDir, suffix='.json' )
+        with os.fdopen( fd, 'w' ) as f:
+            json.dump( loadProbes( cacheFile ), f )
+        os.rename( tmp, cacheFile )
+    except ( IOError, OSError ) as e:
+        debug( '*** Could not save probe cache %s: %s\n' % ( cacheFile, e ) )
+
+def cachedProbe( cmd, binaries=None, cacheFile=None ):
+    """Return merged output of cmd, from the probe cache if the kernel
+       and the programs it depends on are unchanged
+       cmd: command string
+       binaries: programs whose paths and mtimes the output depends on
+                 (default: cmd's program)
+       cacheFile: probe cache file (default: PROBECACHE)
+       returns: command output"""
+    cacheFile = cacheFile or PROBECACHE
+    if binaries is None:
+        binaries = cmd.split()[ :1 ]
+    stamp = [ os.uname()[ 2 ] ]
+    for binary in binaries:
+        path = which( binary )
+        stamp.append( [ path, os.stat( path ).st_mtime if path else None ] )
+    probes = loadProbes( cacheFile )
+    entry = probes.get( cmd )
+    if entry and entry.get( 'stamp' ) == stamp:
+        return entry[ 'out' ]
+    out = quietRun( cmd )
+    probes[ cmd ] = { 'stamp': stamp, 'out': out }
+    saveProbes( cacheFile )
+    return out
 
 # pylint: enable=maybe-no-member
 
 def isShellBuiltin( cmd ):
     "Return True if cmd is a bash builtin."
     if isShellBuiltin.builtIns is None:
-        isShellBuiltin.builtIns = set(quietRun( 'bash -c enable' ).split())
+        isShellBuiltin.builtIns = set(
+            cachedProbe( 'bash -c enable' ).split() )
     space = cmd.find( ' ' )
     if space > 0:
         cmd = cmd[ :space]
@@ -282,6 +368,53 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
         raise Exception( "Error creating interface pair (%s,%s): %s " %
                          ( intf1, intf2, cmdOutput ) )
 
+def ipBatch( cmds, node=None, force=True ):
+    """Run a list of ip(8) commands using a single ip -batch process,
+       rather than starting a process (or shell round trip) per command.
+       cmds: list of ip commands, without the leading 'ip'
+       node: node whose namespace to run in (default: root namespace)
+       force: keep going after errors (True)
+       returns: CmdResult with merged stdout/stderr"""
+    if not cmds:
+        return CmdResult( '', '', 0 )
+    args = [ 'ip' ] + ( [ '-force' ] if force else [] ) + [ '-batch', '-' ]
+    debug( '*** ipBatch:', node, len( cmds ), 'commands\n' )
+    # Feed commands from a file rather than a pipe, so that we only
+    # have to read (one) output pipe and don't need select()/poll()
+    # (tempfile is slow to load, so we import it when needed)
+    # pylint: disable=import-outside-toplevel
+    from tempfile import TemporaryFile
+    with TemporaryFile() as f:
+        f.write( encode( '\n'.join( cmds ) + '\n' ) )
+        f.seek( 0 )
+        params = dict( stdin=f, stdout=PIPE, stderr=STDOUT )
+        # pylint: disable=consider-using-with
+        popen = node.popen( args, **params ) if node else Popen(
+            args, **params )
+        out = decode( popen.stdout.read() )
+        popen.stdout.close()
+        ret = popen.wait()
+    debug( out )
+    return CmdResult( out, '', ret )
+
+def ipLinkStates( node=None ):
+    """Return the state of every interface in a namespace, using a
+       single ip -o link command
+       node: node whose namespace to look in (default: root namespace)
+       returns: { intf name: frozenset of flags (e.g. UP, LOWER_UP) }"""
+    args = [ 'ip', '-o', 'link', 'show' ]
+    out = node.pexec( args )[ 0 ] if node else quietRun( args )
+    states = {}
+    for line in out.split( '\n' ):
+        # e.g. 2: h1-eth0@if3: <BROADCAST,MULTICAST,UP,LOWER_UP> ...
+        fields = line.split( ': ', 2 )
+        if len( fields ) < 3:
+            continue
+        name = fields[ 1 ].split( '@' )[ 0 ]
+        flags = fields[ 2 ][ 1: fields[ 2 ].find( '>' ) ]
+        states[ name ] = frozenset( flags.split( ',' ) )
+    return states
+
 def retry( retries, delaySecs, fn, *args, **keywords ):
     """Try something several times before giving up.
        n: number of times to retry
@@ -553,8 +686,22 @@ def mountCgroups( cgcontrol='cpu cpuacct cpuset' ):
     """Mount cgroupfs if needed and return cgroup version
        cgcontrol: cgroup controllers to check ('cpu cpuacct cpuset')
        Returns: 'cgroup' | 'cgroup2' """
-    # Try to read the cgroup controllers in cgcontrol
     cglist = cgcontrol.split()
+    # If the controllers are already mounted, /proc/mounts tells us
+    # the version without running cgget
+    roots = cgroupMounts()
+    if all( c in roots for c in cglist ):
+        return 'cgroup'
+    if 'cgroup2' in roots:
+        try:
+            with open( roots[ 'cgroup2' ] + '/cgroup.controllers' ) as f:
+                available = f.read().split()
+            # cgroup2 has no separate cpuacct controller
+            if all( c in available for c in cglist if c != 'cpuacct' ):
+                return 'cgroup2'
+        except ( IOError, OSError ):
+            pass
+    # Try to read the cgroup controllers in cgcontrol
     paths = ' '.join( '-g ' + c for c in cglist )
     cmd = 'cgget -n %s /' % paths
     result = errRun( cmd )
@@ -569,6 +716,25 @@ def mountCgroups( cgcontrol='cpu cpuacct cpuset' ):
         return 'cgroup'
     return 'cgroup2'
 
+def cgroupMounts( mounts='/proc/mounts' ):
+    """Return cgroup mount points
+       mounts: mount table to read
+       returns: { controller: path }, with 'cgroup2' for the
+                unified (cgroup v2) hierarchy"""
+    roots = {}
+    with open( mounts ) as f:
+        for line in f:
+            fields = line.split()
+            if len( fields ) < 4:
+                continue
+            path, fstype, options = fields[ 1 ], fields[ 2 ], fields[ 3 ]
+            if fstype == 'cgroup2':
+                roots.setdefault( 'cgroup2', path )
+            elif fstype == 'cgroup':
+                for option in options.split( ',' ):
+                    roots.setdefault( option, path )
+    return roots
+
 def natural( text ):
     "To sort sanely/alphabetically: sorted( l, key=natural )"
     def num( s ):
@@ -581,15 +747,170 @@ def naturalSeq( t ):
     return [ natural( x ) for x in t ]
 
 def numCores():
-    "Returns number of CPU cores based on /proc/cpuinfo"
+    "Returns number of online CPU cores (as listed in /proc/cpuinfo)"
     if hasattr( numCores, 'ncores' ):
         return numCores.ncores
     try:
-        numCores.ncores = int( quietRun('grep -c processor /proc/cpuinfo') )
-    except ValueError:
-        return 0
+        numCores.ncores = os.sysconf( 'SC_NPROCESSORS_ONLN' )
+    except ( ValueError, OSError ):
+        try:
+            with open( '/proc/cpuinfo' ) as f:
+                numCores.ncores = sum( 1 for line in f
+                                       if line.startswith( 'processor' ) )
+        except ( IOError, OSError ):
+            return 0
     return numCores.ncores
 
+def parseCpuList( cpulist ):
+    """Parse a kernel CPU (or NUMA node) list, e.g. '0-3,8,10-11'
+       returns: list of numbers"""
+    result = []
+    for part in cpulist.strip().split( ',' ):
+        if '-' in part:
+            start, end = part.split( '-' )
+            result.extend( range( int( start ), int( end ) + 1 ) )
+        elif part:
+            result.append( int( part ) )
+    return result
+
+def readSysfs( path, default=None ):
+    "Return stripped contents of a sysfs file, or default if unreadable"
+    try:
+        with open( path ) as f:
+            return f.read().strip()
+    except ( IOError, OSError ):
+        return default
+
+
+CPUInfo = namedtuple( 'CPUInfo', 'cpu core socket node llc' )
+
+def cpuTopology( sysfs='/sys/devices/system' ):
+    """Return the layout of the online CPUs, as read from sysfs
+       sysfs: sysfs system directory
+       returns: list of CPUInfo( cpu, core, socket, node, llc ),
+                where core is the physical core id within its socket,
+                node is the NUMA node and llc is the lowest numbered
+                CPU sharing its last-level cache"""
+    online = readSysfs( sysfs + '/cpu/online' )
+    cpus = ( parseCpuList( online ) if online else
+             list( range( numCores() ) ) )
+    nodes = {}
+    nodedir = sysfs + '/node'
+    if os.path.isdir( nodedir ):
+        for entry in os.listdir( nodedir ):
+            match = re.match( r'node(\d+)$', entry )
+            cpulist = match and readSysfs(
+                '%s/%s/cpulist' % ( nodedir, entry ) )
+            for cpu in parseCpuList( cpulist or '' ):
+                nodes[ cpu ] = int( match.group( 1 ) )
+    result = []
+    for cpu in cpus:
+        base = '%s/cpu/cpu%d' % ( sysfs, cpu )
+        socket = int( readSysfs( base + '/topology/physical_package_id',
+                                 0 ) )
+        core = int( readSysfs( base + '/topology/core_id', cpu ) )
+        # The last-level cache is the highest level listed
+        llc, level = socket, -1
+        cachedir = base + '/cache'
+        if os.path.isdir( cachedir ):
+            for index in os.listdir( cachedir ):
+                if not index.startswith( 'index' ):
+                    continue
+                lvl = int( readSysfs( '%s/%s/level' % ( cachedir, index ),
+                                      -1 ) )
+                shared = readSysfs( '%s/%s/shared_cpu_list' % (
+                    cachedir, index ) )
+                if lvl > level and shared:
+                    llc, level = min( parseCpuList( shared ) ), lvl
+        result.append( CPUInfo( cpu, core, socket,
+                                nodes.get( cpu, 0 ), llc ) )
+    return result
+
+def cpuNodes( cores, cpus=None ):
+    """Return the NUMA nodes that a set of cores belong to
+       cores: core number, list of cores, or kernel CPU list string
+       cpus: list of CPUInfo (default: cpuTopology())
+       returns: sorted list of NUMA nodes"""
+    if isinstance( cores, int ):
+        cores = [ cores ]
+    elif isinstance( cores, BaseString ):
+        cores = parseCpuList( cores )
+    if cpus is None:
+        cpus = cpuTopology()
+    nodes = dict( ( c.cpu, c.node ) for c in cpus )
+    return sorted( set( nodes.get( int( core ), 0 ) for core in cores ) )
+
+def runParallel( fn, items, workers=None ):
+    """Call fn( item ) for each item, using a bounded pool of threads.
+       Useful for operations on independent nodes, which spend most of
+       their time waiting for shell round trips.
+       fn: function to call
+       items: list of items to process
+       workers: max number of concurrent calls (default: numCores())
+       returns: list of ( item, result, exception ) in item order"""
+    items = list( items )
+    if workers is None:
+        workers = numCores()
+    workers = max( 1, min( workers, len( items ) ) )
+    results = [ None ] * len( items )
+
+    def runOne( i ):
+        "Call fn on item i and record its result or exception"
+        item = items[ i ]
+        try:
+            results[ i ] = ( item, fn( item ), None )
+        # Note: retry() and friends may call exit()
+        except ( Exception, SystemExit ) as e:  # pylint: disable=broad-except
+            results[ i ] = ( item, None, e )
+    if workers == 1:
+        # Don't bother with threads
+        for i in range( len( items ) ):
+            runOne( i )
+        return results
+    indices = iter( range( len( items ) ) )
+    lock = Lock()
+
+    def worker():
+        "Process items until there are none left"
+        while True:
+            with lock:
+                i = next( indices, None )
+            if i is None:
+                return
+            runOne( i )
+    threads = [ Thread( target=worker ) for _ in range( workers ) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# Counters in /proc/net/dev, in order
+NETDEVFIELDS = tuple(
+    [ 'rx_' + f for f in ( 'bytes', 'packets', 'errs', 'drop', 'fifo',
+                           'frame', 'compressed', 'multicast' ) ] +
+    [ 'tx_' + f for f in ( 'bytes', 'packets', 'errs', 'drop', 'fifo',
+                           'colls', 'carrier', 'compressed' ) ] )
+
+def netDevStats( pid='self', intfs=None ):
+    """Return interface counters for a network namespace, by reading
+       /proc/<pid>/net/dev rather than running a command in it
+       pid: pid of a process in the namespace (e.g. node.pid)
+       intfs: names of interfaces to return (default: all)
+       returns: { intf name: { counter name: value } }"""
+    stats = {}
+    with open( '/proc/%s/net/dev' % pid ) as f:
+        lines = f.readlines()[ 2: ]
+    for line in lines:
+        name, _, counters = line.partition( ':' )
+        name = name.strip()
+        if intfs is not None and name not in intfs:
+            continue
+        stats[ name ] = dict( zip( NETDEVFIELDS,
+                                   [ int( c ) for c in counters.split() ] ) )
+    return stats
+
 def irange(start, end):
     """Inclusive range from start to end (vs. Python insanity.)
        irange(1,5) -> 1, 2, 3, 4, 5"""
@@ -690,6 +1011,19 @@ def ensureRoot():
         error( '*** Mininet must run as root.\n' )
         exit( 1 )
 
+def portOpen( ip, port, timeout=5 ):
+    """Return True if we can connect to a TCP port (from the root
+       namespace), without running telnet
+       ip: IP address
+       port: TCP port
+       timeout: connect timeout in seconds"""
+    try:
+        sock = socket.create_connection( ( ip, port ), timeout )
+    except ( socket.error, socket.timeout ):
+        return False
+    sock.close()
+    return True
+
 def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
     """Wait until server is listening on port.
        returns True if server is listening"""